@@ -0,0 +1,290 @@
+#!/usr/bin/env node
+/**
+ * Replay a JSONL workload against a running server and report latencies
+ *
+ * Each line is one request, either an HTTP route or an MCP tool call:
+ *
+ *   {"name": "toc", "path": "/guide/security/toc"}
+ *   {"path": "/guide/security/batch", "method": "POST", "body": {"paths": ["sec59b0b31ff"]}}
+ *   {"tool": "fetchAppleSupportGuide", "arguments": {"guide": "security", "path": "sec59b0b31ff"}}
+ *
+ * Usage:
+ *   node scripts/replay.mjs <workload.jsonl> [--base http://localhost:51345]
+ *     [--concurrency 4] [--repeat 1] [--out results.json]
+ *     [--baseline previous.json] [--threshold 0.25]
+ *
+ * With --baseline, exits with status 1 when any request's p95 grew by more
+ * than the threshold (25% by default) compared to the saved results.
+ */
+
+import { readFileSync, writeFileSync } from "node:fs"
+
+const SESSION_ID_HEADER = "Mcp-Session-Id"
+
+function parseArgs(argv) {
+  const options = { base: "http://localhost:51345", concurrency: 4, repeat: 1, threshold: 0.25 }
+  const positional = []
+  for (let i = 0; i < argv.length; i++) {
+    const arg = argv[i]
+    if (!arg.startsWith("--")) {
+      positional.push(arg)
+      continue
+    }
+    const value = argv[++i]
+    const key = arg.slice(2)
+    options[key] = ["concurrency", "repeat", "threshold"].includes(key) ? Number(value) : value
+  }
+  options.workload = positional[0]
+  return options
+}
+
+function readWorkload(path) {
+  return readFileSync(path, "utf8")
+    .split("\n")
+    .map((line) => line.trim())
+    .filter((line) => line && !line.startsWith("//"))
+    .map((line, i) => {
+      const entry = JSON.parse(line)
+      entry.name ??= entry.tool ? `tool:${entry.tool}` : `${entry.method ?? "GET"} ${entry.path}`
+      if (!entry.tool && !entry.path) throw new Error(`Line ${i + 1} has neither "path" nor "tool"`)
+      return entry
+    })
+}
+
+/**
+ * Parse a Server-Timing header into { stage: ms }
+ */
+function parseServerTiming(header) {
+  const stages = {}
+  for (const metric of header?.split(",") ?? []) {
+    const [name, ...params] = metric.trim().split(";")
+    const duration = params.find((param) => param.trim().startsWith("dur="))
+    if (name && duration) stages[name] = Number(duration.trim().slice(4))
+  }
+  return stages
+}
+
+/**
+ * Read the JSON-RPC messages of an MCP response, whether sent as JSON or over SSE
+ */
+async function readMessages(response) {
+  const text = await response.text()
+  if (response.headers.get("Content-Type")?.includes("text/event-stream")) {
+    return text
+      .split("\n")
+      .filter((line) => line.startsWith("data: "))
+      .map((line) => JSON.parse(line.slice(6)))
+  }
+  return text ? [JSON.parse(text)] : []
+}
+
+/**
+ * MCP client holding one session, as an agent would
+ */
+class McpClient {
+  constructor(base) {
+    this.url = new URL("/mcp", base)
+    this.nextId = 1
+  }
+
+  post(body) {
+    const headers = {
+      "Content-Type": "application/json",
+      Accept: "application/json, text/event-stream",
+    }
+    if (this.sessionId) headers[SESSION_ID_HEADER] = this.sessionId
+    return fetch(this.url, { method: "POST", headers, body: JSON.stringify(body) })
+  }
+
+  async open() {
+    const response = await this.post({
+      jsonrpc: "2.0",
+      id: 0,
+      method: "initialize",
+      params: {
+        protocolVersion: "2025-06-18",
+        capabilities: {},
+        clientInfo: { name: "supportify-replay", version: "1.0.0" },
+      },
+    })
+    this.sessionId = response.headers.get(SESSION_ID_HEADER)
+    await readMessages(response)
+    await (await this.post({ jsonrpc: "2.0", method: "notifications/initialized" })).text()
+  }
+
+  async call(tool, args) {
+    if (!this.opened) this.opened = this.open()
+    await this.opened
+
+    const response = await this.post({
+      jsonrpc: "2.0",
+      id: this.nextId++,
+      method: "tools/call",
+      params: { name: tool, arguments: args ?? {} },
+    })
+    const [message] = await readMessages(response)
+    const ok = response.ok && !message?.error && !message?.result?.isError
+    return { response, ok }
+  }
+}
+
+async function send(entry, base, mcp) {
+  if (entry.tool) return mcp.call(entry.tool, entry.arguments)
+
+  const body = entry.body === undefined ? undefined : JSON.stringify(entry.body)
+  const headers = { ...(body ? { "Content-Type": "application/json" } : {}), ...entry.headers }
+  const response = await fetch(new URL(entry.path, base), {
+    method: entry.method ?? "GET",
+    headers,
+    body,
+  })
+  await response.arrayBuffer()
+  return { response, ok: response.ok || response.status === 304 }
+}
+
+function percentile(sorted, p) {
+  return sorted.length ? sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))] : 0
+}
+
+const round = (ms) => Math.round(ms * 10) / 10
+
+function summarize(samples) {
+  const byName = new Map()
+  for (const sample of samples) {
+    if (!byName.has(sample.name)) byName.set(sample.name, [])
+    byName.get(sample.name).push(sample)
+  }
+
+  const requests = {}
+  for (const [name, group] of byName) {
+    const latencies = group.map((sample) => sample.ms).sort((a, b) => a - b)
+    const stages = {}
+    for (const sample of group) {
+      for (const [stage, ms] of Object.entries(sample.stages)) {
+        stages[stage] = (stages[stage] ?? 0) + ms / group.length
+      }
+    }
+    requests[name] = {
+      count: group.length,
+      errors: group.filter((sample) => !sample.ok).length,
+      statuses: group.reduce((counts, { status }) => {
+        counts[status] = (counts[status] ?? 0) + 1
+        return counts
+      }, {}),
+      p50Ms: round(percentile(latencies, 0.5)),
+      p95Ms: round(percentile(latencies, 0.95)),
+      maxMs: round(latencies.at(-1)),
+      serverTimingMeanMs: Object.fromEntries(
+        Object.entries(stages).map(([stage, ms]) => [stage, round(ms)]),
+      ),
+    }
+  }
+  return requests
+}
+
+function compare(requests, baseline, threshold) {
+  const regressions = []
+  for (const [name, current] of Object.entries(requests)) {
+    const previous = baseline.requests?.[name]
+    if (!previous || previous.p95Ms === 0) continue
+    const change = (current.p95Ms - previous.p95Ms) / previous.p95Ms
+    if (change > threshold) {
+      regressions.push({
+        request: name,
+        "baseline p95 (ms)": previous.p95Ms,
+        "p95 (ms)": current.p95Ms,
+        change: `+${Math.round(change * 100)}%`,
+      })
+    }
+  }
+  return regressions
+}
+
+async function main() {
+  const options = parseArgs(process.argv.slice(2))
+  if (!options.workload) {
+    console.error("Usage: node scripts/replay.mjs <workload.jsonl> [--base URL] [--concurrency N]")
+    process.exit(2)
+  }
+
+  const workload = readWorkload(options.workload)
+  const queue = Array.from({ length: options.repeat }, () => workload).flat()
+  const samples = []
+
+  // Each worker is one client with its own MCP session; workers share one queue, so requests
+  // run concurrently and finish out of order (--concurrency 1 replays strictly in file order)
+  const worker = async () => {
+    const mcp = new McpClient(options.base)
+    for (let entry = queue.shift(); entry; entry = queue.shift()) {
+      const start = performance.now()
+      let status = "error"
+      let ok = false
+      let stages = {}
+      try {
+        const result = await send(entry, options.base, mcp)
+        status = result.response.status
+        ok = result.ok
+        stages = parseServerTiming(result.response.headers.get("Server-Timing"))
+      } catch (error) {
+        console.error(`✗ ${entry.name}: ${error.message}`)
+      }
+      samples.push({ name: entry.name, ms: performance.now() - start, status, ok, stages })
+    }
+  }
+
+  const started = performance.now()
+  await Promise.all(Array.from({ length: options.concurrency }, worker))
+  const elapsed = performance.now() - started
+
+  const requests = summarize(samples)
+  console.table(
+    Object.entries(requests).map(([name, summary]) => ({
+      request: name,
+      count: summary.count,
+      errors: summary.errors,
+      "p50 (ms)": summary.p50Ms,
+      "p95 (ms)": summary.p95Ms,
+      "max (ms)": summary.maxMs,
+    })),
+  )
+  console.log(
+    `✓ ${samples.length} requests in ${round(elapsed)}ms (${round((samples.length / elapsed) * 1000)} req/s)`,
+  )
+
+  let cacheStats
+  try {
+    cacheStats = await (await fetch(new URL("/cache-stats", options.base))).json()
+  } catch {
+    // Older servers have no metrics route
+  }
+
+  const results = {
+    base: options.base,
+    workload: options.workload,
+    concurrency: options.concurrency,
+    repeat: options.repeat,
+    totalMs: round(elapsed),
+    requests,
+    cacheStats,
+  }
+  if (options.out) {
+    writeFileSync(options.out, `${JSON.stringify(results, null, 2)}\n`)
+    console.log(`✓ Results written to ${options.out}`)
+  }
+
+  if (options.baseline) {
+    const baseline = JSON.parse(readFileSync(options.baseline, "utf8"))
+    const regressions = compare(requests, baseline, options.threshold)
+    if (regressions.length > 0) {
+      console.error(`✗ p95 regressed by more than ${options.threshold * 100}%:`)
+      console.table(regressions)
+      process.exit(1)
+    }
+    console.log(`✓ No p95 regressions against ${options.baseline}`)
+  }
+}
+
+main().catch((error) => {
+  console.error(error)
+  process.exit(1)
+})
@@ -1,13 +1,24 @@
-import { StreamableHTTPTransport } from "@hono/mcp"
 import { Hono } from "hono"
-import { cache } from "hono/cache"
 import { cors } from "hono/cors"
 import { HTTPException } from "hono/http-exception"
+import { stream } from "hono/streaming"
 import { trimTrailingSlash } from "hono/trailing-slash"
 
+import { type BatchItem, fetchBatch, MAX_BATCH_SIZE } from "./lib/batch"
+import { acceptVariant, edgeCache } from "./lib/cache"
+import { runWithRequestContext } from "./lib/context"
 import { NotFoundError } from "./lib/fetch"
-import { createMcpServer } from "./lib/mcp"
-import { fetchAndRenderSupportGuide, fetchTableOfContents, searchToc } from "./lib/support"
+import { recordStage, serverTiming } from "./lib/metrics"
+import {
+  DurableObjectSessionStore,
+  type McpSessionStore,
+  MemorySessionStore,
+  SESSION_ID_HEADER,
+} from "./lib/session"
+import { crawlSnapshot, KvSnapshotStore, resumeSnapshotCrawl } from "./lib/snapshot"
+import { getIsolateStats, type IsolateStats, mergeIsolateStats } from "./lib/stats"
+import { configureStorage, type StorageBindings } from "./lib/storage"
+import { fetchSupportGuide, fetchTableOfContents, searchToc } from "./lib/support"
 import {
   fetchTrainingTutorial,
   fetchTrainingTutorialContent,
@@ -16,13 +27,44 @@ import {
   type TrainingCatalogType,
 } from "./lib/training"
 
-interface Env {
+interface Env extends StorageBindings {
   ASSETS: Fetcher
   NODE_ENV: string
+  MCP_SESSIONS?: DurableObjectNamespace
 }
 
 const app = new Hono<{ Bindings: Env }>()
 
+app.use("*", async (c, next) => {
+  configureStorage(c.env)
+
+  let executionCtx: ExecutionContext | undefined
+  try {
+    executionCtx = c.executionCtx
+  } catch {
+    // No execution context outside of the Workers runtime (e.g. app.request in tests)
+  }
+
+  // Stages recorded while handling the request are reported in Server-Timing
+  const timings = new Map<string, number>()
+  const start = performance.now()
+
+  await runWithRequestContext(
+    {
+      waitUntil: executionCtx ? (promise) => executionCtx.waitUntil(promise) : undefined,
+      timings,
+    },
+    next,
+  )
+
+  const total = performance.now() - start
+  timings.set("total", total)
+  recordStage(`route:${c.req.routePath}`, total)
+  // Keep the stages a session Durable Object reported, ahead of this isolate's
+  const upstreamTiming = c.res.headers.get("Server-Timing")
+  c.header("Server-Timing", [upstreamTiming, serverTiming(timings)].filter(Boolean).join(", "))
+})
+
 app.use("*", async (c, next) => {
   await next()
 
@@ -42,25 +84,50 @@ app.use("*", async (c, next) => {
   }
 })
 
-app.use("*", cors())
+app.use("*", cors({ exposeHeaders: [SESSION_ID_HEADER, "Server-Timing"] }))
 
 app.use(trimTrailingSlash())
 
-app.use("*", async (c, next) => {
-  if (c.env.NODE_ENV !== "development") {
-    cache({
-      cacheName: "supportify-cache",
-      cacheControl: "max-age=86400", // 24 hours
-    })
-  }
-  await next()
+// Edge cache for content routes; repeat requests never reach the fetch/parse path
+const contentCache = edgeCache({
+  cacheName: "supportify-cache",
+  cacheControl: "public, max-age=3600, s-maxage=86400",
+  bypass: (env) => (env as Env).NODE_ENV === "development",
 })
+app.use("/guide/*", contentCache)
+app.use("/training/*", contentCache)
+
+// MCP sessions live in Durable Objects when bound, otherwise in this isolate
+const memorySessions = new MemorySessionStore()
+let durableSessions: DurableObjectSessionStore | undefined
+
+function getSessionStore(env: Env): McpSessionStore {
+  if (!env.MCP_SESSIONS) return memorySessions
+  // Kept per isolate so it remembers the sessions it routed, for /cache-stats
+  durableSessions ??= new DurableObjectSessionStore(env.MCP_SESSIONS)
+  return durableSessions
+}
 
-const mcpServer = createMcpServer()
-app.all("/mcp", async (c) => {
-  const transport = new StreamableHTTPTransport()
-  await mcpServer.connect(transport)
-  return transport.handleRequest(c)
+app.all("/mcp", (c) => {
+  const sessionId = c.req.header(SESSION_ID_HEADER)
+  const sessions = getSessionStore(c.env)
+
+  // Requests without a session ID start a new session
+  return sessionId
+    ? sessions.handle(sessionId, c.req.raw, false)
+    : sessions.handle(crypto.randomUUID(), c.req.raw, true)
+})
+
+// Metrics route: stage timings, cache counters and upstream statuses of this isolate,
+// merged with those of the MCP session Durable Objects it routed recently
+app.get("/cache-stats", async (c) => {
+  const sessions = getSessionStore(c.env)
+  const isolates: IsolateStats[] = [getIsolateStats()]
+  if (sessions instanceof DurableObjectSessionStore) {
+    isolates.push(...(await sessions.stats()))
+  }
+
+  return c.json(mergeIsolateStats(isolates), 200, { "Cache-Control": "no-store" })
 })
 
 // Table of Contents route: /guide/{guide-name}/toc
@@ -118,6 +185,77 @@ app.get("/guide/:guide/search", async (c) => {
   }
 })
 
+// Batch route: POST /guide/{guide-name}/batch
+// Body: { "paths": string[], "tutorials"?: string[], "catalog"?: string, "concurrency"?: number }
+// Streams one NDJSON line per item as soon as it is ready, then a summary line
+app.post("/guide/:guide/batch", async (c) => {
+  const guide = c.req.param("guide")
+
+  if (guide !== "security" && guide !== "deployment") {
+    return c.json({ error: "Invalid guide name" }, 400)
+  }
+
+  let body: {
+    paths?: unknown
+    tutorials?: unknown
+    catalog?: unknown
+    concurrency?: unknown
+  }
+  try {
+    body = await c.req.json()
+  } catch {
+    return c.json({ error: "Request body must be JSON" }, 400)
+  }
+
+  const isStringArray = (value: unknown): value is string[] =>
+    Array.isArray(value) && value.every((item) => typeof item === "string" && item.trim())
+
+  const paths = body.paths ?? []
+  const tutorials = body.tutorials ?? []
+  if (!isStringArray(paths) || !isStringArray(tutorials)) {
+    return c.json({ error: "'paths' and 'tutorials' must be arrays of non-empty strings" }, 400)
+  }
+
+  const catalogType = (body.catalog ?? "apt-support") as TrainingCatalogType
+  if (catalogType !== "apt-support" && catalogType !== "apt-deployment") {
+    return c.json(
+      {
+        error: `Invalid catalog type: ${catalogType}. Must be "apt-support" or "apt-deployment"`,
+      },
+      400,
+    )
+  }
+
+  if (body.concurrency !== undefined && typeof body.concurrency !== "number") {
+    return c.json({ error: "'concurrency' must be a number" }, 400)
+  }
+
+  const items: BatchItem[] = [
+    ...paths.map((path): BatchItem => ({ type: "guide", guide, path })),
+    ...tutorials.map(
+      (tutorialId): BatchItem => ({ type: "training", tutorialId, catalog: catalogType }),
+    ),
+  ]
+
+  if (items.length === 0 || items.length > MAX_BATCH_SIZE) {
+    return c.json({ error: `A batch must contain between 1 and ${MAX_BATCH_SIZE} items` }, 400)
+  }
+
+  c.header("Content-Type", "application/x-ndjson; charset=utf-8")
+  c.header("Cache-Control", "no-store")
+
+  return stream(c, async (output) => {
+    let failed = 0
+    for await (const result of fetchBatch(items, body.concurrency as number | undefined)) {
+      if (result.status === "error") failed++
+      await output.writeln(JSON.stringify(result))
+    }
+    await output.writeln(
+      JSON.stringify({ done: true, total: items.length, succeeded: items.length - failed, failed }),
+    )
+  })
+})
+
 // Main route for support guides: /guide/{guide-name}/{path}
 app.get("/guide/:guide/:path{.+}", async (c) => {
   const guide = c.req.param("guide")
@@ -155,7 +293,7 @@ This service works with Apple Platform guides:
 
   try {
     const sourceUrl = `https://support.apple.com/guide/${guide}/${path}/web`
-    const markdown = await fetchAndRenderSupportGuide(guide, path, sourceUrl)
+    const { markdown, publishedDate } = await fetchSupportGuide(guide, path, sourceUrl)
 
     // Validate that we got meaningful content
     if (!markdown || markdown.trim().length < 100) {
@@ -165,15 +303,18 @@ This service works with Apple Platform guides:
       })
     }
 
-    const headers = {
+    // ETags are content hashes added by the edge cache; Last-Modified is the page's published date
+    const headers: Record<string, string> = {
       "Content-Type": "text/markdown; charset=utf-8",
       "Content-Location": sourceUrl,
       "Cache-Control": "public, max-age=3600, s-maxage=86400",
-      ETag: `"${Buffer.from(markdown).toString("base64").slice(0, 16)}"`,
-      "Last-Modified": new Date().toUTCString(),
+    }
+    const published = publishedDate ? new Date(publishedDate) : undefined
+    if (published && !Number.isNaN(published.getTime())) {
+      headers["Last-Modified"] = published.toUTCString()
     }
 
-    if (c.req.header("Accept")?.includes("application/json")) {
+    if (acceptVariant(c.req.header("Accept")) === "json") {
       return c.json(
         {
           url: sourceUrl,
@@ -282,7 +423,6 @@ app.get("/training/search", async (c) => {
 // Training tutorial route: /training/{tutorialId}?catalog={catalog}
 app.get("/training/:tutorialId", async (c) => {
   const tutorialId = c.req.param("tutorialId")
-  const acceptHeader = c.req.header("accept") || ""
   const catalogType = (c.req.query("catalog") as TrainingCatalogType) || "apt-support"
 
   // Validate catalog type
@@ -297,7 +437,7 @@ app.get("/training/:tutorialId", async (c) => {
 
   try {
     // Check if markdown content is requested
-    if (acceptHeader.includes("text/markdown") || acceptHeader.includes("text/plain")) {
+    if (acceptVariant(c.req.header("Accept")) === "markdown") {
       const markdown = await fetchTrainingTutorialContent(tutorialId, catalogType)
       return c.text(markdown, 200, { "Content-Type": "text/markdown; charset=utf-8" })
     }
@@ -353,6 +493,7 @@ Making Apple Support guides and training tutorials AI-readable.
 /guide/{guide-name}/{page-path}
 /guide/{guide-name}/toc
 /guide/{guide-name}/search?q={query}
+POST /guide/{guide-name}/batch  {"paths": [...], "tutorials": [...]}
 \`\`\`
 
 **Training Tutorials:**
@@ -362,6 +503,11 @@ Making Apple Support guides and training tutorials AI-readable.
 /training/{tutorialId}?catalog={apt-support|apt-deployment}
 \`\`\`
 
+**Metrics:**
+\`\`\`
+/cache-stats
+\`\`\`
+
 ### Examples
 
 **Support Guides:**
@@ -382,6 +528,7 @@ Connect to \`/mcp\` endpoint for Model Context Protocol support.
 **Available MCP Tools:**
 - \`searchAppleSupportGuide\` - Search security/deployment guides
 - \`fetchAppleSupportGuide\` - Fetch guide content as markdown
+- \`fetchAppleSupportGuides\` - Fetch several guide pages and training tutorials at once
 - \`searchAppleTraining\` - Search training tutorials
 - \`fetchAppleTraining\` - Fetch training tutorial details
 - \`listAppleTrainingCatalog\` - Get complete course structure
@@ -434,8 +581,7 @@ app.onError((err, c) => {
   }
 
   if (err instanceof NotFoundError) {
-    const accept = c.req.header("Accept")
-    if (accept?.includes("application/json")) {
+    if (acceptVariant(c.req.header("Accept")) === "json") {
       return c.json(
         {
           error: "Support guide not found",
@@ -470,8 +616,7 @@ The requested Apple Support guide page does not exist.
   }
 
   // Handle unexpected errors
-  const accept = c.req.header("Accept")
-  if (accept?.includes("application/json")) {
+  if (acceptVariant(c.req.header("Accept")) === "json") {
     return c.json(
       {
         error: "Service temporarily unavailable",
@@ -508,4 +653,29 @@ If this issue persists, please report it.
   )
 })
 
-export default app
+/** Cron (as in wrangler.jsonc) starting the daily snapshot crawl */
+const SNAPSHOT_CRAWL_CRON = "17 4 * * *"
+
+/**
+ * Cron triggers: the daily one starts crawling the guides and training
+ * catalogs into a fresh snapshot, the frequent one continues the crawl in
+ * batches until it is published
+ */
+const scheduled: ExportedHandlerScheduledHandler<Env> = async (controller, env, ctx) => {
+  const start = controller.cron === SNAPSHOT_CRAWL_CRON
+
+  if (!env.SNAPSHOT_KV) {
+    // The resume trigger fires every few minutes; only the daily one is worth a log line
+    if (start) console.log("Skipping snapshot crawl: SNAPSHOT_KV is not bound")
+    return
+  }
+
+  // Without a crawl in progress, resuming reads the cursor and returns
+  const store = new KvSnapshotStore(env.SNAPSHOT_KV)
+  ctx.waitUntil(start ? crawlSnapshot(store) : resumeSnapshotCrawl(store))
+}
+
+export { McpSessionObject } from "./lib/session"
+export { app }
+
+export default { fetch: app.fetch, scheduled }
@@ -0,0 +1,125 @@
+/**
+ * Batch fetching utilities
+ * Fetches many guide pages and training tutorials with bounded concurrency
+ */
+
+import { NotFoundError } from "./fetch"
+import { fetchAndRenderSupportGuide } from "./support"
+import {
+  fetchTrainingTutorialContent,
+  getTrainingTutorialUrl,
+  type TrainingCatalogType,
+} from "./training"
+
+export const DEFAULT_BATCH_CONCURRENCY = 4
+export const MAX_BATCH_CONCURRENCY = 8
+export const MAX_BATCH_SIZE = 25
+
+export type Settled<T, R> = { index: number; item: T } & (
+  | { ok: true; value: R }
+  | { ok: false; error: unknown }
+)
+
+/**
+ * Map items through an async function with at most `concurrency` calls
+ * running at once, yielding each result as soon as it settles
+ *
+ * Results are yielded in completion order; use `index` to restore input order.
+ */
+export async function* mapWithConcurrency<T, R>(
+  items: readonly T[],
+  concurrency: number,
+  fn: (item: T, index: number) => Promise<R>,
+): AsyncGenerator<Settled<T, R>> {
+  const running = new Map<number, Promise<Settled<T, R>>>()
+  let next = 0
+
+  const start = (index: number) => {
+    const item = items[index]
+    const settled = fn(item, index).then(
+      (value): Settled<T, R> => ({ index, item, ok: true, value }),
+      (error): Settled<T, R> => ({ index, item, ok: false, error }),
+    )
+    running.set(index, settled)
+  }
+
+  while (next < items.length || running.size > 0) {
+    while (next < items.length && running.size < Math.max(1, concurrency)) {
+      start(next++)
+    }
+
+    const settled = await Promise.race(running.values())
+    running.delete(settled.index)
+    yield settled
+  }
+}
+
+/**
+ * A single item of a batch fetch
+ */
+export type BatchItem =
+  | { type: "guide"; guide: "security" | "deployment"; path: string }
+  | { type: "training"; tutorialId: string; catalog: TrainingCatalogType }
+
+export type BatchItemResult = {
+  index: number
+  type: BatchItem["type"]
+  id: string
+  url: string
+} & ({ status: "ok"; content: string } | { status: "error"; notFound: boolean; error: string })
+
+function describeItem(item: BatchItem): { id: string; url: string } {
+  if (item.type === "guide") {
+    const path = item.path.replace(/^\/+|\/+$/g, "")
+    return {
+      id: `${item.guide}/${path}`,
+      url: `https://support.apple.com/guide/${item.guide}/${path}/web`,
+    }
+  }
+
+  return {
+    id: `${item.catalog}/${item.tutorialId}`,
+    url: getTrainingTutorialUrl(item.tutorialId, item.catalog),
+  }
+}
+
+async function fetchItem(item: BatchItem): Promise<string> {
+  if (item.type === "training") {
+    return fetchTrainingTutorialContent(item.tutorialId, item.catalog)
+  }
+
+  const { url } = describeItem(item)
+  const markdown = await fetchAndRenderSupportGuide(item.guide, item.path, url)
+  if (!markdown || markdown.trim().length < 100) {
+    throw new Error("Insufficient content in support guide page")
+  }
+  return markdown
+}
+
+/**
+ * Fetch guide pages and training tutorials with bounded concurrency,
+ * yielding each result as soon as it is ready
+ *
+ * Failures are reported per item and never abort the rest of the batch.
+ *
+ * @param items - Pages and tutorials to fetch
+ * @param concurrency - Maximum number of concurrent fetches
+ */
+export async function* fetchBatch(
+  items: readonly BatchItem[],
+  concurrency = DEFAULT_BATCH_CONCURRENCY,
+): AsyncGenerator<BatchItemResult> {
+  const limit = Math.min(Math.max(1, Math.floor(concurrency)), MAX_BATCH_CONCURRENCY)
+
+  for await (const settled of mapWithConcurrency(items, limit, fetchItem)) {
+    const { id, url } = describeItem(settled.item)
+    const base = { index: settled.index, type: settled.item.type, id, url }
+
+    if (settled.ok) {
+      yield { ...base, status: "ok", content: settled.value }
+    } else {
+      const error = settled.error instanceof Error ? settled.error.message : "Unknown error"
+      yield { ...base, status: "error", notFound: settled.error instanceof NotFoundError, error }
+    }
+  }
+}
@@ -0,0 +1,181 @@
+/**
+ * Catalog cache with stale-while-revalidate refresh
+ * Used for the guide tables of contents and the training catalogs, which are
+ * large, change rarely and are needed by every search
+ */
+
+import { waitUntil } from "../context"
+import { countCacheEvent } from "../metrics"
+import { UpstreamError } from "../upstream"
+import { CONTENT_CACHE } from "./content"
+import { getPersistentStore } from "./store"
+
+/**
+ * A catalog as loaded from upstream
+ */
+export interface CatalogRevision<T> {
+  value: T
+  /** ETag upstream sent with the value, used to revalidate it */
+  etag?: string
+}
+
+export interface CatalogCacheOptions<T> {
+  /** Namespace for keys in the persistent tier */
+  name: string
+  /**
+   * Load a fresh value from upstream
+   * Given the cached revision, the loader may revalidate it and return it unchanged
+   */
+  load: (key: string, cached?: CatalogRevision<T>) => Promise<CatalogRevision<T>>
+  /** How long a value is served without refreshing (ms) */
+  ttl: number
+  /** How long a stale value may still be served while refreshing (ms) */
+  maxStale: number
+  /** How long past `maxStale` a value is kept, served only when upstream is failing (ms) */
+  staleIfError?: number
+}
+
+interface CatalogEntry<T> extends CatalogRevision<T> {
+  fetchedAt: number
+}
+
+/**
+ * Two-tier cache (shared isolate LRU + optional persistent store) for catalog data
+ *
+ * - Fresh entries are returned immediately
+ * - Stale entries are returned immediately and refreshed in the background
+ * - Older entries are refreshed first, but still served if upstream is failing
+ * - Concurrent refreshes of the same key share a single upstream request
+ */
+export class CatalogCache<T> {
+  private inflight = new Map<string, Promise<T>>()
+
+  constructor(private readonly options: CatalogCacheOptions<T>) {}
+
+  /**
+   * Get a catalog, only waiting on upstream when nothing usable is cached
+   */
+  async get(key: string): Promise<T> {
+    const entry =
+      (CONTENT_CACHE.get(this.storageKey(key)) as CatalogEntry<T> | undefined) ??
+      (await this.readPersistent(key))
+
+    if (entry) {
+      const age = Date.now() - entry.fetchedAt
+
+      if (age < this.options.ttl) {
+        this.count("fresh")
+        return entry.value
+      }
+
+      if (age < this.options.ttl + this.options.maxStale) {
+        this.count("stale")
+        console.log(`⟳ Serving stale ${this.options.name}/${key}, refreshing in background`)
+        waitUntil(this.refresh(key, entry))
+        return entry.value
+      }
+    }
+
+    this.count("miss")
+    try {
+      return await this.refresh(key, entry)
+    } catch (error) {
+      if (entry && error instanceof UpstreamError) {
+        this.count("stale-if-error")
+        console.log(`⟳ Upstream failing, serving stale ${this.options.name}/${key}`)
+        return entry.value
+      }
+      throw error
+    }
+  }
+
+  /**
+   * Load a fresh value, de-duplicating concurrent refreshes of the same key
+   *
+   * @param cached - Revision to revalidate rather than download again
+   */
+  refresh(key: string, cached?: CatalogRevision<T>): Promise<T> {
+    const pending = this.inflight.get(key)
+    if (pending) return pending
+
+    const promise = this.options
+      .load(key, cached && { value: cached.value, etag: cached.etag })
+      .then(({ value, etag }) => {
+        this.count(value === cached?.value ? "revalidated" : "refreshed")
+        this.set(key, value, { etag })
+        return value
+      })
+      .finally(() => {
+        this.inflight.delete(key)
+      })
+
+    this.inflight.set(key, promise)
+    return promise
+  }
+
+  /**
+   * Store a value in memory and in the persistent tier
+   */
+  set(key: string, value: T, options: { etag?: string; fetchedAt?: number } = {}): void {
+    const fetchedAt = options.fetchedAt ?? Date.now()
+    const entry: CatalogEntry<T> = { value, etag: options.etag, fetchedAt }
+    const serialized = JSON.stringify(entry)
+    this.remember(key, entry, serialized.length * 2)
+
+    const store = getPersistentStore()
+    if (store) {
+      const expirationTtl = Math.ceil(this.retention / 1000)
+      waitUntil(store.put(this.storageKey(key), serialized, { expirationTtl }))
+    }
+  }
+
+  /**
+   * Drop all in-memory entries (the persistent tier is left untouched)
+   */
+  clear(): void {
+    CONTENT_CACHE.deletePrefix(this.storageKey(""))
+    this.inflight.clear()
+  }
+
+  /**
+   * How long an entry may be served in any circumstances (ms)
+   */
+  private get retention(): number {
+    return this.options.ttl + this.options.maxStale + (this.options.staleIfError ?? 0)
+  }
+
+  /**
+   * Keep an entry in the shared in-memory cache for as long as it may be served
+   */
+  private remember(key: string, entry: CatalogEntry<T>, size: number) {
+    const ttl = entry.fetchedAt + this.retention - Date.now()
+    if (ttl > 0) CONTENT_CACHE.set(this.storageKey(key), entry, { ttl, size })
+  }
+
+  private count(event: string) {
+    countCacheEvent(`catalog:${this.options.name}`, event)
+  }
+
+  private storageKey(key: string): string {
+    return `catalog:${this.options.name}:${key}`
+  }
+
+  private async readPersistent(key: string): Promise<CatalogEntry<T> | undefined> {
+    const store = getPersistentStore()
+    if (!store) return undefined
+
+    try {
+      const raw = await store.get(this.storageKey(key))
+      if (!raw) return undefined
+
+      const entry = JSON.parse(raw) as CatalogEntry<T>
+      this.remember(key, entry, raw.length * 2)
+      this.count("persistent-hit")
+      console.log(`✓ Loaded ${this.options.name}/${key} from persistent cache`)
+      return entry
+    } catch (error) {
+      console.error(`Failed to read ${this.options.name}/${key} from persistent cache:`, error)
+      return undefined
+    }
+  }
+}
@@ -0,0 +1,39 @@
+/**
+ * Shared in-memory cache for guide pages, Markdown, tutorials and catalogs
+ * Keys are namespaced by kind, e.g. "markdown:security/welcome"
+ */
+
+import { countCacheEvent } from "../metrics"
+import { UpstreamError } from "../upstream"
+import { LruCache } from "./lru"
+
+/** Byte budget of the shared cache, well within a Worker isolate's 128 MB */
+export const CONTENT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+/** Pages, Markdown and tutorials are kept for 24 hours */
+export const CONTENT_TTL = 1000 * 60 * 60 * 24
+
+/** Past that, they are kept for 7 more days, served only while Apple is failing */
+export const CONTENT_STALE_IF_ERROR = 1000 * 60 * 60 * 24 * 7
+
+export const CONTENT_CACHE = new LruCache<unknown>({
+  maxBytes: CONTENT_CACHE_MAX_BYTES,
+  ttl: CONTENT_TTL,
+  staleTtl: CONTENT_STALE_IF_ERROR,
+})
+
+/**
+ * Recover from a failed upstream fetch with the expired copy of `key`, if
+ * still kept; otherwise (or for errors such as 404s) rethrow the error
+ */
+export function serveStaleContent<T>(key: string, error: unknown): T {
+  if (error instanceof UpstreamError) {
+    const stale = CONTENT_CACHE.getStale(key) as T | undefined
+    if (stale !== undefined) {
+      countCacheEvent("content", "stale-if-error")
+      console.log(`⟳ Serving stale ${key}: ${error.message}`)
+      return stale
+    }
+  }
+  throw error
+}
@@ -0,0 +1,153 @@
+/**
+ * Edge response cache middleware
+ * Serves repeat GET requests from the data center's Cache API before they
+ * reach route handlers, and answers conditional requests with 304s
+ */
+
+import type { MiddlewareHandler } from "hono"
+import { waitUntil } from "../context"
+import { countCacheEvent } from "../metrics"
+
+export interface EdgeCacheOptions {
+  /** Name of the Cache API cache */
+  cacheName: string
+  /** Cache-Control applied to cacheable responses that don't set their own */
+  cacheControl: string
+  /** Skip caching entirely when this returns true (e.g. during development) */
+  bypass?: (env: unknown) => boolean
+}
+
+// Base URL for cache keys, so keys never collide with real upstream URLs
+const CACHE_KEY_BASE = "https://supportify.edge-cache"
+
+/**
+ * Representation a request asks for, based on its Accept header
+ * Routes negotiate with this too, so each cache key variant holds the
+ * representation the route serves for it
+ */
+export function acceptVariant(accept: string | undefined): "json" | "markdown" | "default" {
+  if (!accept) return "default"
+  if (accept.includes("application/json")) return "json"
+  if (accept.includes("text/markdown") || accept.includes("text/plain")) return "markdown"
+  return "default"
+}
+
+/**
+ * Cache key for a request: path, sorted query parameters and Accept variant
+ */
+export function edgeCacheKey(request: Request): Request {
+  const url = new URL(request.url)
+  const params = [...url.searchParams].sort(([a], [b]) => a.localeCompare(b))
+  const search = new URLSearchParams(params)
+  search.set("variant", acceptVariant(request.headers.get("Accept") ?? undefined))
+
+  return new Request(`${CACHE_KEY_BASE}${url.pathname}?${search}`, { method: "GET" })
+}
+
+/**
+ * Strong ETag derived from a SHA-256 hash of the body
+ */
+export async function contentHashETag(body: ArrayBuffer | string): Promise<string> {
+  const bytes = typeof body === "string" ? new TextEncoder().encode(body) : body
+  const digest = await crypto.subtle.digest("SHA-256", bytes)
+  const hex = [...new Uint8Array(digest)].map((b) => b.toString(16).padStart(2, "0")).join("")
+  return `"${hex.slice(0, 32)}"`
+}
+
+/**
+ * Whether the client's cached copy (per If-None-Match / If-Modified-Since) is current
+ */
+export function isNotModified(request: Request, response: Response): boolean {
+  const ifNoneMatch = request.headers.get("If-None-Match")
+  const etag = response.headers.get("ETag")
+
+  // If-None-Match takes precedence over If-Modified-Since when both are present
+  if (ifNoneMatch) {
+    if (!etag) return false
+    if (ifNoneMatch.trim() === "*") return true
+    const weakless = (tag: string) => tag.trim().replace(/^W\//, "")
+    return ifNoneMatch.split(",").some((tag) => weakless(tag) === weakless(etag))
+  }
+
+  const ifModifiedSince = request.headers.get("If-Modified-Since")
+  const lastModified = response.headers.get("Last-Modified")
+  if (!ifModifiedSince || !lastModified) return false
+
+  const since = Date.parse(ifModifiedSince)
+  const modified = Date.parse(lastModified)
+  return !Number.isNaN(since) && !Number.isNaN(modified) && modified <= since
+}
+
+/**
+ * 304 response carrying the validators and caching headers of `response`
+ */
+function notModified(response: Response): Response {
+  const headers = new Headers()
+  for (const name of ["Cache-Control", "Content-Location", "ETag", "Expires", "Last-Modified"]) {
+    const value = response.headers.get(name)
+    if (value) headers.set(name, value)
+  }
+  return new Response(null, { status: 304, headers })
+}
+
+function isCacheable(response: Response): boolean {
+  if (response.status !== 200 || response.headers.has("Set-Cookie")) return false
+  const cacheControl = response.headers.get("Cache-Control") ?? ""
+  return !/no-store|private|no-cache/.test(cacheControl)
+}
+
+/**
+ * Middleware caching successful GET responses in the Cache API
+ *
+ * - Cache keys are normalized on query parameter order and the Accept variant
+ * - Responses get a content-hash ETag when the route didn't set one
+ * - Conditional requests are answered with 304 from cached or fresh responses
+ */
+export function edgeCache(options: EdgeCacheOptions): MiddlewareHandler {
+  return async (c, next) => {
+    if (c.req.method !== "GET" || options.bypass?.(c.env) || typeof caches === "undefined") {
+      await next()
+      return
+    }
+
+    const key = edgeCacheKey(c.req.raw)
+    const cache = await caches.open(options.cacheName)
+
+    const cached = await cache.match(key)
+    if (cached) {
+      // Replace (rather than merge into) any response prepared so far
+      c.res = undefined
+      if (isNotModified(c.req.raw, cached)) {
+        c.res = notModified(cached)
+      } else {
+        c.res = new Response(cached.body, cached)
+      }
+      c.header("X-Cache", "HIT")
+      countCacheEvent("edge", c.res.status === 304 ? "not-modified" : "hit")
+      return
+    }
+
+    await next()
+
+    if (!isCacheable(c.res)) {
+      countCacheEvent("edge", "uncacheable")
+      return
+    }
+    countCacheEvent("edge", "miss")
+
+    const body = await c.res.arrayBuffer()
+    const response = new Response(body, c.res)
+    if (!response.headers.has("Cache-Control")) {
+      response.headers.set("Cache-Control", options.cacheControl)
+    }
+    if (!response.headers.has("ETag")) {
+      response.headers.set("ETag", await contentHashETag(body))
+    }
+
+    waitUntil(cache.put(key, response.clone()))
+
+    c.res = undefined
+    c.res = isNotModified(c.req.raw, response) ? notModified(response) : response
+    c.header("X-Cache", "MISS")
+  }
+}
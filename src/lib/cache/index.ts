@@ -0,0 +1,28 @@
+/**
+ * Caching layer shared by the guide and training modules
+ */
+
+export type { CatalogCacheOptions, CatalogRevision } from "./catalog"
+export { CatalogCache } from "./catalog"
+export {
+  CONTENT_CACHE,
+  CONTENT_CACHE_MAX_BYTES,
+  CONTENT_STALE_IF_ERROR,
+  CONTENT_TTL,
+  serveStaleContent,
+} from "./content"
+export type { EdgeCacheOptions } from "./edge"
+export { acceptVariant, contentHashETag, edgeCache, edgeCacheKey, isNotModified } from "./edge"
+export type { LruCacheOptions, LruCacheStats, LruSetOptions } from "./lru"
+export { estimateSize, LruCache } from "./lru"
+export type { PersistentStore } from "./store"
+export { CacheApiStore, getPersistentStore, MemoryStore, setPersistentStore } from "./store"
+
+/** Catalogs are served without refreshing for 6 hours */
+export const CATALOG_TTL = 1000 * 60 * 60 * 6
+
+/** Stale catalogs are still served (while refreshing) for up to 7 days */
+export const CATALOG_MAX_STALE = 1000 * 60 * 60 * 24 * 7
+
+/** Past that, catalogs are kept for 30 more days, served only while Apple is failing */
+export const CATALOG_STALE_IF_ERROR = 1000 * 60 * 60 * 24 * 30
@@ -0,0 +1,215 @@
+/**
+ * In-memory LRU cache bounded by an approximate byte budget
+ * Entries expire after a TTL; expired entries are dropped on access and by
+ * periodic sweeps during writes, unless they are kept for a stale window
+ */
+
+export interface LruCacheOptions {
+  /** Approximate upper bound on the memory held by cached values */
+  maxBytes: number
+  /** Default time-to-live of an entry (ms) */
+  ttl: number
+  /**
+   * How long expired entries are kept for `getStale` (ms, default 0), e.g. to
+   * serve while the origin is failing. They still count towards the budget.
+   */
+  staleTtl?: number
+  /** Minimum time between full sweeps for expired entries (ms, default 60s) */
+  sweepInterval?: number
+}
+
+export interface LruSetOptions {
+  /** Time-to-live of this entry (ms), overriding the default */
+  ttl?: number
+  /** Size of the value in bytes, when already known */
+  size?: number
+}
+
+export interface LruCacheStats {
+  entries: number
+  bytes: number
+  maxBytes: number
+  hits: number
+  misses: number
+  evictions: number
+  expirations: number
+}
+
+interface LruEntry<V> {
+  value: V
+  size: number
+  expiresAt: number
+  /** When the entry is dropped, at or after `expiresAt` */
+  staleUntil: number
+}
+
+/**
+ * Approximate memory footprint of a value (JavaScript strings are UTF-16)
+ */
+export function estimateSize(value: unknown): number {
+  if (typeof value === "string") return value.length * 2
+  if (value === undefined) return 0
+  return (JSON.stringify(value)?.length ?? 0) * 2
+}
+
+/**
+ * Least-recently-used cache
+ *
+ * Relies on Map preserving insertion order: reads re-insert the entry, so the
+ * first key is always the least recently used one.
+ */
+export class LruCache<V> {
+  private entries = new Map<string, LruEntry<V>>()
+  private bytes = 0
+  private lastSweep = Date.now()
+  private counters = { hits: 0, misses: 0, evictions: 0, expirations: 0 }
+
+  constructor(private readonly options: LruCacheOptions) {}
+
+  get(key: string): V | undefined {
+    const entry = this.entries.get(key)
+
+    if (!entry) {
+      this.counters.misses++
+      return undefined
+    }
+
+    const now = Date.now()
+    if (entry.expiresAt <= now) {
+      if (entry.staleUntil <= now) {
+        this.remove(key, entry)
+        this.counters.expirations++
+      }
+      this.counters.misses++
+      return undefined
+    }
+
+    // Move to the most recently used position
+    this.entries.delete(key)
+    this.entries.set(key, entry)
+    this.counters.hits++
+    return entry.value
+  }
+
+  /**
+   * Get an entry even if it has expired, as long as it is within its stale
+   * window, without affecting recency or hit counters
+   */
+  getStale(key: string): V | undefined {
+    const entry = this.entries.get(key)
+    return entry && entry.staleUntil > Date.now() ? entry.value : undefined
+  }
+
+  /**
+   * Check for a live entry without affecting recency or hit counters
+   */
+  has(key: string): boolean {
+    const entry = this.entries.get(key)
+    return entry !== undefined && entry.expiresAt > Date.now()
+  }
+
+  /**
+   * Store a value, evicting least recently used entries to stay within budget
+   *
+   * @returns false when the value alone exceeds the byte budget and was not stored
+   */
+  set(key: string, value: V, options: LruSetOptions = {}): boolean {
+    const now = Date.now()
+    if (now - this.lastSweep >= (this.options.sweepInterval ?? 60_000)) {
+      this.sweep(now)
+    }
+
+    const existing = this.entries.get(key)
+    if (existing) this.remove(key, existing)
+
+    const size = options.size ?? estimateSize(value)
+    if (size > this.options.maxBytes) return false
+
+    while (this.bytes + size > this.options.maxBytes) {
+      const oldest = this.entries.keys().next().value
+      if (oldest === undefined) break
+      this.remove(oldest, this.entries.get(oldest) as LruEntry<V>)
+      this.counters.evictions++
+    }
+
+    const expiresAt = now + (options.ttl ?? this.options.ttl)
+    const staleUntil = expiresAt + (this.options.staleTtl ?? 0)
+    this.entries.set(key, { value, size, expiresAt, staleUntil })
+    this.bytes += size
+    return true
+  }
+
+  delete(key: string): boolean {
+    const entry = this.entries.get(key)
+    if (!entry) return false
+    this.remove(key, entry)
+    return true
+  }
+
+  /**
+   * Delete every entry whose key starts with `prefix`
+   */
+  deletePrefix(prefix: string): number {
+    let deleted = 0
+    for (const [key, entry] of this.entries) {
+      if (key.startsWith(prefix)) {
+        this.remove(key, entry)
+        deleted++
+      }
+    }
+    return deleted
+  }
+
+  /**
+   * Drop all expired entries past their stale window
+   */
+  sweep(now = Date.now()): number {
+    this.lastSweep = now
+    let expired = 0
+    for (const [key, entry] of this.entries) {
+      if (entry.staleUntil <= now) {
+        this.remove(key, entry)
+        expired++
+      }
+    }
+    this.counters.expirations += expired
+    return expired
+  }
+
+  clear(): void {
+    this.entries.clear()
+    this.bytes = 0
+  }
+
+  get size(): number {
+    return this.entries.size
+  }
+
+  stats(): LruCacheStats {
+    return {
+      entries: this.entries.size,
+      bytes: this.bytes,
+      maxBytes: this.options.maxBytes,
+      ...this.counters,
+    }
+  }
+
+  /**
+   * Entries and bytes per kind of key, the part before the first ":" (e.g. "markdown")
+   */
+  usage(): Record<string, { entries: number; bytes: number }> {
+    const usage: Record<string, { entries: number; bytes: number }> = {}
+    for (const [key, entry] of this.entries) {
+      const kind = key.split(":", 1)[0]
+      usage[kind] ??= { entries: 0, bytes: 0 }
+      usage[kind].entries++
+      usage[kind].bytes += entry.size
+    }
+    return usage
+  }
+
+  private remove(key: string, entry: LruEntry<V>) {
+    this.entries.delete(key)
+    this.bytes -= entry.size
+  }
+}
@@ -0,0 +1,99 @@
+/**
+ * Persistent cache tiers
+ * Shared across isolates so cold starts can begin with warm catalogs
+ */
+
+export interface PersistentStore {
+  get(key: string): Promise<string | null>
+  put(key: string, value: string, options?: { expirationTtl?: number }): Promise<void>
+}
+
+/**
+ * In-memory store, used in tests and when no persistent tier is configured
+ */
+export class MemoryStore implements PersistentStore {
+  private entries = new Map<string, { value: string; expiresAt?: number }>()
+
+  async get(key: string): Promise<string | null> {
+    const entry = this.entries.get(key)
+    if (!entry) return null
+
+    if (entry.expiresAt !== undefined && Date.now() >= entry.expiresAt) {
+      this.entries.delete(key)
+      return null
+    }
+
+    return entry.value
+  }
+
+  async put(key: string, value: string, options?: { expirationTtl?: number }): Promise<void> {
+    const expiresAt =
+      options?.expirationTtl !== undefined ? Date.now() + options.expirationTtl * 1000 : undefined
+    this.entries.set(key, { value, expiresAt })
+  }
+
+  get size(): number {
+    return this.entries.size
+  }
+
+  clear(): void {
+    this.entries.clear()
+  }
+}
+
+/**
+ * Store backed by the Workers Cache API (per data center, no binding required)
+ */
+export class CacheApiStore implements PersistentStore {
+  private cachePromise?: Promise<Cache>
+
+  constructor(private readonly cacheName: string) {}
+
+  private open(): Promise<Cache> {
+    if (!this.cachePromise) {
+      this.cachePromise = caches.open(this.cacheName)
+    }
+    return this.cachePromise
+  }
+
+  private requestFor(key: string): Request {
+    return new Request(`https://supportify.cache/${encodeURIComponent(key)}`)
+  }
+
+  async get(key: string): Promise<string | null> {
+    const cache = await this.open()
+    const response = await cache.match(this.requestFor(key))
+    return response ? await response.text() : null
+  }
+
+  async put(key: string, value: string, options?: { expirationTtl?: number }): Promise<void> {
+    const cache = await this.open()
+    const maxAge = options?.expirationTtl ?? 60 * 60 * 24
+    await cache.put(
+      this.requestFor(key),
+      new Response(value, {
+        headers: {
+          "Content-Type": "application/json; charset=utf-8",
+          "Cache-Control": `public, max-age=${maxAge}`,
+        },
+      }),
+    )
+  }
+}
+
+let persistentStore: PersistentStore | undefined
+
+/**
+ * Configure the persistent tier used by catalog caches
+ * Pass `undefined` to disable persistence
+ */
+export function setPersistentStore(store: PersistentStore | undefined): void {
+  persistentStore = store
+}
+
+/**
+ * Get the currently configured persistent tier, if any
+ */
+export function getPersistentStore(): PersistentStore | undefined {
+  return persistentStore
+}
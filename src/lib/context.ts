@@ -0,0 +1,44 @@
+/**
+ * Per-request context shared by the library modules
+ * Lets deep callers (MCP tools, caches) reach the Worker's execution context
+ * without threading it through every function signature
+ */
+
+import { AsyncLocalStorage } from "node:async_hooks"
+
+export interface RequestContext {
+  waitUntil?: (promise: Promise<unknown>) => void
+  /** Time spent in each stage while handling the request (ms), for Server-Timing */
+  timings?: Map<string, number>
+}
+
+const storage = new AsyncLocalStorage<RequestContext>()
+
+/**
+ * Run a function with the given request context
+ */
+export function runWithRequestContext<T>(context: RequestContext, fn: () => T): T {
+  return storage.run(context, fn)
+}
+
+/**
+ * Get the context of the request currently being handled, if any
+ */
+export function getRequestContext(): RequestContext | undefined {
+  return storage.getStore()
+}
+
+/**
+ * Keep background work alive after the response has been sent
+ * Falls back to a detached promise outside of a request (e.g. in tests)
+ */
+export function waitUntil(promise: Promise<unknown>): void {
+  const guarded = promise.catch((error) => {
+    console.error("Background task failed:", error)
+  })
+
+  const context = storage.getStore()
+  if (context?.waitUntil) {
+    context.waitUntil(guarded)
+  }
+}
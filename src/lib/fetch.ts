@@ -5,6 +5,30 @@
 
 export class NotFoundError extends Error {}
 
+// Shared map of in-flight loads (namespaced key -> pending promise)
+const INFLIGHT: Map<string, Promise<unknown>> = new Map()
+
+/**
+ * Run `load` unless an identical load is already in flight, in which case
+ * its pending promise is shared
+ *
+ * @param key - Namespaced key identifying the load (e.g. "guide:security/welcome")
+ * @param load - Function performing the load
+ */
+export function coalesce<T>(key: string, load: () => Promise<T>): Promise<T> {
+  const pending = INFLIGHT.get(key)
+  if (pending) {
+    console.log(`⟳ Joining in-flight request for ${key}`)
+    return pending as Promise<T>
+  }
+
+  const promise = load().finally(() => {
+    INFLIGHT.delete(key)
+  })
+  INFLIGHT.set(key, promise)
+  return promise
+}
+
 const USER_AGENTS = [
   "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4.1 Safari/605.2.20",
   "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
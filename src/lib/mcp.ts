@@ -1,13 +1,75 @@
 import { McpServer, ResourceTemplate } from "@modelcontextprotocol/sdk/server/mcp.js"
 import { z } from "zod"
 
-import { fetchAndRenderSupportGuide, fetchTableOfContents, searchToc } from "./support"
+import { type BatchItem, fetchBatch, MAX_BATCH_CONCURRENCY, MAX_BATCH_SIZE } from "./batch"
+import { measure } from "./metrics"
 import {
-  fetchTrainingTutorialContent,
+  type MarkdownSection,
+  renderSections,
+  type SectionOptions,
+  selectSections,
+} from "./sections"
+import {
+  fetchAndRenderSupportGuide,
+  fetchSupportGuide,
+  fetchTableOfContents,
+  searchToc,
+} from "./support"
+import {
+  fetchTrainingTutorialDocument,
   getTrainingStructure,
   searchTrainingTutorials,
 } from "./training"
 
+// Optional parameters narrowing a fetched page down to the sections an agent needs
+const SECTION_PARAMS = {
+  section: z
+    .string()
+    .optional()
+    .describe(
+      "Return only this section and its subsections: an anchor listed under 'Other sections' (e.g., 'secure-enclave-processor') or a heading",
+    ),
+  query: z.string().optional().describe("Return only the sections most relevant to this query"),
+  maxTokens: z
+    .number()
+    .int()
+    .min(100)
+    .max(100_000)
+    .optional()
+    .describe("Upper bound on the tokens returned (about 4 characters per token)"),
+}
+
+function hasSectionOptions(options: SectionOptions): boolean {
+  return Boolean(options.section || options.query || options.maxTokens)
+}
+
+/**
+ * Render the sections of a page matching `options`, with the anchors of the rest
+ */
+function renderPageSections(
+  page: { title: string; url: string; markdown: string; sections: MarkdownSection[] },
+  options: SectionOptions,
+): string {
+  const selected = selectSections(page.markdown, page.sections, options)
+  const text = renderSections(page, selected)
+  if (selected.length > 0) return text
+
+  const reason = options.section
+    ? `No section "${options.section}" on this page.`
+    : `No sections match "${options.query}".`
+  return `${reason}\n\n${text}`
+}
+
+/**
+ * Wrap a tool handler to record the duration of each call under "tool:<name>"
+ */
+function timed<Args extends unknown[], Result>(
+  name: string,
+  handler: (...args: Args) => Result | Promise<Result>,
+): (...args: Args) => Promise<Result> {
+  return (...args) => measure(`tool:${name}`, async () => handler(...args))
+}
+
 export function createMcpServer() {
   const server = new McpServer({
     name: "supportify",
@@ -87,7 +149,7 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async ({ guide, query }) => {
+    timed("searchAppleSupportGuide", async ({ guide, query }) => {
       try {
         const toc = await fetchTableOfContents(guide)
         const results = searchToc(toc, query)
@@ -141,7 +203,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   // Register fetch support guide tool (use AFTER searching)
@@ -150,7 +212,7 @@ export function createMcpServer() {
     {
       title: "Fetch Apple Support Guide Page",
       description:
-        "Fetch specific Apple Platform Security or Deployment guide page by slug and return as markdown. Use searchAppleSupportGuide first to find the correct slug. IMPORTANT: When answering user questions, always cite the source URLs from the articles you use. Include links to the referenced articles in your response.",
+        "Fetch specific Apple Platform Security or Deployment guide page by slug and return as markdown. Use searchAppleSupportGuide first to find the correct slug. For long pages, pass section, query or maxTokens to return only the relevant sections. IMPORTANT: When answering user questions, always cite the source URLs from the articles you use. Include links to the referenced articles in your response.",
       inputSchema: {
         guide: z
           .enum(["security", "deployment"])
@@ -160,6 +222,7 @@ export function createMcpServer() {
           .describe(
             "Page slug from search results (e.g., 'depb1bab77f8', 'sec59b0b31ff'). Get this from searchAppleSupportGuide first.",
           ),
+        ...SECTION_PARAMS,
       },
       annotations: {
         readOnlyHint: true,
@@ -168,15 +231,19 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async ({ guide, path }) => {
+    timed("fetchAppleSupportGuide", async ({ guide, path, ...sectionOptions }) => {
       try {
         const sourceUrl = `https://support.apple.com/guide/${guide}/${path}/web`
-        const markdown = await fetchAndRenderSupportGuide(guide, path, sourceUrl)
+        const page = await fetchSupportGuide(guide, path, sourceUrl)
 
-        if (!markdown || markdown.trim().length < 100) {
+        if (!page.markdown || page.markdown.trim().length < 100) {
           throw new Error("Insufficient content in support guide page")
         }
 
+        const markdown = hasSectionOptions(sectionOptions)
+          ? renderPageSections(page, sectionOptions)
+          : page.markdown
+
         // Add a reminder about citing sources at the end
         const markdownWithCitation = `${markdown}\n\n---\n\n**⚠️ IMPORTANT**: When using this information to answer questions, cite this source URL in your response: ${sourceUrl}`
 
@@ -200,7 +267,99 @@ export function createMcpServer() {
           ],
         }
       }
+    }),
+  )
+
+  // Register batch fetch tool (several related pages in one call)
+  server.registerTool(
+    "fetchAppleSupportGuides",
+    {
+      title: "Fetch Multiple Apple Support Guide Pages",
+      description:
+        "Fetch several Apple Platform Security or Deployment guide pages (and optionally training tutorials) in one call, returned as markdown. Prefer this over repeated fetchAppleSupportGuide calls when several related pages are needed (e.g. Face ID, Touch ID and Secure Enclave). Failures are reported per page. IMPORTANT: When answering user questions, always cite the source URLs from the articles you use.",
+      inputSchema: {
+        guide: z
+          .enum(["security", "deployment"])
+          .describe('Guide name: "security" or "deployment"'),
+        paths: z
+          .array(z.string().min(1))
+          .min(1)
+          .max(MAX_BATCH_SIZE)
+          .describe("Page slugs from search results (e.g., ['sec59b0b31ff', 'sec067eb0c9e'])"),
+        tutorialIds: z
+          .array(z.string().min(1))
+          .max(MAX_BATCH_SIZE)
+          .optional()
+          .describe("Training tutorial IDs to include (e.g., ['sup005', 'dm110'])"),
+        trainingCatalog: z
+          .enum(["apt-support", "apt-deployment"])
+          .optional()
+          .describe('Catalog of the tutorial IDs (default "apt-support")'),
+        concurrency: z
+          .number()
+          .int()
+          .min(1)
+          .max(MAX_BATCH_CONCURRENCY)
+          .optional()
+          .describe("Maximum number of pages fetched at once (default 4)"),
+      },
+      annotations: {
+        readOnlyHint: true,
+        destructiveHint: false,
+        idempotentHint: true,
+        openWorldHint: true,
+      },
     },
+    timed(
+      "fetchAppleSupportGuides",
+      async ({ guide, paths, tutorialIds, trainingCatalog, concurrency }, extra) => {
+        const items: BatchItem[] = [
+          ...paths.map((path): BatchItem => ({ type: "guide", guide, path })),
+          ...(tutorialIds ?? []).map(
+            (tutorialId): BatchItem => ({
+              type: "training",
+              tutorialId,
+              catalog: trainingCatalog ?? "apt-support",
+            }),
+          ),
+        ]
+
+        if (items.length === 0 || items.length > MAX_BATCH_SIZE) {
+          return {
+            content: [
+              {
+                type: "text" as const,
+                text: `Provide between 1 and ${MAX_BATCH_SIZE} page slugs or tutorial IDs.`,
+              },
+            ],
+          }
+        }
+
+        // Report progress as each page completes when the client asked for it
+        const progressToken = extra._meta?.progressToken
+        const sections: string[] = new Array(items.length)
+        let completed = 0
+
+        for await (const result of fetchBatch(items, concurrency)) {
+          sections[result.index] =
+            result.status === "ok"
+              ? `${result.content}\n\n---\n\n**⚠️ IMPORTANT**: When using this information to answer questions, cite this source URL in your response: ${result.url}`
+              : `Error fetching content for "${result.id}": ${result.error}${result.notFound && result.type === "guide" ? "\n\nTip: Use searchAppleSupportGuide first to find the correct page slug." : ""}`
+
+          completed++
+          if (progressToken !== undefined) {
+            await extra.sendNotification({
+              method: "notifications/progress",
+              params: { progressToken, progress: completed, total: items.length },
+            })
+          }
+        }
+
+        return {
+          content: sections.map((text) => ({ type: "text" as const, text })),
+        }
+      },
+    ),
   )
 
   // ============================================================================
@@ -232,7 +391,7 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async ({ query, platform }) => {
+    timed("searchAppleSupportTraining", async ({ query, platform }) => {
       try {
         const results = await searchTrainingTutorials(query, {
           platform: platform || "all",
@@ -298,7 +457,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   // Register fetch support training tutorial tool
@@ -307,13 +466,14 @@ export function createMcpServer() {
     {
       title: "Fetch Apple Device Support Training Tutorial",
       description:
-        "Fetch a specific Apple Device Support training tutorial by ID. Returns full tutorial content as markdown including overview, sections, tasks, and assessments. Use searchAppleSupportTraining first to find the correct tutorial ID. IMPORTANT: When using this information, cite the source URL.",
+        "Fetch a specific Apple Device Support training tutorial by ID. Returns full tutorial content as markdown including overview, sections, tasks, and assessments. Use searchAppleSupportTraining first to find the correct tutorial ID. For long tutorials, pass section, query or maxTokens to return only the relevant sections. IMPORTANT: When using this information, cite the source URL.",
       inputSchema: {
         tutorialId: z
           .string()
           .describe(
             "Tutorial ID from search results (e.g., 'sup005', 'sup110', 'sup530'). Get this from searchAppleSupportTraining first.",
           ),
+        ...SECTION_PARAMS,
       },
       annotations: {
         readOnlyHint: true,
@@ -322,16 +482,18 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async ({ tutorialId }) => {
+    timed("fetchAppleSupportTraining", async ({ tutorialId, ...sectionOptions }) => {
       try {
         // Fetch full tutorial content as markdown
-        const markdown = await fetchTrainingTutorialContent(tutorialId, "apt-support")
+        const tutorial = await fetchTrainingTutorialDocument(tutorialId, "apt-support")
 
         return {
           content: [
             {
               type: "text" as const,
-              text: markdown,
+              text: hasSectionOptions(sectionOptions)
+                ? renderPageSections(tutorial, sectionOptions)
+                : tutorial.markdown,
             },
           ],
         }
@@ -347,7 +509,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   // Register list support training catalog tool
@@ -365,7 +527,7 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async () => {
+    timed("listAppleSupportTrainingCatalog", async () => {
       try {
         const structure = await getTrainingStructure("apt-support")
 
@@ -422,7 +584,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   // ============================================================================
@@ -448,7 +610,7 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async ({ query }) => {
+    timed("searchAppleDeploymentTraining", async ({ query }) => {
       try {
         const results = await searchTrainingTutorials(query, {
           catalog: "apt-deployment",
@@ -513,7 +675,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   // Register fetch deployment training tutorial tool
@@ -522,13 +684,14 @@ export function createMcpServer() {
     {
       title: "Fetch Apple Deployment Training Tutorial",
       description:
-        "Fetch a specific Apple Deployment & Management training tutorial by ID. Returns full tutorial content as markdown including overview, sections, tasks, and assessments. Use searchAppleDeploymentTraining first to find the correct tutorial ID. IMPORTANT: When using this information, cite the source URL.",
+        "Fetch a specific Apple Deployment & Management training tutorial by ID. Returns full tutorial content as markdown including overview, sections, tasks, and assessments. Use searchAppleDeploymentTraining first to find the correct tutorial ID. For long tutorials, pass section, query or maxTokens to return only the relevant sections. IMPORTANT: When using this information, cite the source URL.",
       inputSchema: {
         tutorialId: z
           .string()
           .describe(
             "Tutorial ID from search results (e.g., 'dm005', 'dm110', 'dm530'). Get this from searchAppleDeploymentTraining first.",
           ),
+        ...SECTION_PARAMS,
       },
       annotations: {
         readOnlyHint: true,
@@ -537,16 +700,18 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async ({ tutorialId }) => {
+    timed("fetchAppleDeploymentTraining", async ({ tutorialId, ...sectionOptions }) => {
       try {
         // Fetch full tutorial content as markdown
-        const markdown = await fetchTrainingTutorialContent(tutorialId, "apt-deployment")
+        const tutorial = await fetchTrainingTutorialDocument(tutorialId, "apt-deployment")
 
         return {
           content: [
             {
               type: "text" as const,
-              text: markdown,
+              text: hasSectionOptions(sectionOptions)
+                ? renderPageSections(tutorial, sectionOptions)
+                : tutorial.markdown,
             },
           ],
         }
@@ -562,7 +727,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   // Register list deployment training catalog tool
@@ -580,7 +745,7 @@ export function createMcpServer() {
         openWorldHint: true,
       },
     },
-    async () => {
+    timed("listAppleDeploymentTrainingCatalog", async () => {
       try {
         const structure = await getTrainingStructure("apt-deployment")
 
@@ -637,7 +802,7 @@ export function createMcpServer() {
           ],
         }
       }
-    },
+    }),
   )
 
   return server
@@ -0,0 +1,266 @@
+/**
+ * Instrumentation of the fetch → parse → render → respond pipeline
+ * Stage timings, cache events and upstream statuses are aggregated per
+ * isolate; stage timings are also collected for the current request so they
+ * can be reported in its Server-Timing header. Isolates export their raw
+ * metrics so they can be merged (e.g. with MCP session Durable Objects')
+ *
+ * Inside workerd, timers only advance on I/O, so purely synchronous stages
+ * (render, search) read as 0 ms there and are best measured with the benches
+ */
+
+import { getRequestContext } from "./context"
+
+export interface StageStats {
+  count: number
+  totalMs: number
+  maxMs: number
+  /** Percentiles over the most recent samples */
+  p50Ms: number
+  p95Ms: number
+}
+
+export interface MetricsSnapshot {
+  /** When the earliest isolate started collecting (ISO 8601) */
+  since: string
+  /** Number of isolates merged */
+  isolates: number
+  stages: Record<string, StageStats>
+  /** Event counts per cache, e.g. { "catalog:toc": { fresh: 12, stale: 1 } } */
+  caches: Record<string, Record<string, number>>
+  /** Response statuses (or "error", "circuit-open") per upstream host */
+  upstream: Record<string, Record<string, number>>
+}
+
+/**
+ * Raw metrics of one isolate, mergeable with other isolates'
+ */
+export interface IsolateMetrics {
+  /** Random ID of the isolate, so each is merged once however often it is reached */
+  isolate: string
+  since: string
+  stages: Record<string, RawStageStats>
+  caches: Record<string, Record<string, number>>
+  upstream: Record<string, Record<string, number>>
+}
+
+export interface RawStageStats {
+  count: number
+  totalMs: number
+  maxMs: number
+  /** Most recent samples (ms) */
+  samples: number[]
+}
+
+// Samples kept per stage for percentiles
+const SAMPLE_SIZE = 256
+
+/**
+ * Running totals of a stage, with a ring buffer of recent samples
+ */
+class StageTimer {
+  private count = 0
+  private total = 0
+  private max = 0
+  private samples: number[] = []
+  private next = 0
+
+  record(ms: number): void {
+    this.count++
+    this.total += ms
+    this.max = Math.max(this.max, ms)
+    this.samples[this.next] = ms
+    this.next = (this.next + 1) % SAMPLE_SIZE
+  }
+
+  /**
+   * Add another timer's totals and samples to this one
+   */
+  absorb(raw: RawStageStats): void {
+    this.count += raw.count
+    this.total += raw.totalMs
+    this.max = Math.max(this.max, raw.maxMs)
+    for (const ms of raw.samples) {
+      this.samples[this.next] = ms
+      this.next = (this.next + 1) % SAMPLE_SIZE
+    }
+  }
+
+  raw(): RawStageStats {
+    return { count: this.count, totalMs: this.total, maxMs: this.max, samples: [...this.samples] }
+  }
+
+  stats(): StageStats {
+    const sorted = [...this.samples].sort((a, b) => a - b)
+    const percentile = (p: number) =>
+      sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))] ?? 0
+    return {
+      count: this.count,
+      totalMs: round(this.total),
+      maxMs: round(this.max),
+      p50Ms: round(percentile(0.5)),
+      p95Ms: round(percentile(0.95)),
+    }
+  }
+}
+
+const round = (ms: number) => Math.round(ms * 100) / 100
+
+// Set on first use: workerd disallows random values at global scope, and its
+// clock reads as the epoch there
+let isolateId: string | undefined
+let since: Date | undefined
+const STAGES = new Map<string, StageTimer>()
+const CACHE_EVENTS = new Map<string, Record<string, number>>()
+const UPSTREAM_STATUSES = new Map<string, Record<string, number>>()
+
+/**
+ * When this isolate started collecting, starting now if it had not yet
+ */
+function started(): Date {
+  since ??= new Date()
+  return since
+}
+
+function increment(counters: Map<string, Record<string, number>>, name: string, key: string) {
+  started()
+  let counts = counters.get(name)
+  if (!counts) {
+    counts = {}
+    counters.set(name, counts)
+  }
+  counts[key] = (counts[key] ?? 0) + 1
+}
+
+/**
+ * Record time spent in a stage, for this isolate and the current request
+ */
+export function recordStage(stage: string, ms: number): void {
+  started()
+  let timer = STAGES.get(stage)
+  if (!timer) {
+    timer = new StageTimer()
+    STAGES.set(stage, timer)
+  }
+  timer.record(ms)
+
+  const timings = getRequestContext()?.timings
+  if (timings) timings.set(stage, (timings.get(stage) ?? 0) + ms)
+}
+
+/**
+ * Run `fn`, recording its duration under `stage` whether it succeeds or fails
+ */
+export async function measure<T>(stage: string, fn: () => Promise<T>): Promise<T> {
+  const start = performance.now()
+  try {
+    return await fn()
+  } finally {
+    recordStage(stage, performance.now() - start)
+  }
+}
+
+/**
+ * Synchronous version of `measure`
+ */
+export function measureSync<T>(stage: string, fn: () => T): T {
+  const start = performance.now()
+  try {
+    return fn()
+  } finally {
+    recordStage(stage, performance.now() - start)
+  }
+}
+
+/**
+ * Count a cache event (e.g. "hit", "miss", "stale")
+ */
+export function countCacheEvent(cache: string, event: string): void {
+  increment(CACHE_EVENTS, cache, event)
+}
+
+/**
+ * Count a response (or failure) from an upstream host
+ */
+export function countUpstreamStatus(host: string, status: number | string): void {
+  increment(UPSTREAM_STATUSES, host, String(status))
+}
+
+/**
+ * Everything this isolate collected since it started, or since the last reset
+ */
+export function getMetrics(): MetricsSnapshot {
+  return mergeMetrics([exportMetrics()])
+}
+
+/**
+ * Raw metrics of this isolate, to be merged with `mergeMetrics`
+ */
+export function exportMetrics(): IsolateMetrics {
+  return {
+    isolate: (isolateId ??= crypto.randomUUID()),
+    since: started().toISOString(),
+    stages: Object.fromEntries([...STAGES].map(([stage, timer]) => [stage, timer.raw()])),
+    caches: Object.fromEntries(CACHE_EVENTS),
+    upstream: Object.fromEntries(UPSTREAM_STATUSES),
+  }
+}
+
+/**
+ * Merge the metrics of several isolates: counts add up, percentiles are taken
+ * over every isolate's recent samples
+ */
+export function mergeMetrics(isolates: IsolateMetrics[]): MetricsSnapshot {
+  const unique = [...new Map(isolates.map((metrics) => [metrics.isolate, metrics])).values()]
+  const stages = new Map<string, StageTimer>()
+  const caches: MetricsSnapshot["caches"] = {}
+  const upstream: MetricsSnapshot["upstream"] = {}
+
+  const add = (target: Record<string, Record<string, number>>, source: typeof target) => {
+    for (const [name, counts] of Object.entries(source)) {
+      target[name] ??= {}
+      for (const [key, count] of Object.entries(counts)) {
+        target[name][key] = (target[name][key] ?? 0) + count
+      }
+    }
+  }
+
+  for (const metrics of unique) {
+    for (const [stage, raw] of Object.entries(metrics.stages)) {
+      let timer = stages.get(stage)
+      if (!timer) {
+        timer = new StageTimer()
+        stages.set(stage, timer)
+      }
+      timer.absorb(raw)
+    }
+    add(caches, metrics.caches)
+    add(upstream, metrics.upstream)
+  }
+
+  const starts = unique.map((metrics) => metrics.since).sort()
+  return {
+    since: starts[0] ?? new Date().toISOString(),
+    isolates: unique.length,
+    stages: Object.fromEntries([...stages].map(([stage, timer]) => [stage, timer.stats()])),
+    caches,
+    upstream,
+  }
+}
+
+export function resetMetrics(): void {
+  since = new Date()
+  STAGES.clear()
+  CACHE_EVENTS.clear()
+  UPSTREAM_STATUSES.clear()
+}
+
+/**
+ * Format stage timings as a Server-Timing header value
+ * e.g. `upstream;dur=182.4, parse;dur=11.2, total;dur=201`
+ */
+export function serverTiming(timings: Map<string, number>): string {
+  return [...timings]
+    .map(([stage, ms]) => `${stage.replace(/[^\w-]/g, "-")};dur=${round(ms)}`)
+    .join(", ")
+}
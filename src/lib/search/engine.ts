@@ -0,0 +1,346 @@
+/**
+ * In-memory inverted index with BM25F ranking
+ * Built once per catalog version and queried many times
+ */
+
+import { tokenize } from "./tokenize"
+
+export interface SearchField<T> {
+  name: string
+  /** Relative weight of matches in this field */
+  boost: number
+  get: (item: T) => string | undefined
+}
+
+export interface SearchOptions<T> {
+  /** Maximum number of results (default 20) */
+  limit?: number
+  /** Only consider items for which this returns true */
+  filter?: (item: T) => boolean
+}
+
+export interface SearchResult<T> {
+  item: T
+  score: number
+}
+
+/**
+ * Postings of a term, ordered by descending impact (precomputed BM25F score)
+ */
+interface PostingList {
+  docs: Uint32Array
+  impacts: Float64Array
+}
+
+/**
+ * JSON form of an index's postings, so a prebuilt index can be shipped with
+ * the items it was built from
+ */
+export interface SerializedSearchIndex {
+  /** Number of items indexed, to detect a mismatch with the items it is restored for */
+  size: number
+  /** Term -> [docs, impacts] */
+  postings: Record<string, [number[], number[]]>
+}
+
+// BM25 parameters
+const K1 = 1.2
+const B = 0.75
+
+// Expanded terms contribute less than exact matches
+const PREFIX_WEIGHT = 0.7
+const FUZZY_WEIGHT = 0.5
+const MIN_PREFIX_LENGTH = 3
+const MAX_PREFIX_EXPANSIONS = 20
+
+// Only the highest-impact postings of each term are scanned ("champion lists"),
+// which keeps query cost bounded as the corpus grows
+const CHAMPION_LIST_SIZE = 500
+
+/**
+ * Ranked full-text index over a list of items
+ */
+export class SearchIndex<T> {
+  private readonly postings = new Map<string, PostingList>()
+  private readonly lowercaseText: string[] = []
+  /** Sorted vocabulary, for prefix lookups */
+  private readonly terms: string[]
+  /** Vocabulary bucketed by term length, for fuzzy lookups */
+  private readonly termsByLength = new Map<number, string[]>()
+
+  /**
+   * @param prebuilt - Postings serialized from an index over the same items and
+   *   fields, used instead of tokenizing and scoring every item again
+   */
+  constructor(
+    private readonly items: readonly T[],
+    fields: readonly SearchField<T>[],
+    prebuilt?: SerializedSearchIndex,
+  ) {
+    if (prebuilt && prebuilt.size === items.length) {
+      for (const item of items) {
+        const text = fields.map((field) => field.get(item) ?? "").join(" ")
+        this.lowercaseText.push(text.toLowerCase())
+      }
+      for (const [term, [docs, impacts]] of Object.entries(prebuilt.postings)) {
+        this.postings.set(term, {
+          docs: Uint32Array.from(docs),
+          impacts: Float64Array.from(impacts),
+        })
+      }
+    } else {
+      this.build(fields)
+    }
+
+    this.terms = [...this.postings.keys()].sort()
+
+    for (const term of this.terms) {
+      const bucket = this.termsByLength.get(term.length)
+      if (bucket) {
+        bucket.push(term)
+      } else {
+        this.termsByLength.set(term.length, [term])
+      }
+    }
+  }
+
+  get size(): number {
+    return this.items.length
+  }
+
+  /**
+   * Postings in JSON form, to restore the index with the `prebuilt` constructor argument
+   */
+  serialize(): SerializedSearchIndex {
+    const postings: SerializedSearchIndex["postings"] = {}
+    for (const [term, list] of this.postings) {
+      postings[term] = [Array.from(list.docs), Array.from(list.impacts)]
+    }
+    return { size: this.items.length, postings }
+  }
+
+  private build(fields: readonly SearchField<T>[]): void {
+    const items = this.items
+
+    // term -> doc -> term frequency per field
+    const frequencies = new Map<string, Map<number, number[]>>()
+    const fieldLengths: number[][] = []
+    const totals = fields.map(() => 0)
+
+    items.forEach((item, doc) => {
+      const lengths: number[] = []
+      const text: string[] = []
+
+      fields.forEach((field, fieldIndex) => {
+        const value = field.get(item) ?? ""
+        const tokens = tokenize(value)
+        lengths.push(tokens.length)
+        totals[fieldIndex] += tokens.length
+        text.push(value.toLowerCase())
+
+        for (const token of tokens) {
+          let docs = frequencies.get(token)
+          if (!docs) {
+            docs = new Map()
+            frequencies.set(token, docs)
+          }
+
+          let tf = docs.get(doc)
+          if (!tf) {
+            tf = fields.map(() => 0)
+            docs.set(doc, tf)
+          }
+          tf[fieldIndex]++
+        }
+      })
+
+      fieldLengths.push(lengths)
+      this.lowercaseText.push(text.join(" "))
+    })
+
+    const averages = totals.map((total) => (items.length > 0 ? total / items.length : 0))
+
+    for (const [term, docs] of frequencies) {
+      const idf = Math.log(1 + (items.length - docs.size + 0.5) / (docs.size + 0.5))
+      const postings = [...docs].map(([doc, tf]) => ({
+        doc,
+        impact: idf * bm25f(tf, fieldLengths[doc], averages, fields),
+      }))
+      postings.sort((a, b) => b.impact - a.impact)
+
+      this.postings.set(term, {
+        docs: Uint32Array.from(postings, (posting) => posting.doc),
+        impacts: Float64Array.from(postings, (posting) => posting.impact),
+      })
+    }
+  }
+
+  /**
+   * Search the index, returning results ordered by descending score
+   */
+  search(query: string, options: SearchOptions<T> = {}): SearchResult<T>[] {
+    const limit = options.limit ?? 20
+    const queryTerms = [...new Set(tokenize(query))]
+    if (queryTerms.length === 0) return []
+
+    const scores = new Map<number, number>()
+    const matchedTerms = new Map<number, number>()
+
+    for (const queryTerm of queryTerms) {
+      const seenDocs = new Set<number>()
+
+      for (const [term, weight] of this.expand(queryTerm)) {
+        const postings = this.postings.get(term)
+        if (!postings) continue
+
+        // A filter may reject every champion, so filtered searches scan everything
+        const end = options.filter
+          ? postings.docs.length
+          : Math.min(postings.docs.length, CHAMPION_LIST_SIZE)
+
+        for (let i = 0; i < end; i++) {
+          const doc = postings.docs[i]
+          scores.set(doc, (scores.get(doc) ?? 0) + weight * postings.impacts[i])
+          seenDocs.add(doc)
+        }
+      }
+
+      for (const doc of seenDocs) {
+        matchedTerms.set(doc, (matchedTerms.get(doc) ?? 0) + 1)
+      }
+    }
+
+    const phrase = query.toLowerCase().trim()
+    const results: SearchResult<T>[] = []
+
+    for (const [doc, baseScore] of scores) {
+      const item = this.items[doc]
+      if (options.filter && !options.filter(item)) continue
+
+      // Favor documents that match every query term, then exact phrases
+      const coverage = (matchedTerms.get(doc) ?? 0) / queryTerms.length
+      let score = baseScore * (0.5 + coverage)
+      if (queryTerms.length > 1 && this.lowercaseText[doc].includes(phrase)) {
+        score *= 1.5
+      }
+
+      results.push({ item, score })
+    }
+
+    results.sort((a, b) => b.score - a.score)
+    return results.slice(0, limit)
+  }
+
+  /**
+   * Expand a query term to indexed terms: exact, then prefix, then fuzzy
+   */
+  private expand(term: string): Map<string, number> {
+    const expansions = new Map<string, number>()
+
+    if (this.postings.has(term)) {
+      expansions.set(term, 1)
+    }
+
+    if (term.length >= MIN_PREFIX_LENGTH) {
+      for (const candidate of this.prefixMatches(term)) {
+        if (!expansions.has(candidate)) {
+          expansions.set(candidate, PREFIX_WEIGHT)
+        }
+      }
+    }
+
+    // Only fall back to typo tolerance when nothing matched literally
+    if (expansions.size === 0 && term.length >= 4) {
+      const maxDistance = term.length >= 8 ? 2 : 1
+
+      for (let length = term.length - maxDistance; length <= term.length + maxDistance; length++) {
+        for (const candidate of this.termsByLength.get(length) ?? []) {
+          if (editDistance(term, candidate, maxDistance) <= maxDistance) {
+            expansions.set(candidate, FUZZY_WEIGHT)
+          }
+        }
+      }
+    }
+
+    return expansions
+  }
+
+  private prefixMatches(prefix: string): string[] {
+    // Binary search for the first term >= prefix in the sorted vocabulary
+    let low = 0
+    let high = this.terms.length
+    while (low < high) {
+      const mid = (low + high) >>> 1
+      if (this.terms[mid] < prefix) {
+        low = mid + 1
+      } else {
+        high = mid
+      }
+    }
+
+    const matches: string[] = []
+    for (let i = low; i < this.terms.length && matches.length < MAX_PREFIX_EXPANSIONS; i++) {
+      const candidate = this.terms[i]
+      if (!candidate.startsWith(prefix)) break
+      if (candidate !== prefix) matches.push(candidate)
+    }
+
+    return matches
+  }
+}
+
+/**
+ * BM25F: length-normalized, boosted term frequencies summed across fields
+ */
+function bm25f<T>(
+  tf: number[],
+  lengths: number[],
+  averages: number[],
+  fields: readonly SearchField<T>[],
+): number {
+  let weighted = 0
+
+  for (let field = 0; field < fields.length; field++) {
+    if (tf[field] === 0) continue
+    const average = averages[field] || 1
+    weighted += (fields[field].boost * tf[field]) / (1 - B + (B * lengths[field]) / average)
+  }
+
+  return weighted / (K1 + weighted)
+}
+
+/**
+ * Damerau-Levenshtein (optimal string alignment) distance, giving up once it
+ * exceeds `max`
+ */
+export function editDistance(a: string, b: string, max = Number.POSITIVE_INFINITY): number {
+  if (Math.abs(a.length - b.length) > max) return max + 1
+
+  let previousPrevious: number[] = []
+  let previous = Array.from({ length: b.length + 1 }, (_, j) => j)
+
+  for (let i = 1; i <= a.length; i++) {
+    const current = [i]
+    let rowMin = i
+
+    for (let j = 1; j <= b.length; j++) {
+      const cost = a[i - 1] === b[j - 1] ? 0 : 1
+      let value = Math.min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+
+      if (i > 1 && j > 1 && a[i - 1] === b[j - 2] && a[i - 2] === b[j - 1]) {
+        value = Math.min(value, previousPrevious[j - 2] + 1)
+      }
+
+      current.push(value)
+      rowMin = Math.min(rowMin, value)
+    }
+
+    if (rowMin > max) return max + 1
+
+    previousPrevious = previous
+    previous = current
+  }
+
+  const distance = previous[b.length]
+  return distance > max ? max + 1 : distance
+}
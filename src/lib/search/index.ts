@@ -0,0 +1,25 @@
+/**
+ * Full-text search over guide tables of contents and training catalogs
+ */
+
+import { SearchIndex } from "./engine"
+
+export type { SearchField, SearchOptions, SearchResult, SerializedSearchIndex } from "./engine"
+export { editDistance, SearchIndex } from "./engine"
+export { stem, tokenize } from "./tokenize"
+
+// Indexes keyed by the catalog object they were built from, so each catalog
+// version is indexed exactly once and dropped together with it
+const INDEXES = new WeakMap<object, SearchIndex<unknown>>()
+
+/**
+ * Get the search index for a catalog, building it on first use
+ */
+export function getSearchIndex<T>(catalog: object, build: () => SearchIndex<T>): SearchIndex<T> {
+  let index = INDEXES.get(catalog) as SearchIndex<T> | undefined
+  if (!index) {
+    index = build()
+    INDEXES.set(catalog, index)
+  }
+  return index
+}
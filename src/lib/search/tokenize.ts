@@ -0,0 +1,121 @@
+/**
+ * Text normalization for the search index
+ * Lowercases, splits on non-alphanumerics, drops stop words and stems
+ */
+
+const STOP_WORDS = new Set([
+  "a",
+  "an",
+  "and",
+  "are",
+  "as",
+  "at",
+  "be",
+  "by",
+  "can",
+  "do",
+  "for",
+  "from",
+  "how",
+  "i",
+  "in",
+  "is",
+  "it",
+  "of",
+  "on",
+  "or",
+  "that",
+  "the",
+  "this",
+  "to",
+  "use",
+  "using",
+  "what",
+  "when",
+  "with",
+  "you",
+  "your",
+])
+
+// Checked in order; the first matching suffix is removed
+const SUFFIXES = [
+  "ational",
+  "ations",
+  "ation",
+  "itions",
+  "ition",
+  "ments",
+  "ment",
+  "ness",
+  "ings",
+  "ing",
+  "ions",
+  "ion",
+  "ed",
+  "ly",
+]
+
+const MIN_STEM_LENGTH = 3
+
+/**
+ * Reduce a lowercase word to a crude stem so that "encryption", "encrypted"
+ * and "encrypts" all index under "encrypt"
+ */
+export function stem(word: string): string {
+  if (word.length <= MIN_STEM_LENGTH || /\d/.test(word)) return word
+
+  let result = word
+
+  // Plurals
+  if (result.endsWith("ies") && result.length > 4) {
+    result = `${result.slice(0, -3)}y`
+  } else if (result.endsWith("sses")) {
+    result = result.slice(0, -2)
+  } else if (
+    result.endsWith("s") &&
+    !result.endsWith("ss") &&
+    !result.endsWith("us") &&
+    !result.endsWith("is")
+  ) {
+    result = result.slice(0, -1)
+  }
+
+  // Derivational and inflectional suffixes
+  for (const suffix of SUFFIXES) {
+    if (result.endsWith(suffix) && result.length - suffix.length >= MIN_STEM_LENGTH) {
+      result = result.slice(0, -suffix.length)
+
+      // "running" -> "runn" -> "run"
+      const last = result[result.length - 1]
+      if (
+        (suffix === "ing" || suffix === "ed") &&
+        last === result[result.length - 2] &&
+        !"lsz".includes(last)
+      ) {
+        result = result.slice(0, -1)
+      }
+      break
+    }
+  }
+
+  // "configure" / "configured" -> "configur"
+  if (result.endsWith("e") && result.length > MIN_STEM_LENGTH + 1) {
+    result = result.slice(0, -1)
+  }
+
+  return result
+}
+
+/**
+ * Split text into normalized search terms
+ */
+export function tokenize(text: string): string[] {
+  const terms: string[] = []
+
+  for (const word of text.toLowerCase().split(/[^a-z0-9]+/)) {
+    if (!word || STOP_WORDS.has(word)) continue
+    terms.push(stem(word))
+  }
+
+  return terms
+}
@@ -0,0 +1,227 @@
+/**
+ * Section-level chunking of rendered Markdown
+ * Pages are split on their ## and ### headings so tools can return only the
+ * sections an agent asked for, within a token budget
+ */
+
+import { type SearchField, SearchIndex } from "./search"
+
+export interface MarkdownSection {
+  /** Identifier derived from the heading, unique within the page (e.g. "secure-boot") */
+  anchor: string
+  heading: string
+  /** Heading level: 1 for the introduction, otherwise 2 or 3 */
+  level: number
+  /** Offsets of the section (heading included) within the Markdown */
+  start: number
+  end: number
+  /** Approximate number of tokens */
+  tokens: number
+}
+
+export interface SectionOptions {
+  /** Anchor or heading of the section to return, with its subsections */
+  section?: string
+  /** Return the sections most relevant to this query */
+  query?: string
+  /** Upper bound on the tokens returned */
+  maxTokens?: number
+}
+
+export interface SelectedSection {
+  section: MarkdownSection
+  text: string
+  /** Whether the text was cut to fit the token budget */
+  truncated: boolean
+}
+
+/** Anchor of the content before the first heading */
+export const INTRO_ANCHOR = "introduction"
+
+// Sections returned for a query when no token budget is given
+const DEFAULT_QUERY_SECTIONS = 3
+
+// Rough characters-per-token ratio for English prose and Markdown
+const CHARS_PER_TOKEN = 4
+
+/**
+ * Approximate number of tokens in a text
+ */
+export function estimateTokens(text: string): number {
+  return Math.ceil(text.length / CHARS_PER_TOKEN)
+}
+
+/**
+ * Anchor for a heading, GitHub style: lowercase words joined by hyphens
+ */
+export function slugifyHeading(heading: string): string {
+  return heading
+    .toLowerCase()
+    .replace(/\[([^\]]*)\]\([^)]*\)/g, "$1")
+    .replace(/[^\p{L}\p{N}\s-]/gu, "")
+    .trim()
+    .replace(/[\s-]+/g, "-")
+}
+
+// Title, source line and rule that open every rendered page
+const FRONT_MATTER = /^# [^\n]*\n+(?:\*\*📎 Source:\*\*[^\n]*\n+)?(?:---\n+)?/
+
+// Source reminder closing rendered guide pages
+const FOOTER = /\n---\n\*Source: [^\n]*\*\s*$/
+
+/**
+ * Split Markdown into sections at its ## and ### headings
+ * The content between the page title and the first heading is the introduction
+ */
+export function splitSections(markdown: string): MarkdownSection[] {
+  const bodyStart = FRONT_MATTER.exec(markdown)?.[0].length ?? 0
+  const bodyEnd = FOOTER.exec(markdown)?.index ?? markdown.length
+
+  const headings: Array<{ heading: string; level: number; start: number }> = []
+  let inFence = false
+  let offset = 0
+  for (const line of markdown.split("\n")) {
+    if (line.startsWith("```")) {
+      inFence = !inFence
+    } else if (!inFence && offset >= bodyStart && offset < bodyEnd) {
+      const match = /^(#{2,3})\s+(.+?)\s*$/.exec(line)
+      if (match) headings.push({ heading: match[2], level: match[1].length, start: offset })
+    }
+    offset += line.length + 1
+  }
+
+  const sections: MarkdownSection[] = []
+  const anchors = new Map<string, number>()
+
+  const add = (heading: string, level: number, start: number, end: number, anchor?: string) => {
+    const text = markdown.slice(start, end).trim()
+    if (!text) return
+
+    // Repeated headings get numbered anchors, as on GitHub
+    const base = anchor ?? (slugifyHeading(heading) || "section")
+    const count = anchors.get(base) ?? 0
+    anchors.set(base, count + 1)
+
+    sections.push({
+      anchor: count === 0 ? base : `${base}-${count}`,
+      heading,
+      level,
+      start,
+      end,
+      tokens: estimateTokens(text),
+    })
+  }
+
+  add("Introduction", 1, bodyStart, headings[0]?.start ?? bodyEnd, INTRO_ANCHOR)
+  headings.forEach(({ heading, level, start }, i) => {
+    add(heading, level, start, headings[i + 1]?.start ?? bodyEnd)
+  })
+
+  return sections
+}
+
+const SECTION_SEARCH_FIELDS: SearchField<{ section: MarkdownSection; text: string }>[] = [
+  { name: "heading", boost: 3, get: (entry) => entry.section.heading },
+  { name: "text", boost: 1, get: (entry) => entry.text },
+]
+
+/**
+ * Find a section by anchor or heading, together with its subsections
+ */
+function findSection(sections: MarkdownSection[], wanted: string): MarkdownSection[] {
+  const anchor = slugifyHeading(wanted)
+  const index = sections.findIndex(
+    (section) => section.anchor === wanted || section.anchor === anchor,
+  )
+  if (index === -1) return []
+
+  // The introduction has no subsections
+  const found = sections[index]
+  if (found.level === 1) return [found]
+
+  const end = sections.findIndex((section, i) => i > index && section.level <= found.level)
+  return sections.slice(index, end === -1 ? undefined : end)
+}
+
+/**
+ * Pick the sections of a page matching `options`, within its token budget
+ *
+ * Without a section or query, sections are taken in page order. A section
+ * that doesn't fit the budget is skipped in favor of smaller ones; when not
+ * even one fits, the first is truncated.
+ *
+ * @returns Selected sections in page order
+ */
+export function selectSections(
+  markdown: string,
+  sections: MarkdownSection[],
+  options: SectionOptions,
+): SelectedSection[] {
+  const textOf = (section: MarkdownSection) => markdown.slice(section.start, section.end).trim()
+
+  let candidates = sections
+  if (options.section) {
+    candidates = findSection(sections, options.section)
+  } else if (options.query) {
+    const entries = sections.map((section) => ({ section, text: textOf(section) }))
+    const limit = options.maxTokens === undefined ? DEFAULT_QUERY_SECTIONS : sections.length
+    candidates = new SearchIndex(entries, SECTION_SEARCH_FIELDS)
+      .search(options.query, { limit })
+      .map((result) => result.item.section)
+  }
+
+  const selected: SelectedSection[] = []
+  let used = 0
+  for (const section of candidates) {
+    const text = textOf(section)
+    if (options.maxTokens !== undefined && used + section.tokens > options.maxTokens) {
+      if (selected.length === 0 && section === candidates[0]) {
+        const cut = text.slice(0, options.maxTokens * CHARS_PER_TOKEN).trimEnd()
+        selected.push({ section, text: `${cut}…`, truncated: true })
+        used += estimateTokens(cut)
+      }
+      continue
+    }
+    selected.push({ section, text, truncated: false })
+    used += section.tokens
+  }
+
+  return selected.sort((a, b) => a.section.start - b.section.start)
+}
+
+/**
+ * Render selected sections as Markdown, listing the anchors of the others so
+ * they can be requested next
+ */
+export function renderSections(
+  page: { title: string; url: string; sections: MarkdownSection[] },
+  selected: SelectedSection[],
+): string {
+  const parts = [`# ${page.title}`, "", `**📎 Source:** ${page.url}`, ""]
+
+  for (const { section, text } of selected) {
+    parts.push(`<!-- section: ${section.anchor} -->`, text, "")
+  }
+
+  const returned = new Set(selected.map(({ section }) => section.anchor))
+  const tokens = selected.reduce((sum, { section, truncated, text }) => {
+    return sum + (truncated ? estimateTokens(text) : section.tokens)
+  }, 0)
+  const total = page.sections.reduce((sum, section) => sum + section.tokens, 0)
+
+  parts.push("---", "")
+  parts.push(
+    `**Sections:** ${selected.length} of ${page.sections.length} (~${tokens} of ~${total} tokens)`,
+  )
+
+  const others = page.sections.filter((section) => !returned.has(section.anchor))
+  if (others.length > 0) {
+    parts.push("", "**Other sections** (request one with `section`):", "")
+    for (const section of others) {
+      const indent = section.level === 3 ? "  " : ""
+      parts.push(`${indent}- \`${section.anchor}\` ${section.heading} (~${section.tokens} tokens)`)
+    }
+  }
+
+  return parts.join("\n")
+}
@@ -0,0 +1,127 @@
+/**
+ * Durable Object backed MCP sessions
+ * Every session lives in its own Durable Object, so all of a client's requests
+ * reach the same server and transport whichever isolate receives them
+ */
+
+import { DurableObject } from "cloudflare:workers"
+import { runWithRequestContext } from "../context"
+import { serverTiming } from "../metrics"
+import { getIsolateStats, type IsolateStats } from "../stats"
+import { configureStorage, type StorageBindings } from "../storage"
+import { MemorySessionStore } from "./memory"
+import type { McpSessionStore } from "./session"
+
+// Internal headers passing the session to its Durable Object, or asking it for statistics
+const SESSION_HEADER = "X-Supportify-Session"
+const CREATE_HEADER = "X-Supportify-Session-Create"
+const STATS_HEADER = "X-Supportify-Stats"
+
+// Sessions routed recently enough to still be open, whose statistics are collected
+const TRACKED_SESSIONS = 64
+const TRACKED_SESSION_AGE = 1000 * 60 * 30
+
+/**
+ * Routes each session to the Durable Object named after its ID
+ */
+export class DurableObjectSessionStore implements McpSessionStore {
+  /** Session ID -> when it was last routed, oldest first */
+  private readonly recent = new Map<string, number>()
+
+  constructor(private readonly namespace: DurableObjectNamespace) {}
+
+  async handle(sessionId: string, request: Request, create: boolean): Promise<Response> {
+    // Only this store may set the internal headers; drop any the client sent
+    const headers = new Headers(request.headers)
+    headers.delete(CREATE_HEADER)
+    headers.delete(STATS_HEADER)
+    headers.set(SESSION_HEADER, sessionId)
+    if (create) headers.set(CREATE_HEADER, "1")
+
+    this.recent.delete(sessionId)
+    this.recent.set(sessionId, Date.now())
+    if (this.recent.size > TRACKED_SESSIONS) {
+      this.recent.delete(this.recent.keys().next().value as string)
+    }
+
+    const stub = this.namespace.get(this.namespace.idFromName(sessionId))
+    const response = await stub.fetch(new Request(request, { headers }))
+
+    // Responses from stubs have immutable headers; copy so middleware can add to them
+    return new Response(response.body, response)
+  }
+
+  /**
+   * Statistics of the Durable Objects of sessions this isolate routed recently
+   * Objects that fail to answer are left out
+   */
+  async stats(): Promise<IsolateStats[]> {
+    const cutoff = Date.now() - TRACKED_SESSION_AGE
+    const sessionIds = [...this.recent].filter(([, at]) => at > cutoff).map(([id]) => id)
+
+    const results = await Promise.allSettled(
+      sessionIds.map(async (sessionId) => {
+        const stub = this.namespace.get(this.namespace.idFromName(sessionId))
+        const response = await stub.fetch("https://session.internal/stats", {
+          headers: { [STATS_HEADER]: "1" },
+        })
+        if (!response.ok) throw new Error(`Session stats failed: ${response.status}`)
+        const stats: IsolateStats = await response.json()
+        return stats
+      }),
+    )
+    return results.flatMap((result) => (result.status === "fulfilled" ? [result.value] : []))
+  }
+}
+
+/**
+ * Durable Object holding one MCP session in memory
+ * The session is closed after at most 30 idle minutes. The runtime may evict
+ * the object sooner, dropping the session; the client then gets a 404 and
+ * starts a new session
+ */
+export class McpSessionObject extends DurableObject<StorageBindings> {
+  private readonly sessions = new MemorySessionStore({ maxSessions: 1 })
+
+  constructor(ctx: DurableObjectState, env: StorageBindings) {
+    super(ctx, env)
+    configureStorage(env)
+  }
+
+  async fetch(request: Request): Promise<Response> {
+    if (request.headers.get(STATS_HEADER) === "1") {
+      return Response.json(getIsolateStats())
+    }
+
+    const sessionId = request.headers.get(SESSION_HEADER)
+    if (!sessionId) {
+      return new Response("Missing session", { status: 400 })
+    }
+
+    const create = request.headers.get(CREATE_HEADER) === "1"
+    const timings = new Map<string, number>()
+    const response = await runWithRequestContext(
+      { waitUntil: (promise) => this.ctx.waitUntil(promise), timings },
+      () => this.sessions.handle(sessionId, request, create),
+    )
+    await this.scheduleSweep()
+
+    // Report stages (tool calls) to the worker; responses streamed over SSE
+    // are sent before their tool finishes, so they only carry earlier stages
+    if (timings.size === 0) return response
+    const timed = new Response(response.body, response)
+    timed.headers.set("Server-Timing", serverTiming(timings))
+    return timed
+  }
+
+  async alarm(): Promise<void> {
+    await this.scheduleSweep()
+  }
+
+  private async scheduleSweep() {
+    const next = this.sessions.sweep()
+    if (next !== undefined) {
+      await this.ctx.storage.setAlarm(Date.now() + next)
+    }
+  }
+}
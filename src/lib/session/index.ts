@@ -0,0 +1,11 @@
+/**
+ * MCP session handling
+ * Each client session keeps one server and Streamable HTTP transport for its
+ * lifetime, in a Durable Object when bound or in the current isolate otherwise
+ */
+
+export { DurableObjectSessionStore, McpSessionObject } from "./durable"
+export type { MemorySessionStoreOptions } from "./memory"
+export { MemorySessionStore } from "./memory"
+export type { McpSessionStore } from "./session"
+export { McpSession, SESSION_ID_HEADER, sessionNotFound } from "./session"
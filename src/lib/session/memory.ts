@@ -0,0 +1,89 @@
+/**
+ * In-memory MCP session store
+ * Keeps sessions in the current isolate; used when no Durable Object namespace
+ * is bound (local development and tests) and inside each session Durable Object
+ */
+
+import { McpSession, type McpSessionStore, sessionNotFound } from "./session"
+
+export interface MemorySessionStoreOptions {
+  /** Maximum number of open sessions; the least recently active is closed first (default 256) */
+  maxSessions?: number
+  /** Sessions idle for longer than this are closed (ms, default 30 minutes) */
+  idleTimeout?: number
+}
+
+export class MemorySessionStore implements McpSessionStore {
+  private sessions = new Map<string, McpSession>()
+  private readonly maxSessions: number
+  private readonly idleTimeout: number
+
+  constructor(options: MemorySessionStoreOptions = {}) {
+    this.maxSessions = options.maxSessions ?? 256
+    this.idleTimeout = options.idleTimeout ?? 1000 * 60 * 30
+  }
+
+  async handle(sessionId: string, request: Request, create: boolean): Promise<Response> {
+    this.sweep()
+
+    let session = this.sessions.get(sessionId)
+    if (!session) {
+      if (!create) return sessionNotFound()
+      session = this.open(sessionId)
+    }
+
+    // Move to the most recently active position
+    this.sessions.delete(sessionId)
+    this.sessions.set(sessionId, session)
+
+    const response = await session.handle(request)
+
+    // A session is only kept once the client has initialized it
+    if (create && !session.initialized) {
+      this.sessions.delete(sessionId)
+      await session.close()
+    }
+
+    return response
+  }
+
+  /**
+   * Close sessions that have been idle for longer than the idle timeout
+   *
+   * @returns Time until the next session expires (ms), or undefined when none are open
+   */
+  sweep(now = Date.now()): number | undefined {
+    // Sessions are ordered by activity, so only the oldest ones need checking
+    for (const [id, session] of this.sessions) {
+      const expiresIn = session.lastActive + this.idleTimeout - now
+      if (expiresIn > 0) return expiresIn
+      this.remove(id, session)
+    }
+    return undefined
+  }
+
+  get size(): number {
+    return this.sessions.size
+  }
+
+  private open(sessionId: string): McpSession {
+    while (this.sessions.size >= this.maxSessions) {
+      const [oldestId, oldest] = this.sessions.entries().next().value as [string, McpSession]
+      this.remove(oldestId, oldest)
+    }
+
+    const session = new McpSession(sessionId, () => {
+      // Only forget the session if it hasn't been replaced under the same ID
+      if (this.sessions.get(sessionId) === session) this.sessions.delete(sessionId)
+    })
+    this.sessions.set(sessionId, session)
+    return session
+  }
+
+  private remove(id: string, session: McpSession) {
+    this.sessions.delete(id)
+    session.close().catch((error) => {
+      console.error(`Failed to close MCP session ${id}:`, error)
+    })
+  }
+}
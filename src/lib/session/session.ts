@@ -0,0 +1,78 @@
+/**
+ * A single MCP session: one server connected to one Streamable HTTP transport
+ * for the lifetime of the session, instead of reconnecting on every request
+ */
+
+import { StreamableHTTPTransport } from "@hono/mcp"
+import { Hono } from "hono"
+import { createMcpServer } from "../mcp"
+
+/** Header carrying the session ID between MCP clients and the server */
+export const SESSION_ID_HEADER = "Mcp-Session-Id"
+
+/**
+ * Routes MCP requests to the session they belong to
+ */
+export interface McpSessionStore {
+  /**
+   * Handle a request for a session
+   *
+   * @param sessionId - The client's session ID, or a fresh ID when `create` is set
+   * @param request - The MCP request
+   * @param create - Start a new session (the request must be an initialize request)
+   */
+  handle(sessionId: string, request: Request, create: boolean): Promise<Response>
+}
+
+/**
+ * JSON-RPC error telling the client to start a new session (per the MCP spec)
+ */
+export function sessionNotFound(): Response {
+  return Response.json(
+    { jsonrpc: "2.0", error: { code: -32001, message: "Session not found" }, id: null },
+    { status: 404 },
+  )
+}
+
+export class McpSession {
+  /** Whether the client completed initialization for this session */
+  initialized = false
+  lastActive = Date.now()
+
+  private readonly server = createMcpServer()
+  private readonly transport: StreamableHTTPTransport
+  private readonly app = new Hono()
+  private readonly connected: Promise<void>
+
+  constructor(
+    readonly id: string,
+    onClose?: () => void,
+  ) {
+    this.transport = new StreamableHTTPTransport({
+      sessionIdGenerator: () => id,
+      onsessioninitialized: () => {
+        this.initialized = true
+      },
+    })
+
+    // Called when the client ends the session (DELETE) or the session is closed here
+    this.server.server.onclose = onClose
+
+    this.app.all("*", (c) => this.transport.handleRequest(c))
+    this.connected = this.server.connect(this.transport)
+  }
+
+  /**
+   * Handle a request belonging to this session
+   * Responses to tool calls stream over SSE, so progress arrives as it happens
+   */
+  async handle(request: Request): Promise<Response> {
+    await this.connected
+    this.lastActive = Date.now()
+    return this.app.fetch(request)
+  }
+
+  close(): Promise<void> {
+    return this.server.close()
+  }
+}
@@ -0,0 +1,275 @@
+/**
+ * Snapshot crawler
+ * Fetches every guide page and training tutorial from Apple and publishes
+ * them as a new snapshot version of gzip-compressed shards, along with the
+ * tables of contents, training catalogs and their search indexes
+ *
+ * A crawl runs in batches across several invocations, so each one stays
+ * within the Workers subrequest limit. Its progress is kept in the store.
+ */
+
+import { mapWithConcurrency } from "../batch"
+import {
+  getTocSearchIndex,
+  loadTableOfContents,
+  renderSupportGuidePage,
+  type SupportGuidePage,
+} from "../support"
+import {
+  getTrainingModel,
+  loadTrainingCatalog,
+  loadTrainingTutorialContent,
+  type TrainingCatalogType,
+} from "../training"
+import { CURRENT_SNAPSHOT_KEY, snapshotKey } from "./reader"
+import { compressJSON, decompressJSON } from "./store"
+import type { SnapshotManifest, SnapshotStore } from "./types"
+
+/** Superseded snapshot versions expire from the store after 30 days */
+export const SNAPSHOT_EXPIRATION_TTL = 60 * 60 * 24 * 30
+
+/** Key holding the progress of the crawl in progress, if any */
+export const CRAWL_STATE_KEY = "snapshot:crawl"
+
+// A crawl not continued within a day is abandoned
+const CRAWL_STATE_TTL = 60 * 60 * 24
+
+export interface CrawlOptions {
+  guides?: Array<"security" | "deployment">
+  catalogs?: TrainingCatalogType[]
+  /** Maximum number of concurrent fetches from Apple (default 6) */
+  concurrency?: number
+  /** Documents per shard (default 25) */
+  shardSize?: number
+  /**
+   * Documents crawled per invocation (default 200). With retries, each
+   * document takes up to three subrequests.
+   */
+  batchSize?: number
+}
+
+/**
+ * Where a crawl stands after an invocation
+ */
+export type CrawlProgress =
+  | { status: "crawling"; version: string; crawled: number; total: number }
+  | { status: "published"; manifest: SnapshotManifest }
+
+type CrawlDocument =
+  | { key: string; type: "guide"; guide: string; slug: string }
+  | { key: string; type: "training"; tutorialId: string; catalog: TrainingCatalogType }
+
+/**
+ * Progress of a crawl, saved between invocations
+ */
+interface CrawlState {
+  /** Manifest of the version being crawled, complete once every document is crawled */
+  manifest: SnapshotManifest
+  /** Every document to crawl, in crawl order */
+  documents: CrawlDocument[]
+  /** Index of the next document to crawl */
+  next: number
+  shardSize: number
+}
+
+function errorMessage(error: unknown): string {
+  return error instanceof Error ? error.message : String(error)
+}
+
+async function crawlDocument(document: CrawlDocument): Promise<SupportGuidePage | string> {
+  if (document.type === "training") {
+    return loadTrainingTutorialContent(document.tutorialId, document.catalog)
+  }
+  return renderSupportGuidePage(document.guide, document.slug)
+}
+
+function putItem(store: SnapshotStore, version: string, item: string, value: unknown) {
+  return compressJSON(value).then((data) =>
+    store.put(snapshotKey(version, item), data, { expirationTtl: SNAPSHOT_EXPIRATION_TTL }),
+  )
+}
+
+async function readCrawlState(store: SnapshotStore): Promise<CrawlState | undefined> {
+  const data = await store.get(CRAWL_STATE_KEY)
+  return data ? decompressJSON<CrawlState>(data) : undefined
+}
+
+/**
+ * Start a crawl: store the ToCs, catalogs and search indexes, and list the documents
+ */
+async function startCrawl(store: SnapshotStore, options: CrawlOptions): Promise<CrawlState> {
+  const guides = options.guides ?? ["security", "deployment"]
+  const catalogs = options.catalogs ?? ["apt-support", "apt-deployment"]
+  const version = new Date().toISOString().replace(/[-:.]/g, "")
+
+  const manifest: SnapshotManifest = {
+    version,
+    createdAt: 0,
+    documents: {},
+    shards: 0,
+    tocs: [],
+    catalogs: [],
+    failures: [],
+  }
+  const documents: CrawlDocument[] = []
+
+  for (const guide of guides) {
+    try {
+      const { value: toc } = await loadTableOfContents(guide)
+      await putItem(store, version, `toc:${guide}`, toc)
+      await putItem(store, version, `index:toc:${guide}`, getTocSearchIndex(toc).serialize())
+      manifest.tocs.push(guide)
+
+      const slugs = new Set(toc.map((item) => item.slug))
+      for (const slug of slugs) {
+        documents.push({ key: `markdown:${guide}/${slug}`, type: "guide", guide, slug })
+      }
+    } catch (error) {
+      manifest.failures.push({ key: `toc:${guide}`, error: errorMessage(error) })
+    }
+  }
+
+  for (const catalog of catalogs) {
+    try {
+      const { value: data } = await loadTrainingCatalog(catalog)
+      const model = getTrainingModel(data)
+      await putItem(store, version, `catalog:${catalog}`, data)
+      await putItem(store, version, `index:catalog:${catalog}`, model.index.serialize())
+      manifest.catalogs.push(catalog)
+
+      for (const tutorialId of model.byId.keys()) {
+        documents.push({
+          key: `tutorial:${catalog}/${tutorialId}`,
+          type: "training",
+          tutorialId,
+          catalog,
+        })
+      }
+    } catch (error) {
+      manifest.failures.push({ key: `catalog:${catalog}`, error: errorMessage(error) })
+    }
+  }
+
+  console.log(`⟳ Crawling snapshot ${version}: ${documents.length} documents`)
+  return { manifest, documents, next: 0, shardSize: Math.max(1, options.shardSize ?? 25) }
+}
+
+/**
+ * Crawl the next batch of documents, writing each shard as soon as it is full,
+ * then save the progress or publish the snapshot
+ */
+async function crawlBatch(
+  store: SnapshotStore,
+  state: CrawlState,
+  options: CrawlOptions,
+): Promise<CrawlProgress> {
+  const { manifest, documents } = state
+  const end = Math.min(documents.length, state.next + Math.max(1, options.batchSize ?? 200))
+  const batch = documents.slice(state.next, end)
+
+  let shard: Record<string, SupportGuidePage | string> = {}
+  let shardLength = 0
+  const flush = async () => {
+    if (shardLength === 0) return
+    await putItem(store, manifest.version, `shard:${manifest.shards}`, shard)
+    manifest.shards++
+    shard = {}
+    shardLength = 0
+  }
+
+  // Documents join shards in crawl order, so pages from the same part of a
+  // guide share a shard; only those waiting on an earlier one are held
+  const settled = new Map<number, SupportGuidePage | string | undefined>()
+  let ordered = 0
+
+  for await (const result of mapWithConcurrency(batch, options.concurrency ?? 6, crawlDocument)) {
+    if (result.ok) {
+      settled.set(result.index, result.value)
+    } else {
+      settled.set(result.index, undefined)
+      manifest.failures.push({ key: result.item.key, error: errorMessage(result.error) })
+    }
+
+    while (settled.has(ordered)) {
+      const value = settled.get(ordered)
+      const { key } = batch[ordered]
+      settled.delete(ordered)
+      ordered++
+      if (value === undefined) continue
+
+      shard[key] = value
+      shardLength++
+      manifest.documents[key] = manifest.shards
+      if (shardLength >= state.shardSize) await flush()
+    }
+  }
+  await flush()
+  state.next = end
+
+  if (state.next < documents.length) {
+    await store.put(CRAWL_STATE_KEY, await compressJSON(state), { expirationTtl: CRAWL_STATE_TTL })
+    console.log(
+      `⟳ Snapshot ${manifest.version}: crawled ${state.next} of ${documents.length} documents`,
+    )
+    return {
+      status: "crawling",
+      version: manifest.version,
+      crawled: state.next,
+      total: documents.length,
+    }
+  }
+
+  await store.delete(CRAWL_STATE_KEY)
+
+  if (manifest.shards === 0 && manifest.tocs.length === 0 && manifest.catalogs.length === 0) {
+    throw new Error("Snapshot crawl produced no content")
+  }
+
+  manifest.createdAt = Date.now()
+  await putItem(store, manifest.version, "manifest", manifest)
+  await store.put(
+    CURRENT_SNAPSHOT_KEY,
+    new TextEncoder().encode(manifest.version).buffer as ArrayBuffer,
+  )
+
+  const crawled = Object.keys(manifest.documents).length
+  console.log(
+    `✓ Published snapshot ${manifest.version}: ${crawled} documents ` +
+      `in ${manifest.shards} shards, ${manifest.failures.length} failures`,
+  )
+
+  return { status: "published", manifest }
+}
+
+/**
+ * Run one invocation of a snapshot crawl, starting a new crawl unless one is
+ * in progress
+ *
+ * Each invocation crawls up to `batchSize` documents. Pages that fail are
+ * recorded in the manifest and keep being fetched live. The current snapshot
+ * pointer only moves once every document has been crawled.
+ *
+ * @param store - Where the snapshot is written
+ * @param options - What to crawl and how; what to crawl only applies to new crawls
+ * @returns Progress of the crawl, with the manifest once published
+ */
+export async function crawlSnapshot(
+  store: SnapshotStore,
+  options: CrawlOptions = {},
+): Promise<CrawlProgress> {
+  const state = (await readCrawlState(store)) ?? (await startCrawl(store, options))
+  return crawlBatch(store, state, options)
+}
+
+/**
+ * Continue the crawl in progress, if any
+ *
+ * @returns Progress of the crawl, or undefined when none is in progress
+ */
+export async function resumeSnapshotCrawl(
+  store: SnapshotStore,
+  options: CrawlOptions = {},
+): Promise<CrawlProgress | undefined> {
+  const state = await readCrawlState(store)
+  return state ? crawlBatch(store, state, options) : undefined
+}
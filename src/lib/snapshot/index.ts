@@ -0,0 +1,27 @@
+/**
+ * Prebuilt snapshots of the guides and training catalogs
+ * A scheduled crawl stores every page in KV so cold isolates can serve
+ * content without fetching from Apple
+ */
+
+export type { CrawlOptions, CrawlProgress } from "./crawler"
+export {
+  CRAWL_STATE_KEY,
+  crawlSnapshot,
+  resumeSnapshotCrawl,
+  SNAPSHOT_EXPIRATION_TTL,
+} from "./crawler"
+export {
+  CURRENT_SNAPSHOT_KEY,
+  getSnapshotManifest,
+  getSnapshotStore,
+  readSnapshotCatalog,
+  readSnapshotDocument,
+  readSnapshotIndex,
+  readSnapshotToc,
+  SNAPSHOT_MAX_AGE,
+  setSnapshotStore,
+  snapshotKey,
+} from "./reader"
+export { compressJSON, decompressJSON, KvSnapshotStore, MemorySnapshotStore } from "./store"
+export type { SnapshotManifest, SnapshotStore } from "./types"
@@ -0,0 +1,156 @@
+/**
+ * Runtime access to the current snapshot
+ * Lookups are answered from the snapshot when it is present and fresh, so
+ * cold isolates can serve guides and tutorials without scraping Apple
+ */
+
+import { CONTENT_CACHE } from "../cache"
+import { countCacheEvent, measure } from "../metrics"
+import type { SerializedSearchIndex } from "../search"
+import { decompressJSON } from "./store"
+import type { SnapshotManifest, SnapshotStore } from "./types"
+
+/** Snapshots older than this are ignored in favor of live fetching */
+export const SNAPSHOT_MAX_AGE = 1000 * 60 * 60 * 24 * 7
+
+// How often an isolate checks for a newer snapshot version
+const MANIFEST_REFRESH_INTERVAL = 1000 * 60 * 5
+
+/** Key pointing at the current snapshot version */
+export const CURRENT_SNAPSHOT_KEY = "snapshot:current"
+
+/**
+ * Key of an item within a snapshot version
+ */
+export function snapshotKey(version: string, item: string): string {
+  return `snapshot:${version}:${item}`
+}
+
+let snapshotStore: SnapshotStore | undefined
+let manifest: { value: SnapshotManifest | undefined; checkedAt: number } | undefined
+let manifestPromise: Promise<SnapshotManifest | undefined> | undefined
+
+/**
+ * Configure where snapshots are read from
+ * Pass `undefined` to disable snapshot lookups
+ */
+export function setSnapshotStore(store: SnapshotStore | undefined): void {
+  snapshotStore = store
+  manifest = undefined
+  manifestPromise = undefined
+}
+
+/**
+ * Get the currently configured snapshot store, if any
+ */
+export function getSnapshotStore(): SnapshotStore | undefined {
+  return snapshotStore
+}
+
+/**
+ * Get the manifest of the current snapshot, or undefined when there is no
+ * usable (present and fresh) snapshot
+ */
+export async function getSnapshotManifest(): Promise<SnapshotManifest | undefined> {
+  const store = snapshotStore
+  if (!store) return undefined
+
+  if (!manifest || Date.now() - manifest.checkedAt >= MANIFEST_REFRESH_INTERVAL) {
+    manifestPromise ??= loadManifest(store).finally(() => {
+      manifestPromise = undefined
+    })
+    manifest = { value: await manifestPromise, checkedAt: Date.now() }
+  }
+
+  const current = manifest.value
+  if (current && Date.now() - current.createdAt >= SNAPSHOT_MAX_AGE) {
+    console.log(`⟳ Snapshot ${current.version} is stale, fetching live`)
+    return undefined
+  }
+
+  return current
+}
+
+async function loadManifest(store: SnapshotStore): Promise<SnapshotManifest | undefined> {
+  try {
+    const pointer = await store.get(CURRENT_SNAPSHOT_KEY)
+    if (!pointer) return undefined
+
+    const version = new TextDecoder().decode(pointer)
+    const data = await store.get(snapshotKey(version, "manifest"))
+    return data ? await decompressJSON<SnapshotManifest>(data) : undefined
+  } catch (error) {
+    console.error("Failed to read snapshot manifest:", error)
+    return undefined
+  }
+}
+
+/**
+ * Read a snapshot item, keeping the decoded value in the shared content cache
+ */
+async function readItem<T>(item: string): Promise<T | undefined> {
+  const current = await getSnapshotManifest()
+  const store = snapshotStore
+  if (!current || !store) return undefined
+
+  const key = snapshotKey(current.version, item)
+  const cached = CONTENT_CACHE.get(key) as T | undefined
+  if (cached !== undefined) return cached
+
+  try {
+    const data = await store.get(key)
+    if (!data) return undefined
+
+    const value = await decompressJSON<T>(data)
+    CONTENT_CACHE.set(key, value)
+    return value
+  } catch (error) {
+    console.error(`Failed to read snapshot item ${item}:`, error)
+    return undefined
+  }
+}
+
+/**
+ * Read a document ("markdown:<guide>/<slug>" or "tutorial:<catalog>/<id>") from the snapshot
+ */
+export async function readSnapshotDocument<T>(documentKey: string): Promise<T | undefined> {
+  const current = await getSnapshotManifest()
+  const shard = current?.documents[documentKey]
+  if (shard === undefined) {
+    if (current) countCacheEvent("snapshot", "miss")
+    return undefined
+  }
+
+  // Shards hold neighboring documents, so related pages are decoded together
+  const documents = await measure("snapshot", () =>
+    readItem<Record<string, T>>(`shard:${shard}`),
+  )
+  const document = documents?.[documentKey]
+  if (document !== undefined) {
+    countCacheEvent("snapshot", "hit")
+    console.log(`✓ Snapshot hit for ${documentKey}`)
+  }
+  return document
+}
+
+/**
+ * Read a guide table of contents from the snapshot
+ */
+export function readSnapshotToc<T>(guide: string): Promise<T | undefined> {
+  return readItem<T>(`toc:${guide}`)
+}
+
+/**
+ * Read a training catalog from the snapshot
+ */
+export function readSnapshotCatalog<T>(catalog: string): Promise<T | undefined> {
+  return readItem<T>(`catalog:${catalog}`)
+}
+
+/**
+ * Read the prebuilt search index of a ToC ("toc:<guide>") or catalog
+ * ("catalog:<catalog>") from the snapshot
+ */
+export function readSnapshotIndex(item: string): Promise<SerializedSearchIndex | undefined> {
+  return readItem<SerializedSearchIndex>(`index:${item}`)
+}
@@ -0,0 +1,69 @@
+/**
+ * Snapshot storage backends and compression helpers
+ */
+
+import type { SnapshotStore } from "./types"
+
+/**
+ * Gzip-compress a JSON-serializable value
+ */
+export async function compressJSON(value: unknown): Promise<ArrayBuffer> {
+  const stream = new Blob([JSON.stringify(value)])
+    .stream()
+    .pipeThrough(new CompressionStream("gzip"))
+  return new Response(stream).arrayBuffer()
+}
+
+/**
+ * Decompress and parse a value written by `compressJSON`
+ */
+export async function decompressJSON<T>(data: ArrayBuffer): Promise<T> {
+  const stream = new Blob([data]).stream().pipeThrough(new DecompressionStream("gzip"))
+  return (await new Response(stream).json()) as T
+}
+
+/**
+ * Snapshot store backed by a KV namespace
+ */
+export class KvSnapshotStore implements SnapshotStore {
+  constructor(private readonly namespace: KVNamespace) {}
+
+  get(key: string): Promise<ArrayBuffer | null> {
+    return this.namespace.get(key, "arrayBuffer")
+  }
+
+  put(key: string, value: ArrayBuffer, options?: { expirationTtl?: number }): Promise<void> {
+    return this.namespace.put(key, value, options)
+  }
+
+  delete(key: string): Promise<void> {
+    return this.namespace.delete(key)
+  }
+}
+
+/**
+ * In-memory snapshot store, used in tests
+ */
+export class MemorySnapshotStore implements SnapshotStore {
+  private entries = new Map<string, ArrayBuffer>()
+
+  async get(key: string): Promise<ArrayBuffer | null> {
+    return this.entries.get(key) ?? null
+  }
+
+  async put(key: string, value: ArrayBuffer): Promise<void> {
+    this.entries.set(key, value)
+  }
+
+  async delete(key: string): Promise<void> {
+    this.entries.delete(key)
+  }
+
+  get size(): number {
+    return this.entries.size
+  }
+
+  keys(): string[] {
+    return [...this.entries.keys()]
+  }
+}
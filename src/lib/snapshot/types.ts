@@ -0,0 +1,30 @@
+/**
+ * Types for prebuilt guide and training snapshots
+ */
+
+/**
+ * Binary key-value storage holding snapshot bundles (KV in production)
+ */
+export interface SnapshotStore {
+  get(key: string): Promise<ArrayBuffer | null>
+  put(key: string, value: ArrayBuffer, options?: { expirationTtl?: number }): Promise<void>
+  delete(key: string): Promise<void>
+}
+
+/**
+ * Index of a snapshot version, stored alongside its shards
+ */
+export interface SnapshotManifest {
+  version: string
+  /** When the crawl finished (ms since epoch) */
+  createdAt: number
+  /** Shard of each document, keyed "markdown:<guide>/<slug>" or "tutorial:<catalog>/<id>" */
+  documents: Record<string, number>
+  shards: number
+  /** Guides whose tables of contents are included */
+  tocs: string[]
+  /** Training catalogs included */
+  catalogs: string[]
+  /** Documents that could not be crawled, with the reason */
+  failures: Array<{ key: string; error: string }>
+}
@@ -0,0 +1,86 @@
+/**
+ * Statistics served by /cache-stats
+ * Each isolate reports its own metrics, content cache and circuit breakers;
+ * the main worker merges them with those of the MCP session Durable Objects
+ */
+
+import { CONTENT_CACHE, type LruCacheStats } from "./cache"
+import { exportMetrics, type IsolateMetrics, type MetricsSnapshot, mergeMetrics } from "./metrics"
+import { type CircuitState, UPSTREAM } from "./upstream"
+
+type KindUsage = Record<string, { entries: number; bytes: number }>
+
+/**
+ * Statistics of a single isolate
+ */
+export interface IsolateStats {
+  metrics: IsolateMetrics
+  content: LruCacheStats & { kinds: KindUsage }
+  circuits: Record<string, CircuitState>
+}
+
+/**
+ * Statistics merged across isolates
+ */
+export interface CacheStats extends MetricsSnapshot {
+  /** Content caches of every isolate, added up */
+  content: LruCacheStats & { kinds: KindUsage }
+  /** Worst state of each host's circuit across isolates */
+  circuits: Record<string, CircuitState>
+}
+
+// Severity of circuit states, to report the worst one of a host
+const CIRCUIT_SEVERITY: Record<CircuitState, number> = { closed: 0, "half-open": 1, open: 2 }
+
+/**
+ * Statistics of this isolate
+ */
+export function getIsolateStats(): IsolateStats {
+  return {
+    metrics: exportMetrics(),
+    content: { ...CONTENT_CACHE.stats(), kinds: CONTENT_CACHE.usage() },
+    circuits: UPSTREAM.circuits(),
+  }
+}
+
+/**
+ * Merge the statistics of several isolates, counting each isolate once
+ */
+export function mergeIsolateStats(isolates: IsolateStats[]): CacheStats {
+  const unique = [...new Map(isolates.map((stats) => [stats.metrics.isolate, stats])).values()]
+
+  const content: CacheStats["content"] = {
+    entries: 0,
+    bytes: 0,
+    maxBytes: 0,
+    hits: 0,
+    misses: 0,
+    evictions: 0,
+    expirations: 0,
+    kinds: {},
+  }
+  const circuits: CacheStats["circuits"] = {}
+
+  for (const stats of unique) {
+    const { kinds, ...counters } = stats.content
+    for (const [name, value] of Object.entries(counters) as Array<[keyof LruCacheStats, number]>) {
+      content[name] += value
+    }
+    for (const [kind, usage] of Object.entries(kinds)) {
+      content.kinds[kind] ??= { entries: 0, bytes: 0 }
+      content.kinds[kind].entries += usage.entries
+      content.kinds[kind].bytes += usage.bytes
+    }
+
+    for (const [host, state] of Object.entries(stats.circuits)) {
+      const current = circuits[host]
+      if (!current || CIRCUIT_SEVERITY[state] > CIRCUIT_SEVERITY[current]) circuits[host] = state
+    }
+  }
+
+  return {
+    ...mergeMetrics(unique.map((stats) => stats.metrics)),
+    content,
+    circuits,
+  }
+}
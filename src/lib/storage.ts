@@ -0,0 +1,33 @@
+/**
+ * Storage configuration shared by the Worker and its Durable Objects
+ */
+
+import { CacheApiStore, setPersistentStore } from "./cache"
+import { KvSnapshotStore, setSnapshotStore } from "./snapshot"
+
+/**
+ * Storage bindings read from the Worker environment
+ */
+export interface StorageBindings {
+  CATALOG_KV?: KVNamespace
+  SNAPSHOT_KV?: KVNamespace
+}
+
+let configured = false
+
+/**
+ * Point the catalog and snapshot caches at the bound storage (once per isolate)
+ */
+export function configureStorage(env: StorageBindings): void {
+  if (configured) return
+
+  // Persistent catalog tier: KV when bound, otherwise the data center's Cache API
+  setPersistentStore(env.CATALOG_KV ?? new CacheApiStore("supportify-catalog"))
+
+  // Prebuilt snapshot, when the scheduled crawl has somewhere to write it
+  if (env.SNAPSHOT_KV) {
+    setSnapshotStore(new KvSnapshotStore(env.SNAPSHOT_KV))
+  }
+
+  configured = true
+}
@@ -3,60 +3,149 @@
  * Fetches and renders Apple Platform Security and Deployment guides
  */
 
-export { fetchSupportGuidePage, parseSupportGuideHTML } from "./fetch"
+import { CONTENT_CACHE, serveStaleContent } from "../cache"
+import { coalesce } from "../fetch"
+import { measureSync } from "../metrics"
+import { splitSections } from "../sections"
+import { readSnapshotDocument } from "../snapshot/reader"
+import { fetchAndParseSupportGuidePage } from "./fetch"
+import { renderSupportGuideMarkdown } from "./render"
+import type { SupportGuidePage } from "./types"
+
+export {
+  fetchAndParseSupportGuidePage,
+  fetchSupportGuidePage,
+  fetchSupportGuideResponse,
+} from "./fetch"
+export { parseSupportGuideHTML, parseSupportGuideResponse } from "./parser"
 export { renderSupportGuideMarkdown } from "./render"
 export type { TocItem, TocSection } from "./toc"
-export { fetchTableOfContents, findTopic, searchToc } from "./toc"
-export type { ParsedContent, SupportGuideMetadata } from "./types"
-
-// Cache for rendered markdown (guide/path -> {markdown, timestamp})
-const MARKDOWN_CACHE: Map<string, { markdown: string; timestamp: number }> = new Map()
-const MARKDOWN_CACHE_DURATION = 1000 * 60 * 60 * 24 // 24 hours
-const MAX_MARKDOWN_CACHE_SIZE = 100
+export {
+  fetchTableOfContents,
+  findTopic,
+  getTocSearchIndex,
+  loadTableOfContents,
+  searchToc,
+} from "./toc"
+export type { ParsedContent, SupportGuideMetadata, SupportGuidePage } from "./types"
 
 /**
- * Main function to fetch and render a support guide page
+ * Fetch a support guide page, rendered as Markdown along with its metadata
  *
  * @param guide - The guide name ("security" or "deployment")
  * @param path - The page path/slug
  * @param sourceUrl - Optional source URL (will be generated if not provided)
- * @returns Markdown content
+ * @returns The rendered page
  */
-export async function fetchAndRenderSupportGuide(
+export async function fetchSupportGuide(
   guide: string,
   path: string,
   sourceUrl?: string,
-): Promise<string> {
+): Promise<SupportGuidePage> {
   // Normalize path for consistent caching
   const normalizedPath = path.replace(/^\/+|\/+$/g, "")
-  const cacheKey = `${guide}/${normalizedPath}`
+  const pageId = `${guide}/${normalizedPath}`
+  const cacheKey = `markdown:${pageId}`
 
   // Check markdown cache first (fastest path)
-  const cached = MARKDOWN_CACHE.get(cacheKey)
-  const now = Date.now()
+  const cached = CONTENT_CACHE.get(cacheKey) as SupportGuidePage | undefined
 
-  if (cached && now - cached.timestamp < MARKDOWN_CACHE_DURATION) {
-    console.log(`✓ Markdown cache hit for ${cacheKey}`)
-    return cached.markdown
+  if (cached !== undefined) {
+    console.log(`✓ Markdown cache hit for ${pageId}`)
+    return cached
   }
 
-  // Fetch and render
-  const { fetchSupportGuidePage, parseSupportGuideHTML } = await import("./fetch")
-  const { renderSupportGuideMarkdown } = await import("./render")
+  // Concurrent requests for the same page share one fetch and parse
+  return coalesce(cacheKey, async () => {
+    const snapshot = await readSnapshotPage(guide, normalizedPath)
+    if (snapshot) {
+      CONTENT_CACHE.set(cacheKey, snapshot, { size: pageSize(snapshot) })
+      return snapshot
+    }
 
-  const html = await fetchSupportGuidePage(guide, normalizedPath)
-  const parsed = await parseSupportGuideHTML(html)
+    let page: SupportGuidePage
+    try {
+      page = await renderSupportGuidePage(guide, normalizedPath, sourceUrl)
+    } catch (error) {
+      return serveStaleContent<SupportGuidePage>(cacheKey, error)
+    }
 
-  const url = sourceUrl || `https://support.apple.com/guide/${guide}/${normalizedPath}/web`
-  const markdown = renderSupportGuideMarkdown(parsed, url)
+    // Cache the rendered markdown
+    CONTENT_CACHE.set(cacheKey, page, { size: pageSize(page) })
+    console.log(`✓ Cached markdown for ${pageId}`)
 
-  // Cache the rendered markdown
-  if (MARKDOWN_CACHE.size >= MAX_MARKDOWN_CACHE_SIZE) {
-    const firstKey = MARKDOWN_CACHE.keys().next().value
-    MARKDOWN_CACHE.delete(firstKey)
-  }
-  MARKDOWN_CACHE.set(cacheKey, { markdown, timestamp: now })
-  console.log(`✓ Cached markdown for ${cacheKey}`)
+    return page
+  })
+}
+
+/**
+ * Approximate memory held by a cached page: its Markdown plus section offsets
+ */
+function pageSize(page: SupportGuidePage): number {
+  return page.markdown.length * 2 + page.sections.length * 64
+}
+
+/**
+ * Look a page up in the snapshot, by its full path or by its trailing topic ID
+ * (e.g. "secure-enclave-sec59b0b31ff" is stored as "sec59b0b31ff")
+ */
+async function readSnapshotPage(
+  guide: string,
+  path: string,
+): Promise<SupportGuidePage | undefined> {
+  const slug = path.split("-").pop()
+  const page =
+    (await readSnapshotDocument<SupportGuidePage>(`markdown:${guide}/${path}`)) ??
+    (slug && slug !== path
+      ? await readSnapshotDocument<SupportGuidePage>(`markdown:${guide}/${slug}`)
+      : undefined)
 
-  return markdown
+  // Snapshots crawled before pages were split into sections
+  return page && { ...page, sections: page.sections ?? splitSections(page.markdown) }
+}
+
+/**
+ * Fetch a support guide page from Apple and render it, bypassing the Markdown cache
+ *
+ * @param guide - The guide name ("security" or "deployment")
+ * @param path - The normalized page path/slug
+ * @param sourceUrl - Optional source URL (will be generated if not provided)
+ * @returns The rendered page
+ */
+export async function renderSupportGuidePage(
+  guide: string,
+  path: string,
+  sourceUrl?: string,
+): Promise<SupportGuidePage> {
+  // The page is parsed as it streams in, so the raw HTML is never held in full
+  const parsed = await fetchAndParseSupportGuidePage(guide, path)
+
+  const url = sourceUrl || `https://support.apple.com/guide/${guide}/${path}/web`
+  return measureSync("render", () => {
+    const markdown = renderSupportGuideMarkdown(parsed, url)
+    return {
+      url,
+      title: parsed.title,
+      publishedDate: parsed.publishedDate,
+      markdown,
+      sections: splitSections(markdown),
+    }
+  })
+}
+
+/**
+ * Main function to fetch and render a support guide page
+ *
+ * @param guide - The guide name ("security" or "deployment")
+ * @param path - The page path/slug
+ * @param sourceUrl - Optional source URL (will be generated if not provided)
+ * @returns Markdown content
+ */
+export async function fetchAndRenderSupportGuide(
+  guide: string,
+  path: string,
+  sourceUrl?: string,
+): Promise<string> {
+  const page = await fetchSupportGuide(guide, path, sourceUrl)
+  return page.markdown
 }
@@ -0,0 +1,532 @@
+/**
+ * Streaming HTML parser for Apple Support guides
+ * Converts a page to Markdown in a single pass with HTMLRewriter, without
+ * buffering the full HTML document
+ */
+
+import type { ParsedContent } from "./types"
+
+const SUPPORT_BASE_URL = "https://support.apple.com"
+
+// Elements whose content is never part of the article
+const SKIPPED_TAGS = new Set([
+  "script",
+  "style",
+  "noscript",
+  "template",
+  "svg",
+  "nav",
+  "header",
+  "footer",
+  "aside",
+  "form",
+  "button",
+  "select",
+  "iframe",
+  "object",
+])
+
+// Page chrome identified by class name
+const SKIPPED_CLASSES = [
+  "globalnav",
+  "localnav",
+  "ac-gn",
+  "ac-ln",
+  "ac-gf",
+  "globalfooter",
+  "footer",
+  "breadcrumb",
+  "feedback",
+  "visuallyhidden",
+]
+
+const SKIPPED_IDS = ["toc-hidden", "modal-toc-container"]
+
+// Elements that never have an end tag
+const VOID_TAGS = new Set([
+  "area",
+  "base",
+  "br",
+  "col",
+  "embed",
+  "hr",
+  "img",
+  "input",
+  "link",
+  "meta",
+  "source",
+  "track",
+  "wbr",
+])
+
+const HEADING_LEVELS: Record<string, number> = { h2: 2, h3: 3, h4: 4, h5: 4, h6: 4 }
+
+const NAMED_ENTITIES: Record<string, string> = {
+  amp: "&",
+  lt: "<",
+  gt: ">",
+  quot: '"',
+  apos: "'",
+  nbsp: " ",
+  ndash: "–",
+  mdash: "—",
+  hellip: "…",
+  lsquo: "‘",
+  rsquo: "’",
+  ldquo: "“",
+  rdquo: "”",
+  trade: "™",
+  reg: "®",
+  copy: "©",
+  rarr: "→",
+  larr: "←",
+  bull: "•",
+  middot: "·",
+  times: "×",
+}
+
+/**
+ * Decode HTML character references
+ */
+export function decodeEntities(text: string): string {
+  if (!text.includes("&")) return text
+
+  return text.replace(/&(#x[0-9a-f]+|#\d+|[a-z]+);/gi, (match, entity: string) => {
+    if (entity[0] === "#") {
+      const codePoint =
+        entity[1] === "x" || entity[1] === "X"
+          ? Number.parseInt(entity.slice(2), 16)
+          : Number.parseInt(entity.slice(1), 10)
+      return Number.isFinite(codePoint) && codePoint > 0 && codePoint <= 0x10ffff
+        ? String.fromCodePoint(codePoint)
+        : match
+    }
+    return NAMED_ENTITIES[entity.toLowerCase()] ?? match
+  })
+}
+
+/**
+ * Clean up the page title ("Secure Enclave - Apple Support" -> "Secure Enclave")
+ */
+function cleanTitle(title: string): string {
+  return decodeEntities(title)
+    .replace(/\s+/g, " ")
+    .trim()
+    .replace(/ - Apple Support$/, "")
+    .replace(/Apple Platform /, "")
+}
+
+function resolveHref(href: string): string {
+  return href.startsWith("/") ? `${SUPPORT_BASE_URL}${href}` : href
+}
+
+interface ListContext {
+  ordered: boolean
+  index: number
+}
+
+interface Block {
+  text: string
+  listItem: boolean
+}
+
+/**
+ * Accumulates Markdown while HTMLRewriter walks the document
+ *
+ * Element handlers push state and undo it in the matching end tag handler, so
+ * nested elements never emit their text twice; text is only ever received
+ * once, through the document-level text handler.
+ */
+class MarkdownBuilder {
+  private blocks: Block[] = []
+  private inline = ""
+  private inlineIsListItem = false
+
+  private title = ""
+  private documentTitle = ""
+  private publishedDate?: string
+  private relatedLinks: string[] = []
+
+  private inBody = false
+  private skipDepth = 0
+  private titleDepth = 0
+  private documentTitleDepth = 0
+  private preDepth = 0
+  private relatedDepth = 0
+  private lists: ListContext[] = []
+  private tables: string[][][] = []
+  private inCell = false
+
+  // End tag handlers registered while handling the current element
+  private endHandlers: Array<() => void> = []
+
+  // Text nodes can arrive in several chunks; published dates are matched per node
+  private textNode = ""
+
+  element(element: Element) {
+    const tag = element.tagName.toLowerCase()
+    this.endHandlers = []
+
+    this.handleElement(element, tag)
+
+    const handlers = this.endHandlers
+    if (handlers.length === 0 || VOID_TAGS.has(tag)) return
+
+    try {
+      element.onEndTag(() => {
+        for (let i = handlers.length - 1; i >= 0; i--) {
+          handlers[i]()
+        }
+      })
+    } catch {
+      // Self-closing foreign elements (e.g. <path/>) have no end tag
+    }
+  }
+
+  text(text: Text) {
+    this.textNode += text.text
+    if (text.lastInTextNode) {
+      this.matchPublishedDate(this.textNode)
+      this.textNode = ""
+    }
+
+    if (this.documentTitleDepth > 0) {
+      this.documentTitle += text.text
+      return
+    }
+
+    if (!this.inBody || this.skipDepth > 0 || !text.text) return
+
+    if (this.preDepth > 0) {
+      this.inline += text.text
+      return
+    }
+
+    // Collapse whitespace as a browser would
+    const collapsed = text.text.replace(/\s+/g, " ")
+    if (collapsed.startsWith(" ")) this.space()
+    this.inline += collapsed.trimStart()
+  }
+
+  getResult(): ParsedContent {
+    this.flush()
+
+    let body = ""
+    this.blocks.forEach((block, i) => {
+      if (i > 0) {
+        body += block.listItem && this.blocks[i - 1].listItem ? "\n" : "\n\n"
+      }
+      body += block.text
+    })
+
+    return {
+      title: this.title || cleanTitle(this.documentTitle),
+      body,
+      publishedDate: this.publishedDate,
+      relatedLinks: this.relatedLinks.length > 0 ? this.relatedLinks : undefined,
+    }
+  }
+
+  private handleElement(element: Element, tag: string) {
+    if (tag === "body") {
+      this.inBody = true
+      return
+    }
+
+    if (tag === "title" && !this.inBody) {
+      this.documentTitleDepth++
+      this.onEnd(() => this.documentTitleDepth--)
+      return
+    }
+
+    if (!this.inBody || VOID_TAGS.has(tag)) {
+      if (tag === "br" && this.inBody && this.skipDepth === 0) this.lineBreak()
+      return
+    }
+
+    if (this.skipDepth > 0 || this.isChrome(tag, element)) {
+      this.skipDepth++
+      this.onEnd(() => this.skipDepth--)
+      return
+    }
+
+    const className = element.getAttribute("class") || ""
+    if (className.includes("LinkUniversal") || className.includes("related-links")) {
+      this.flush()
+      this.relatedDepth++
+      this.onEnd(() => {
+        this.relatedDepth--
+        this.inline = ""
+      })
+    }
+
+    switch (tag) {
+      case "h1":
+        if (this.title || this.relatedDepth > 0) return
+        this.flush()
+        this.titleDepth++
+        this.onEnd(() => {
+          this.titleDepth--
+          this.title = cleanTitle(this.inline)
+          this.inline = ""
+        })
+        return
+
+      case "h2":
+      case "h3":
+      case "h4":
+      case "h5":
+      case "h6":
+        if (this.relatedDepth > 0) return
+        this.block(`${"#".repeat(HEADING_LEVELS[tag])} `)
+        return
+
+      case "p":
+        // Paragraphs inside list items and table cells continue the same block
+        if (this.inCell || this.lists.length > 0) {
+          this.space()
+          return
+        }
+        this.block("")
+        return
+
+      case "ul":
+      case "ol":
+        if (this.lists.length === 0) this.flush()
+        this.lists.push({ ordered: tag === "ol", index: 0 })
+        this.onEnd(() => {
+          this.lists.pop()
+          if (this.lists.length === 0) this.flush()
+        })
+        return
+
+      case "li": {
+        const list = this.lists[this.lists.length - 1]
+        if (!list || this.relatedDepth > 0) return
+        list.index++
+        const indent = "  ".repeat(this.lists.length - 1)
+        this.block(`${indent}${list.ordered ? `${list.index}.` : "-"} `, true)
+        return
+      }
+
+      case "table":
+        this.flush()
+        this.tables.push([])
+        this.onEnd(() => this.emitTable())
+        return
+
+      case "tr":
+        this.tables[this.tables.length - 1]?.push([])
+        return
+
+      case "th":
+      case "td": {
+        const rows = this.tables[this.tables.length - 1]
+        const row = rows?.[rows.length - 1]
+        if (!row || this.inCell) return
+
+        const saved = this.inline
+        this.inline = ""
+        this.inCell = true
+        this.onEnd(() => {
+          row.push(decodeEntities(this.inline).replace(/\s+/g, " ").replace(/\|/g, "\\|").trim())
+          this.inline = saved
+          this.inCell = false
+        })
+        return
+      }
+
+      case "pre":
+        this.flush()
+        this.preDepth++
+        this.onEnd(() => {
+          this.preDepth--
+          const code = decodeEntities(this.inline).replace(/^\n+|\s+$/g, "")
+          this.inline = ""
+          if (code) this.blocks.push({ text: `\`\`\`\n${code}\n\`\`\``, listItem: false })
+        })
+        return
+
+      case "code":
+      case "kbd":
+        this.wrap("`")
+        return
+
+      case "strong":
+      case "b":
+        this.wrap("**")
+        return
+
+      case "em":
+      case "i":
+        this.wrap("*")
+        return
+
+      case "a":
+        this.link(element)
+        return
+    }
+  }
+
+  private isChrome(tag: string, element: Element): boolean {
+    if (SKIPPED_TAGS.has(tag)) return true
+    if (element.hasAttribute("hidden") || element.getAttribute("aria-hidden") === "true") {
+      return true
+    }
+
+    const id = element.getAttribute("id") || ""
+    if (SKIPPED_IDS.some((skipped) => id.includes(skipped))) return true
+
+    const classes = (element.getAttribute("class") || "").split(/\s+/)
+    return classes.some((name) => name.startsWith("toc") || SKIPPED_CLASSES.includes(name))
+  }
+
+  private matchPublishedDate(text: string) {
+    if (this.publishedDate) return
+    const match = text.match(/Published Date:\s*([^<\n]+)/)
+    if (match?.[1].trim()) {
+      this.publishedDate = decodeEntities(match[1]).trim()
+    }
+  }
+
+  private onEnd(handler: () => void) {
+    this.endHandlers.push(handler)
+  }
+
+  /**
+   * Start a new block with the given Markdown prefix, ending it at the end tag
+   */
+  private block(prefix: string, listItem = false) {
+    if (this.inCell) return
+    this.flush()
+    this.inline = prefix
+    this.inlineIsListItem = listItem
+    this.onEnd(() => this.flush())
+  }
+
+  /**
+   * Wrap inline content in a Markdown marker (e.g. ** for bold)
+   */
+  private wrap(marker: string) {
+    if (this.preDepth > 0) return
+
+    const start = this.inline.length
+    this.onEnd(() => {
+      const content = this.inline.slice(start)
+      const trimmed = content.trim()
+      if (!trimmed) return
+
+      const leading = content.startsWith(" ") ? " " : ""
+      const trailing = content.endsWith(" ") ? " " : ""
+      this.inline = `${this.inline.slice(0, start)}${leading}${marker}${trimmed}${marker}${trailing}`
+    })
+  }
+
+  private link(element: Element) {
+    const href = element.getAttribute("href")
+    if (!href || href.startsWith("#") || href.startsWith("javascript:")) return
+
+    const url = resolveHref(decodeEntities(href))
+    const start = this.inline.length
+
+    this.onEnd(() => {
+      const text = this.inline.slice(start).trim()
+      const before = this.inline.slice(0, start)
+
+      if (this.relatedDepth > 0) {
+        this.inline = before
+        const title = decodeEntities(text).replace(/\s+/g, " ")
+        if (title) this.relatedLinks.push(`${title} (${url})`)
+        return
+      }
+
+      this.inline = text ? `${before}[${text}](${url})` : before
+    })
+  }
+
+  private lineBreak() {
+    if (this.preDepth > 0) {
+      this.inline += "\n"
+    } else {
+      this.space()
+    }
+  }
+
+  private space() {
+    if (this.inline && !this.inline.endsWith(" ") && !this.inline.endsWith("\n")) {
+      this.inline += " "
+    }
+  }
+
+  /**
+   * End the current block, emitting it if it has any content
+   */
+  private flush() {
+    if (this.inCell || this.titleDepth > 0 || this.preDepth > 0) return
+
+    const content = decodeEntities(this.inline).trimEnd()
+    const listItem = this.inlineIsListItem
+    this.inline = ""
+    this.inlineIsListItem = false
+
+    // Related links are collected separately; skip blocks that are only a prefix
+    if (this.relatedDepth > 0) return
+    if (!content.replace(/^\s*(#+|-|\d+\.)\s*/, "").trim()) return
+
+    this.blocks.push({ text: content, listItem })
+  }
+
+  private emitTable() {
+    const rows = (this.tables.pop() ?? []).filter((row) => row.length > 0)
+    if (rows.length === 0) return
+
+    // The first row is used as the header row
+    const columns = Math.max(...rows.map((row) => row.length))
+    const format = (row: string[]) =>
+      `| ${Array.from({ length: columns }, (_, i) => row[i] ?? "").join(" | ")} |`
+
+    const lines = [format(rows[0]), `| ${Array(columns).fill("---").join(" | ")} |`]
+    for (const row of rows.slice(1)) {
+      lines.push(format(row))
+    }
+
+    this.blocks.push({ text: lines.join("\n"), listItem: false })
+  }
+}
+
+/**
+ * Parse an Apple Support guide page from a streaming response
+ *
+ * @param response - Response whose body is the page HTML
+ * @returns Parsed content with the body rendered as Markdown
+ */
+export async function parseSupportGuideResponse(response: Response): Promise<ParsedContent> {
+  const builder = new MarkdownBuilder()
+
+  const transformed = new HTMLRewriter()
+    .on("*", { element: (element) => builder.element(element) })
+    .onDocument({ text: (text) => builder.text(text) })
+    .transform(response)
+
+  // Drain the rewritten stream; chunks are discarded as soon as they are parsed
+  const reader = transformed.body?.getReader()
+  if (reader) {
+    while (!(await reader.read()).done) {
+      // Keep reading
+    }
+  }
+
+  return builder.getResult()
+}
+
+/**
+ * Parse Apple Support guide HTML content
+ *
+ * @param html - Raw HTML content
+ * @returns Parsed content
+ */
+export function parseSupportGuideHTML(html: string): Promise<ParsedContent> {
+  return parseSupportGuideResponse(
+    new Response(html, { headers: { "Content-Type": "text/html; charset=utf-8" } }),
+  )
+}
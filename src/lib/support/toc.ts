@@ -3,6 +3,23 @@
  * Extracts all topics and their URLs for easy discovery
  */
 
+import {
+  CATALOG_MAX_STALE,
+  CATALOG_STALE_IF_ERROR,
+  CATALOG_TTL,
+  CatalogCache,
+  type CatalogRevision,
+} from "../cache"
+import { measureSync } from "../metrics"
+import {
+  getSearchIndex,
+  type SearchField,
+  SearchIndex,
+  type SerializedSearchIndex,
+} from "../search"
+import { readSnapshotIndex, readSnapshotToc } from "../snapshot/reader"
+import { UpstreamError, upstreamFetch } from "../upstream"
+
 export interface TocItem {
   title: string
   slug: string
@@ -16,24 +33,56 @@ export interface TocSection {
   subsections?: TocSection[]
 }
 
+const TOC_SEARCH_FIELDS: SearchField<TocItem>[] = [
+  { name: "title", boost: 1, get: (item) => item.title },
+]
+
+const TOC_CACHE = new CatalogCache<TocItem[]>({
+  name: "toc",
+  load: async (guide, cached) => {
+    const toc = await readSnapshotToc<TocItem[]>(guide)
+    if (!toc) return loadTableOfContents(guide, cached)
+
+    getTocSearchIndex(toc, await readSnapshotIndex(`toc:${guide}`))
+    return { value: toc }
+  },
+  ttl: CATALOG_TTL,
+  maxStale: CATALOG_MAX_STALE,
+  staleIfError: CATALOG_STALE_IF_ERROR,
+})
+
 /**
- * Fetch and parse the Table of Contents for a guide
+ * Get the Table of Contents for a guide
+ * Served from cache and refreshed in the background once stale
  */
-export async function fetchTableOfContents(guide: "security" | "deployment"): Promise<TocItem[]> {
+export function fetchTableOfContents(guide: "security" | "deployment"): Promise<TocItem[]> {
+  return TOC_CACHE.get(guide)
+}
+
+/**
+ * Fetch and parse the Table of Contents for a guide from Apple
+ *
+ * @param cached - Previously loaded ToC, returned as is if Apple reports it unchanged
+ */
+export async function loadTableOfContents(
+  guide: string,
+  cached?: CatalogRevision<TocItem[]>,
+): Promise<CatalogRevision<TocItem[]>> {
   const tocUrl = `https://support.apple.com/guide/${guide}/toc`
 
-  const response = await fetch(tocUrl, {
-    headers: {
-      "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-    },
-  })
+  const response = await upstreamFetch(tocUrl, { etag: cached?.etag })
+
+  if (response.status === 304 && cached) {
+    return cached
+  }
 
   if (!response.ok) {
-    throw new Error(`Failed to fetch ToC: ${response.status}`)
+    throw new UpstreamError(`Failed to fetch ToC: ${response.status}`, response.status)
   }
 
   const html = await response.text()
-  return parseTocHtml(html)
+  const value = measureSync("parse", () => parseTocHtml(html))
+  return { value, etag: response.headers.get("ETag") ?? undefined }
 }
 
 /**
@@ -69,19 +118,25 @@ function parseTocHtml(html: string): TocItem[] {
 }
 
 /**
- * Search ToC items by keyword
+ * Get the search index of a ToC, building it on first use
+ *
+ * @param prebuilt - Serialized index of this ToC (e.g. from a snapshot), used instead of
+ *   building it
  */
-export function searchToc(items: TocItem[], query: string): TocItem[] {
-  const lowerQuery = query.toLowerCase()
-  const words = lowerQuery.split(/\s+/).filter((w) => w.length > 2)
+export function getTocSearchIndex(
+  items: TocItem[],
+  prebuilt?: SerializedSearchIndex,
+): SearchIndex<TocItem> {
+  return getSearchIndex(items, () => new SearchIndex(items, TOC_SEARCH_FIELDS, prebuilt))
+}
 
-  return items
-    .filter((item) => {
-      const lowerTitle = item.title.toLowerCase()
-      // Match if any search word appears in title
-      return words.some((word) => lowerTitle.includes(word))
-    })
-    .slice(0, 20) // Limit to 20 results
+/**
+ * Search ToC items by keyword
+ * Ranked by relevance, tolerant of plurals, prefixes and small typos
+ */
+export function searchToc(items: TocItem[], query: string, limit = 20): TocItem[] {
+  const index = getTocSearchIndex(items)
+  return measureSync("search", () => index.search(query, { limit })).map((result) => result.item)
 }
 
 /**
@@ -2,6 +2,8 @@
  * Types for Apple Support guide documentation
  */
 
+import type { MarkdownSection } from "../sections"
+
 export interface SupportGuideMetadata {
   title: string
   url: string
@@ -14,3 +16,16 @@ export interface ParsedContent {
   publishedDate?: string
   relatedLinks?: string[]
 }
+
+/**
+ * A rendered support guide page
+ */
+export interface SupportGuidePage {
+  url: string
+  title: string
+  /** Published date as shown on the page (e.g. "February 18, 2025") */
+  publishedDate?: string
+  markdown: string
+  /** The Markdown split at its headings */
+  sections: MarkdownSection[]
+}
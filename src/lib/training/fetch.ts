@@ -2,7 +2,28 @@
  * Fetch functions for Apple Device Support Training tutorials
  */
 
-import type { TrainingCatalog, TrainingSearchResult, TrainingTutorial } from "./types"
+import {
+  CATALOG_MAX_STALE,
+  CATALOG_STALE_IF_ERROR,
+  CATALOG_TTL,
+  CatalogCache,
+  type CatalogRevision,
+  CONTENT_CACHE,
+  serveStaleContent,
+} from "../cache"
+import { coalesce, NotFoundError } from "../fetch"
+import { measure, measureSync } from "../metrics"
+import { splitSections } from "../sections"
+import { readSnapshotCatalog, readSnapshotDocument, readSnapshotIndex } from "../snapshot/reader"
+import { UpstreamError, upstreamFetch } from "../upstream"
+import { getTrainingModel, type TrainingStructure, type TrainingTutorialEntry } from "./model"
+import type {
+  TrainingCatalog,
+  TrainingSearchResult,
+  TrainingTutorial,
+  TrainingTutorialData,
+  TrainingTutorialDocument,
+} from "./types"
 
 const TRAINING_BASE_URL = "https://it-training.apple.com"
 
@@ -23,184 +44,229 @@ function getTutorialSubdir(catalog: TrainingCatalogType): string {
 }
 
 /**
- * Fetch the complete training catalog
+ * Get the public URL of a training tutorial
  */
-export async function fetchTrainingCatalog(
+export function getTrainingTutorialUrl(
+  tutorialId: string,
+  catalog: TrainingCatalogType = "apt-support",
+): string {
+  return `${TRAINING_BASE_URL}/tutorials/${getTutorialSubdir(catalog)}/${tutorialId}`
+}
+
+const CATALOG_CACHE = new CatalogCache<TrainingCatalog>({
+  name: "training",
+  load: async (catalog, cached) => {
+    const data = await readSnapshotCatalog<TrainingCatalog>(catalog)
+    if (!data) return loadTrainingCatalog(catalog as TrainingCatalogType, cached)
+
+    getTrainingModel(data, await readSnapshotIndex(`catalog:${catalog}`))
+    return { value: data }
+  },
+  ttl: CATALOG_TTL,
+  maxStale: CATALOG_MAX_STALE,
+  staleIfError: CATALOG_STALE_IF_ERROR,
+})
+
+/**
+ * Get the complete training catalog
+ * Served from cache and refreshed in the background once stale
+ */
+export function fetchTrainingCatalog(
   catalog: TrainingCatalogType = "apt-support",
 ): Promise<TrainingCatalog> {
+  return CATALOG_CACHE.get(catalog)
+}
+
+/**
+ * Fetch the complete training catalog from Apple
+ *
+ * @param cached - Previously loaded catalog, returned as is if Apple reports it unchanged
+ */
+export async function loadTrainingCatalog(
+  catalog: TrainingCatalogType,
+  cached?: CatalogRevision<TrainingCatalog>,
+): Promise<CatalogRevision<TrainingCatalog>> {
   const catalogUrl = getCatalogUrl(catalog)
-  const response = await fetch(catalogUrl)
+  const response = await upstreamFetch(catalogUrl, {
+    headers: { Accept: "application/json" },
+    etag: cached?.etag,
+  })
+
+  if (response.status === 304 && cached) {
+    return cached
+  }
 
   if (!response.ok) {
-    throw new Error(`Failed to fetch training catalog: ${response.status} ${response.statusText}`)
+    throw new UpstreamError(
+      `Failed to fetch training catalog: ${response.status} ${response.statusText}`,
+      response.status,
+    )
   }
 
-  return await response.json()
+  const value: TrainingCatalog = await measure("parse", () => response.json())
+  return { value, etag: response.headers.get("ETag") ?? undefined }
+}
+
+const PLATFORM_KEYWORDS = {
+  iphone: ["iphone", "ios"],
+  ipad: ["ipad", "ipados"],
+  mac: ["mac", "macos"],
 }
 
 /**
  * Search training tutorials by query
+ * Ranked by relevance, tolerant of plurals, prefixes and small typos
  */
 export async function searchTrainingTutorials(
   query: string,
   options?: {
     platform?: "iphone" | "ipad" | "mac" | "all"
     catalog?: TrainingCatalogType
+    limit?: number
   },
 ): Promise<TrainingSearchResult[]> {
   const catalog = await fetchTrainingCatalog(options?.catalog || "apt-support")
-  const results: TrainingSearchResult[] = []
-  const queryLower = query.toLowerCase()
-
-  // Search through references for tutorials
-  for (const [key, ref] of Object.entries(catalog.references)) {
-    // Skip non-tutorial references (images, etc.)
-    if (!("kind" in ref) || ref.type !== "topic") {
-      continue
-    }
-
-    const tutorial = ref as TrainingTutorial
-
-    // Extract tutorial ID from identifier or URL
-    const tutorialId = tutorial.url.split("/").pop() || ""
-
-    // Build searchable text
-    const titleText = tutorial.title.toLowerCase()
-    const abstractText = tutorial.abstract
-      .map((item) => item.text)
-      .join(" ")
-      .toLowerCase()
-    const searchText = `${titleText} ${abstractText}`
-
-    // Check if query matches
-    if (!searchText.includes(queryLower)) {
-      continue
-    }
-
-    // Platform filtering
-    if (options?.platform && options.platform !== "all") {
-      const platformKeywords = {
-        iphone: ["iphone", "ios"],
-        ipad: ["ipad", "ipados"],
-        mac: ["mac", "macos"],
-      }
-
-      const keywords = platformKeywords[options.platform]
-      const matchesPlatform = keywords.some((keyword) => searchText.includes(keyword))
-
-      if (!matchesPlatform) {
-        continue
-      }
-    }
-
-    // Find which volume and chapter this tutorial belongs to
-    let volumeName: string | undefined
-    let chapterName: string | undefined
-
-    for (const section of catalog.sections) {
-      if (section.kind === "volume" && section.chapters) {
-        for (const chapter of section.chapters) {
-          if (chapter.tutorials.includes(tutorial.identifier)) {
-            volumeName = section.name
-            chapterName = chapter.name
-            break
-          }
-        }
-      }
-    }
-
-    results.push({
-      tutorialId,
-      title: tutorial.title,
-      abstract: tutorial.abstract.map((item) => item.text).join(" "),
-      estimatedTime: tutorial.estimatedTime,
-      url: `${TRAINING_BASE_URL}${tutorial.url}`,
-      kind: tutorial.kind,
-      volume: volumeName,
-      chapter: chapterName,
-    })
-  }
-
-  // Sort by relevance (exact title match first, then by estimated time)
-  results.sort((a, b) => {
-    const aExactMatch = a.title.toLowerCase() === queryLower
-    const bExactMatch = b.title.toLowerCase() === queryLower
-
-    if (aExactMatch && !bExactMatch) return -1
-    if (!aExactMatch && bExactMatch) return 1
-
-    return 0
-  })
-
-  return results
+  const model = getTrainingModel(catalog)
+
+  // Platform filtering
+  const platform = options?.platform
+  const filter =
+    platform && platform !== "all"
+      ? (entry: TrainingTutorialEntry) =>
+          PLATFORM_KEYWORDS[platform].some((keyword) => entry.searchText.includes(keyword))
+      : undefined
+
+  const matches = measureSync("search", () =>
+    model.index.search(query, { limit: options?.limit ?? 50, filter }),
+  )
+
+  return matches.map(({ item: entry }) => ({
+    tutorialId: entry.id,
+    title: entry.tutorial.title,
+    abstract: entry.abstract,
+    estimatedTime: entry.tutorial.estimatedTime,
+    url: `${TRAINING_BASE_URL}${entry.tutorial.url}`,
+    kind: entry.tutorial.kind,
+    volume: entry.volume,
+    chapter: entry.chapter,
+  }))
 }
 
 /**
- * Fetch a specific training tutorial by ID (metadata only)
+ * Fetch a specific training tutorial by ID or full identifier (metadata only)
  */
 export async function fetchTrainingTutorial(
   tutorialId: string,
   catalog: TrainingCatalogType = "apt-support",
 ): Promise<TrainingTutorial | null> {
   const catalogData = await fetchTrainingCatalog(catalog)
+  return getTrainingModel(catalogData).find(tutorialId)?.tutorial ?? null
+}
 
-  // Search through references for the tutorial
-  for (const [key, ref] of Object.entries(catalogData.references)) {
-    if (!("kind" in ref) || ref.type !== "topic") {
-      continue
-    }
+/**
+ * Fetch full tutorial content with sections and tasks
+ * Concurrent requests for the same tutorial share a single upstream fetch
+ */
+export async function fetchTrainingTutorialContent(
+  tutorialId: string,
+  catalog: TrainingCatalogType = "apt-support",
+): Promise<string> {
+  const document = await fetchTrainingTutorialDocument(tutorialId, catalog)
+  return document.markdown
+}
 
-    const tutorial = ref as TrainingTutorial
-    const refTutorialId = tutorial.url.split("/").pop()
+/**
+ * Fetch a tutorial rendered as Markdown, along with its sections
+ */
+export async function fetchTrainingTutorialDocument(
+  tutorialId: string,
+  catalog: TrainingCatalogType = "apt-support",
+): Promise<TrainingTutorialDocument> {
+  const cacheKey = `tutorial:${catalog}/${tutorialId}`
+  const cached = CONTENT_CACHE.get(cacheKey) as TrainingTutorialDocument | undefined
 
-    if (refTutorialId === tutorialId || tutorial.identifier.includes(tutorialId)) {
-      return tutorial
-    }
+  if (cached !== undefined) {
+    console.log(`✓ Tutorial cache hit for ${catalog}/${tutorialId}`)
+    return cached
   }
 
-  return null
+  return coalesce(cacheKey, async () => {
+    let markdown: string
+    try {
+      markdown =
+        (await readSnapshotDocument<string>(cacheKey)) ??
+        (await loadTrainingTutorialContent(tutorialId, catalog))
+    } catch (error) {
+      return serveStaleContent<TrainingTutorialDocument>(cacheKey, error)
+    }
+
+    const document: TrainingTutorialDocument = {
+      url: getTrainingTutorialUrl(tutorialId, catalog),
+      title: /^# (.+)$/m.exec(markdown)?.[1] ?? tutorialId,
+      markdown,
+      sections: splitSections(markdown),
+    }
+    CONTENT_CACHE.set(cacheKey, document, {
+      size: markdown.length * 2 + document.sections.length * 64,
+    })
+    return document
+  })
 }
 
 /**
- * Fetch full tutorial content with sections and tasks
+ * Fetch a tutorial from Apple and convert it to Markdown
  */
-export async function fetchTrainingTutorialContent(
+export async function loadTrainingTutorialContent(
   tutorialId: string,
-  catalog: TrainingCatalogType = "apt-support",
+  catalog: TrainingCatalogType,
 ): Promise<string> {
   // Fetch the full tutorial JSON
   const subdir = getTutorialSubdir(catalog)
   const contentUrl = `${TRAINING_BASE_URL}/data/tutorials/${subdir}/${tutorialId}.json`
-  const response = await fetch(contentUrl)
+  const response = await upstreamFetch(contentUrl, { headers: { Accept: "application/json" } })
 
   if (!response.ok) {
-    throw new Error(`Failed to fetch tutorial content: ${response.status} ${response.statusText}`)
+    if (response.status === 404) {
+      throw new NotFoundError(`Training tutorial not found at ${contentUrl}`)
+    }
+    throw new UpstreamError(
+      `Failed to fetch tutorial content: ${response.status} ${response.statusText}`,
+      response.status,
+    )
   }
 
-  const tutorialData = await response.json()
+  const tutorialData: TrainingTutorialData = await measure("parse", () => response.json())
+  const url = getTrainingTutorialUrl(tutorialId, catalog)
+  return measureSync("render", () => renderTutorialMarkdown(tutorialData, url))
+}
 
-  // Convert to markdown
+/**
+ * Convert a tutorial's JSON to Markdown
+ */
+function renderTutorialMarkdown(tutorialData: TrainingTutorialData, tutorialUrl: string): string {
   let markdown = `# ${tutorialData.metadata.title}\n\n`
 
   // Add metadata
-  if (tutorialData.sections?.[0]?.estimatedTimeInMinutes) {
-    const hours = Math.floor(tutorialData.sections[0].estimatedTimeInMinutes / 60)
-    const mins = tutorialData.sections[0].estimatedTimeInMinutes % 60
+  const estimatedTime = tutorialData.sections?.[0]?.estimatedTimeInMinutes
+  if (estimatedTime) {
+    const hours = Math.floor(estimatedTime / 60)
+    const mins = estimatedTime % 60
     const timeStr = hours > 0 ? `${hours}hr ${mins}min` : `${mins}min`
     markdown += `**Estimated Time**: ${timeStr}\n\n`
   }
 
-  if (tutorialData.sections?.[0]?.chapter) {
-    markdown += `**Chapter**: ${tutorialData.sections[0].chapter}\n\n`
+  const chapter = tutorialData.sections?.[0]?.chapter
+  if (chapter) {
+    markdown += `**Chapter**: ${chapter}\n\n`
   }
 
   // Add overview/abstract from hero section
-  const heroSection = tutorialData.sections?.find((s: any) => s.kind === "hero")
+  const heroSection = tutorialData.sections?.find((s) => s.kind === "hero")
   if (heroSection?.content) {
     markdown += `## Overview\n\n`
     for (const para of heroSection.content) {
       if (para.type === "paragraph" && para.inlineContent) {
-        const text = para.inlineContent.map((item: any) => item.text || "").join("")
+        const text = para.inlineContent.map((item) => item.text || "").join("")
         markdown += `${text}\n\n`
       }
     }
@@ -237,7 +303,6 @@ export async function fetchTrainingTutorialContent(
   }
 
   // Add footer with source
-  const tutorialUrl = `${TRAINING_BASE_URL}/tutorials/${subdir}/${tutorialId}`
   markdown += `---\n\n`
   markdown += `**Interactive Tutorial**: ${tutorialUrl}\n\n`
   markdown += `*Note: This tutorial includes hands-on exercises and assessments. `
@@ -249,49 +314,9 @@ export async function fetchTrainingTutorialContent(
 /**
  * Get the full training catalog structure
  */
-export async function getTrainingStructure(catalog: TrainingCatalogType = "apt-support"): Promise<{
-  title: string
-  estimatedTime?: string
-  volumes: Array<{
-    name: string
-    chapters: Array<{
-      name: string
-      tutorials: Array<{
-        id: string
-        title: string
-        estimatedTime?: string
-      }>
-    }>
-  }>
-}> {
+export async function getTrainingStructure(
+  catalog: TrainingCatalogType = "apt-support",
+): Promise<TrainingStructure> {
   const catalogData = await fetchTrainingCatalog(catalog)
-
-  const volumes = catalogData.sections
-    .filter((section) => section.kind === "volume")
-    .map((section) => ({
-      name: section.name || "Unnamed Volume",
-      chapters: (section.chapters || []).map((chapter) => ({
-        name: chapter.name,
-        tutorials: chapter.tutorials
-          .map((tutorialIdentifier) => {
-            const tutorial = catalogData.references[tutorialIdentifier] as
-              | TrainingTutorial
-              | undefined
-            if (!tutorial || !("kind" in tutorial)) return null
-
-            return {
-              id: tutorial.url.split("/").pop() || "",
-              title: tutorial.title,
-              estimatedTime: tutorial.estimatedTime,
-            }
-          })
-          .filter((t): t is { id: string; title: string; estimatedTime?: string } => t !== null),
-      })),
-    }))
-
-  return {
-    title: catalogData.metadata.title,
-    estimatedTime: catalogData.metadata.estimatedTime,
-    volumes,
-  }
+  return getTrainingModel(catalogData).structure
 }
@@ -4,4 +4,5 @@
  */
 
 export * from "./fetch"
+export * from "./model"
 export * from "./types"
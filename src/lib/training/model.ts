@@ -0,0 +1,157 @@
+/**
+ * Derived model of a training catalog
+ * Built once per fetched catalog version so lookups, searches and structure
+ * requests never rescan the raw catalog JSON
+ */
+
+import { type SearchField, SearchIndex, type SerializedSearchIndex } from "../search"
+import type { TrainingCatalog, TrainingTutorial } from "./types"
+
+/**
+ * A tutorial with everything derived from the catalog that requests need
+ */
+export interface TrainingTutorialEntry {
+  /** Short tutorial ID, the last segment of its URL (e.g. "sup005") */
+  id: string
+  tutorial: TrainingTutorial
+  /** Abstract paragraphs joined into one string */
+  abstract: string
+  /** Lowercased title and abstract, for keyword filters */
+  searchText: string
+  volume?: string
+  chapter?: string
+}
+
+export interface TrainingStructure {
+  title: string
+  estimatedTime?: string
+  volumes: Array<{
+    name: string
+    chapters: Array<{
+      name: string
+      tutorials: Array<{
+        id: string
+        title: string
+        estimatedTime?: string
+      }>
+    }>
+  }>
+}
+
+const TUTORIAL_SEARCH_FIELDS: SearchField<TrainingTutorialEntry>[] = [
+  { name: "title", boost: 3, get: (entry) => entry.tutorial.title },
+  { name: "abstract", boost: 1, get: (entry) => entry.abstract },
+]
+
+function isTutorial(ref: TrainingCatalog["references"][string]): ref is TrainingTutorial {
+  return "kind" in ref && ref.type === "topic"
+}
+
+/**
+ * Lookup tables and search index for one catalog version
+ */
+export class TrainingCatalogModel {
+  /** Tutorials in catalog order */
+  readonly entries: TrainingTutorialEntry[] = []
+  /** Tutorials by short ID */
+  readonly byId = new Map<string, TrainingTutorialEntry>()
+  /** Tutorials by full DocC identifier */
+  readonly byIdentifier = new Map<string, TrainingTutorialEntry>()
+  readonly structure: TrainingStructure
+
+  private searchIndex: SearchIndex<TrainingTutorialEntry> | undefined
+
+  /**
+   * @param prebuiltIndex - Serialized search index of this catalog (e.g. from a snapshot)
+   */
+  constructor(
+    catalog: TrainingCatalog,
+    private readonly prebuiltIndex?: SerializedSearchIndex,
+  ) {
+    for (const ref of Object.values(catalog.references)) {
+      if (!isTutorial(ref)) continue
+
+      const abstract = ref.abstract.map((item) => item.text).join(" ")
+      const entry: TrainingTutorialEntry = {
+        id: ref.url.split("/").pop() || "",
+        tutorial: ref,
+        abstract,
+        searchText: `${ref.title} ${abstract}`.toLowerCase(),
+      }
+
+      this.entries.push(entry)
+      this.byIdentifier.set(ref.identifier, entry)
+      if (entry.id && !this.byId.has(entry.id)) this.byId.set(entry.id, entry)
+    }
+
+    const volumes: TrainingStructure["volumes"] = []
+    for (const section of catalog.sections) {
+      if (section.kind !== "volume") continue
+
+      const volumeName = section.name || "Unnamed Volume"
+      const chapters = (section.chapters || []).map((chapter) => {
+        const tutorials: Array<{ id: string; title: string; estimatedTime?: string }> = []
+
+        for (const identifier of chapter.tutorials) {
+          const entry = this.byIdentifier.get(identifier)
+          if (!entry) continue
+
+          // A tutorial listed in several chapters belongs to the first one
+          entry.volume ??= section.name
+          entry.chapter ??= chapter.name
+          tutorials.push({
+            id: entry.id,
+            title: entry.tutorial.title,
+            estimatedTime: entry.tutorial.estimatedTime,
+          })
+        }
+
+        return { name: chapter.name, tutorials }
+      })
+
+      volumes.push({ name: volumeName, chapters })
+    }
+
+    this.structure = {
+      title: catalog.metadata.title,
+      estimatedTime: catalog.metadata.estimatedTime,
+      volumes,
+    }
+  }
+
+  /**
+   * Find a tutorial by short ID or full identifier
+   */
+  find(tutorialId: string): TrainingTutorialEntry | undefined {
+    return this.byId.get(tutorialId) ?? this.byIdentifier.get(tutorialId)
+  }
+
+  /**
+   * Full-text index over tutorial titles and abstracts, built on first search
+   */
+  get index(): SearchIndex<TrainingTutorialEntry> {
+    this.searchIndex ??= new SearchIndex(this.entries, TUTORIAL_SEARCH_FIELDS, this.prebuiltIndex)
+    return this.searchIndex
+  }
+}
+
+// Models keyed by the catalog object they were built from, so each catalog
+// version is modeled exactly once and dropped together with it
+const MODELS = new WeakMap<TrainingCatalog, TrainingCatalogModel>()
+
+/**
+ * Get the model of a catalog, building it on first use
+ *
+ * @param prebuiltIndex - Serialized search index, used when the model is first built
+ */
+export function getTrainingModel(
+  catalog: TrainingCatalog,
+  prebuiltIndex?: SerializedSearchIndex,
+): TrainingCatalogModel {
+  let model = MODELS.get(catalog)
+  if (!model) {
+    model = new TrainingCatalogModel(catalog, prebuiltIndex)
+    MODELS.set(catalog, model)
+  }
+  return model
+}
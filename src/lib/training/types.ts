@@ -3,6 +3,8 @@
  * Based on Apple's DocC format at it-training.apple.com
  */
 
+import type { MarkdownSection } from "../sections"
+
 export interface TrainingTutorial {
   identifier: string // e.g., "doc://com.apple.support/tutorials/support/sup005"
   url: string // e.g., "/tutorials/support/sup005"
@@ -58,6 +60,26 @@ export interface TrainingCatalog {
   }
 }
 
+/**
+ * A tutorial's own JSON (/data/tutorials/<subdir>/<id>.json), as far as it is rendered
+ */
+export interface TrainingTutorialData {
+  metadata: { title: string }
+  sections?: Array<{
+    kind?: string
+    estimatedTimeInMinutes?: number
+    chapter?: string
+    content?: Array<{ type: string; inlineContent?: Array<{ type: string; text?: string }> }>
+  }>
+  hierarchy?: {
+    modules?: Array<{
+      projects?: Array<{
+        sections?: Array<{ kind: string; reference: string }>
+      }>
+    }>
+  }
+}
+
 export interface TrainingSearchResult {
   tutorialId: string
   title: string
@@ -68,3 +90,14 @@ export interface TrainingSearchResult {
   volume?: string
   chapter?: string
 }
+
+/**
+ * A tutorial rendered as Markdown
+ */
+export interface TrainingTutorialDocument {
+  url: string
+  title: string
+  markdown: string
+  /** The Markdown split at its headings */
+  sections: MarkdownSection[]
+}
@@ -0,0 +1,316 @@
+/**
+ * Shared client for requests to Apple's servers
+ * Every upstream request is rate limited per host, retried on 429 and 5xx
+ * responses with jittered backoff, and refused outright while the host's
+ * circuit breaker is open
+ */
+
+import { getRandomUserAgent } from "./fetch"
+import { countUpstreamStatus, measure } from "./metrics"
+
+export interface UpstreamOptions {
+  /** Requests per second sent to each host */
+  rate: number
+  /** Requests that may be sent to a host in a burst */
+  burst: number
+  /** Timeout of each attempt (ms) */
+  timeout: number
+  /** Retries after the first attempt */
+  retries: number
+  /** Base delay of the exponential backoff between attempts (ms) */
+  backoff: number
+  /** Longest wait before a retry (ms); a longer Retry-After is not waited for */
+  maxBackoff: number
+  /** Consecutive failed requests after which a host's circuit opens */
+  failureThreshold: number
+  /** How long an open circuit refuses requests before letting one through (ms) */
+  cooldown: number
+}
+
+export interface UpstreamRequest {
+  headers?: Record<string, string>
+  /** ETag of the cached copy, sent as If-None-Match so an unchanged resource returns 304 */
+  etag?: string
+  /** Timeout of each attempt (ms), overriding the client's */
+  timeout?: number
+}
+
+export type CircuitState = "closed" | "open" | "half-open"
+
+export const DEFAULT_UPSTREAM_OPTIONS: UpstreamOptions = {
+  rate: 10,
+  burst: 20,
+  timeout: 15_000,
+  retries: 2,
+  backoff: 250,
+  maxBackoff: 5_000,
+  failureThreshold: 5,
+  cooldown: 30_000,
+}
+
+/**
+ * An upstream request failed after its retries, or was not sent at all
+ */
+export class UpstreamError extends Error {
+  constructor(
+    message: string,
+    readonly status?: number,
+  ) {
+    super(message)
+  }
+}
+
+/**
+ * A request was refused because its host has been failing
+ */
+export class CircuitOpenError extends UpstreamError {}
+
+/**
+ * Whether a response status is worth retrying
+ */
+export function isRetryableStatus(status: number): boolean {
+  return status === 429 || status >= 500
+}
+
+/**
+ * Token bucket letting `rate` requests per second through after an initial burst
+ * Tokens are reserved ahead of time, so concurrent callers queue in order
+ */
+class TokenBucket {
+  private tokens: number
+  private updatedAt = Date.now()
+
+  constructor(
+    private readonly rate: number,
+    private readonly burst: number,
+  ) {
+    this.tokens = burst
+  }
+
+  /**
+   * Reserve a token
+   *
+   * @returns How long to wait before using it (ms)
+   */
+  take(now = Date.now()): number {
+    const elapsed = Math.max(0, now - this.updatedAt)
+    this.tokens = Math.min(this.burst, this.tokens + (elapsed * this.rate) / 1000) - 1
+    this.updatedAt = now
+    return this.tokens >= 0 ? 0 : Math.ceil((-this.tokens * 1000) / this.rate)
+  }
+}
+
+/**
+ * Circuit breaker opening after consecutive failures
+ * Once the cooldown has passed, a single probe request is let through: its
+ * success closes the circuit, its failure opens it again
+ */
+class CircuitBreaker {
+  private failures = 0
+  private openedAt?: number
+  private probing = false
+
+  constructor(
+    private readonly threshold: number,
+    private readonly cooldown: number,
+  ) {}
+
+  state(now = Date.now()): CircuitState {
+    if (this.openedAt === undefined) return "closed"
+    return now - this.openedAt < this.cooldown || this.probing ? "open" : "half-open"
+  }
+
+  /**
+   * Whether a request may be sent, marking it as the probe of a half-open circuit
+   */
+  allow(now = Date.now()): boolean {
+    const state = this.state(now)
+    if (state === "half-open") this.probing = true
+    return state !== "open"
+  }
+
+  success(): void {
+    this.failures = 0
+    this.openedAt = undefined
+    this.probing = false
+  }
+
+  failure(now = Date.now()): void {
+    this.failures++
+    this.probing = false
+    if (this.failures >= this.threshold) this.openedAt = now
+  }
+}
+
+interface UpstreamHost {
+  bucket: TokenBucket
+  breaker: CircuitBreaker
+}
+
+const sleep = (ms: number) =>
+  ms > 0 ? new Promise<void>((resolve) => setTimeout(resolve, ms)) : Promise.resolve()
+
+/**
+ * Delay requested by a Retry-After header (seconds or an HTTP date), in ms
+ */
+export function parseRetryAfter(value: string | null, now = Date.now()): number | undefined {
+  if (!value) return undefined
+
+  const seconds = Number(value)
+  if (Number.isFinite(seconds)) return Math.max(0, seconds * 1000)
+
+  const date = Date.parse(value)
+  return Number.isNaN(date) ? undefined : Math.max(0, date - now)
+}
+
+/**
+ * Rate-limited, retrying HTTP client with a circuit breaker per host
+ */
+export class UpstreamClient {
+  private options: UpstreamOptions
+  private hosts = new Map<string, UpstreamHost>()
+
+  constructor(options: Partial<UpstreamOptions> = {}) {
+    this.options = { ...DEFAULT_UPSTREAM_OPTIONS, ...options }
+  }
+
+  /**
+   * Send a GET request
+   *
+   * Responses other than 429 and 5xx are returned as they are, including 304
+   * and 404. A 429 or 5xx is retried and returned once retries are exhausted.
+   *
+   * @throws CircuitOpenError when the host's circuit is open
+   * @throws UpstreamError when every attempt failed to get a response
+   */
+  async fetch(url: string, request: UpstreamRequest = {}): Promise<Response> {
+    const host = new URL(url).host
+    const { breaker } = this.host(host)
+
+    if (!breaker.allow()) {
+      countUpstreamStatus(host, "circuit-open")
+      throw new CircuitOpenError(`Not requesting ${url}: ${host} is failing, retrying later`)
+    }
+
+    const headers = new Headers({ "User-Agent": getRandomUserAgent(), ...request.headers })
+    if (request.etag) headers.set("If-None-Match", request.etag)
+    const timeout = request.timeout ?? this.options.timeout
+
+    let response: Response
+    try {
+      response = await measure("upstream", () => this.send(url, host, headers, timeout))
+    } catch (error) {
+      breaker.failure()
+      throw error
+    }
+
+    if (isRetryableStatus(response.status)) {
+      breaker.failure()
+    } else {
+      breaker.success()
+    }
+    return response
+  }
+
+  /**
+   * State of a host's circuit breaker
+   */
+  circuit(host: string): CircuitState {
+    return this.hosts.get(host)?.breaker.state() ?? "closed"
+  }
+
+  /**
+   * State of the circuit breaker of every host contacted so far
+   */
+  circuits(): Record<string, CircuitState> {
+    const hosts = [...this.hosts]
+    return Object.fromEntries(hosts.map(([host, { breaker }]) => [host, breaker.state()]))
+  }
+
+  /**
+   * Change options (e.g. lift rate limits for benchmarks), starting hosts afresh
+   */
+  configure(options: Partial<UpstreamOptions>): void {
+    this.options = { ...this.options, ...options }
+    this.hosts.clear()
+  }
+
+  /**
+   * Forget all rate limiting and circuit state
+   */
+  reset(): void {
+    this.hosts.clear()
+  }
+
+  private host(name: string): UpstreamHost {
+    let host = this.hosts.get(name)
+    if (!host) {
+      host = {
+        bucket: new TokenBucket(this.options.rate, this.options.burst),
+        breaker: new CircuitBreaker(this.options.failureThreshold, this.options.cooldown),
+      }
+      this.hosts.set(name, host)
+    }
+    return host
+  }
+
+  private async send(
+    url: string,
+    host: string,
+    headers: Headers,
+    timeout: number,
+  ): Promise<Response> {
+    const { bucket } = this.host(host)
+
+    for (let attempt = 0; ; attempt++) {
+      await sleep(bucket.take())
+
+      let response: Response
+      try {
+        response = await fetch(url, { headers, signal: AbortSignal.timeout(timeout) })
+        countUpstreamStatus(host, response.status)
+      } catch (error) {
+        const timedOut = error instanceof Error && error.name === "TimeoutError"
+        countUpstreamStatus(host, timedOut ? "timeout" : "error")
+        if (attempt >= this.options.retries) {
+          const reason = error instanceof Error ? error.message : String(error)
+          throw new UpstreamError(`Request to ${url} failed: ${reason}`)
+        }
+        await sleep(this.backoff(attempt))
+        continue
+      }
+
+      if (!isRetryableStatus(response.status) || attempt >= this.options.retries) {
+        return response
+      }
+
+      const retryAfter = parseRetryAfter(response.headers.get("Retry-After"))
+      if (retryAfter !== undefined && retryAfter > this.options.maxBackoff) {
+        return response
+      }
+
+      const delay = (retryAfter ?? 0) + this.backoff(attempt)
+      console.log(`⟳ ${response.status} from ${url}, retrying in ${delay}ms`)
+      await response.body?.cancel()
+      await sleep(delay)
+    }
+  }
+
+  /**
+   * Exponential backoff with full jitter
+   */
+  private backoff(attempt: number): number {
+    const cap = Math.min(this.options.maxBackoff, this.options.backoff * 2 ** attempt)
+    return Math.round(Math.random() * cap)
+  }
+}
+
+/** Client shared by every module fetching from Apple */
+export const UPSTREAM = new UpstreamClient()
+
+/**
+ * Send a GET request to Apple through the shared upstream client
+ */
+export function upstreamFetch(url: string, request?: UpstreamRequest): Promise<Response> {
+  return UPSTREAM.fetch(url, request)
+}
@@ -1,6 +1,9 @@
 /**
  * Simple HTML parser for Apple Support guides
  * Uses regex to extract content sections directly, avoiding nested element duplication
+ *
+ * Superseded by the streaming parser in src/lib/support/parser.ts; kept only as
+ * the baseline for tests/parser.bench.ts
  */
 
 export interface ParsedContent {
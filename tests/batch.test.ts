@@ -0,0 +1,186 @@
+import { afterEach, describe, expect, it, vi } from "vitest"
+import { app } from "../src"
+import { type BatchItem, fetchBatch, mapWithConcurrency } from "../src/lib/batch"
+import { coalesce } from "../src/lib/fetch"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+const deferred = <T>() => {
+  let resolve!: (value: T) => void
+  const promise = new Promise<T>((r) => {
+    resolve = r
+  })
+  return { promise, resolve }
+}
+
+describe("mapWithConcurrency", () => {
+  it("should never run more than the limit at once", async () => {
+    let running = 0
+    let peak = 0
+
+    const results = []
+    for await (const result of mapWithConcurrency([1, 2, 3, 4, 5, 6, 7], 3, async (n) => {
+      running++
+      peak = Math.max(peak, running)
+      await new Promise((resolve) => setTimeout(resolve, n % 3))
+      running--
+      return n * 2
+    })) {
+      results.push(result)
+    }
+
+    expect(peak).toBe(3)
+    expect(results).toHaveLength(7)
+    expect(results.map((result) => result.index).sort()).toEqual([0, 1, 2, 3, 4, 5, 6])
+  })
+
+  it("should yield results in completion order and keep failures per item", async () => {
+    const slow = deferred<string>()
+    const iterator = mapWithConcurrency(["slow", "fail", "fast"], 3, (item) => {
+      if (item === "slow") return slow.promise
+      if (item === "fail") return Promise.reject(new Error("boom"))
+      return Promise.resolve(item)
+    })
+
+    const first = await iterator.next()
+    const second = await iterator.next()
+    slow.resolve("slow")
+    const third = await iterator.next()
+
+    expect(first.value).toMatchObject({ index: 1, ok: false })
+    expect(second.value).toMatchObject({ index: 2, ok: true, value: "fast" })
+    expect(third.value).toMatchObject({ index: 0, ok: true, value: "slow" })
+    expect((await iterator.next()).done).toBe(true)
+  })
+})
+
+describe("coalesce", () => {
+  it("should share a single load between concurrent callers", async () => {
+    const pending = deferred<string>()
+    const load = vi.fn(() => pending.promise)
+
+    const first = coalesce("test:shared", load)
+    const second = coalesce("test:shared", load)
+    pending.resolve("value")
+
+    await expect(first).resolves.toBe("value")
+    await expect(second).resolves.toBe("value")
+    expect(load).toHaveBeenCalledTimes(1)
+
+    // Once settled, the next call loads again
+    await coalesce("test:shared", load)
+    expect(load).toHaveBeenCalledTimes(2)
+  })
+
+  it("should release the key when the load fails", async () => {
+    const load = vi.fn().mockRejectedValueOnce(new Error("boom")).mockResolvedValueOnce("ok")
+
+    await expect(coalesce("test:failing", load)).rejects.toThrow("boom")
+    await expect(coalesce("test:failing", load)).resolves.toBe("ok")
+  })
+})
+
+describe("fetchBatch", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+  })
+
+  it("should fetch duplicate pages once and report failures per item", async () => {
+    const fetchMock = vi.fn(async (input: RequestInfo | URL) => {
+      const url = input.toString()
+      if (url.includes("missing-batch-page")) return new Response("Not Found", { status: 404 })
+      if (url.includes("dm999")) return new Response("Server Error", { status: 500 })
+      return new Response(secureEnclaveHTML, { status: 200 })
+    })
+    global.fetch = fetchMock as typeof fetch
+
+    const items: BatchItem[] = [
+      { type: "guide", guide: "security", path: "sec-batch-shared" },
+      { type: "guide", guide: "security", path: "sec-batch-shared" },
+      { type: "guide", guide: "security", path: "missing-batch-page" },
+      { type: "training", tutorialId: "dm999", catalog: "apt-deployment" },
+    ]
+
+    const results = []
+    for await (const result of fetchBatch(items, 4)) {
+      results.push(result)
+    }
+    results.sort((a, b) => a.index - b.index)
+
+    expect(results.map((result) => result.status)).toEqual(["ok", "ok", "error", "error"])
+    expect(results[0]).toMatchObject({
+      id: "security/sec-batch-shared",
+      url: "https://support.apple.com/guide/security/sec-batch-shared/web",
+    })
+    expect(results[2]).toMatchObject({ notFound: true })
+    expect(results[3]).toMatchObject({
+      id: "apt-deployment/dm999",
+      notFound: false,
+      url: "https://it-training.apple.com/tutorials/deployment/dm999",
+    })
+
+    // The duplicated slug was fetched from Apple only once
+    const sharedCalls = fetchMock.mock.calls.filter(([input]) =>
+      input.toString().includes("sec-batch-shared"),
+    )
+    expect(sharedCalls).toHaveLength(1)
+  })
+})
+
+describe("POST /guide/:guide/batch", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+  })
+
+  it("should stream one NDJSON line per item followed by a summary", async () => {
+    global.fetch = vi.fn(async (input: RequestInfo | URL) =>
+      input.toString().includes("missing-route-page")
+        ? new Response("Not Found", { status: 404 })
+        : new Response(secureEnclaveHTML, { status: 200 }),
+    ) as typeof fetch
+
+    const response = await app.request(
+      "/guide/security/batch",
+      {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ paths: ["sec-route-page", "missing-route-page"] }),
+      },
+      { NODE_ENV: "test" },
+    )
+
+    expect(response.status).toBe(200)
+    expect(response.headers.get("Content-Type")).toContain("application/x-ndjson")
+
+    const lines = (await response.text())
+      .trim()
+      .split("\n")
+      .map((line) => JSON.parse(line))
+
+    expect(lines).toHaveLength(3)
+    expect(lines.slice(0, 2)).toEqual(
+      expect.arrayContaining([
+        expect.objectContaining({ id: "security/sec-route-page", status: "ok" }),
+        expect.objectContaining({ id: "security/missing-route-page", status: "error" }),
+      ]),
+    )
+    expect(lines[2]).toEqual({ done: true, total: 2, succeeded: 1, failed: 1 })
+  })
+
+  it("should reject invalid batches", async () => {
+    const request = (body: unknown) =>
+      app.request(
+        "/guide/security/batch",
+        { method: "POST", body: JSON.stringify(body) },
+        { NODE_ENV: "test" },
+      )
+
+    expect((await request({ paths: [] })).status).toBe(400)
+    expect((await request({ paths: [42] })).status).toBe(400)
+    expect((await request({ paths: Array(26).fill("welcome") })).status).toBe(400)
+    expect((await request({ paths: ["welcome"], catalog: "nope" })).status).toBe(400)
+  })
+})
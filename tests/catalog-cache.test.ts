@@ -0,0 +1,152 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest"
+import {
+  CatalogCache,
+  type CatalogRevision,
+  CONTENT_CACHE,
+  MemoryStore,
+  setPersistentStore,
+} from "../src/lib/cache"
+import { CircuitOpenError } from "../src/lib/upstream"
+
+describe("CatalogCache", () => {
+  const TTL = 1000
+  const MAX_STALE = 10_000
+
+  let store: MemoryStore
+
+  beforeEach(() => {
+    vi.useFakeTimers()
+    vi.setSystemTime(new Date("2025-01-01T00:00:00Z"))
+    store = new MemoryStore()
+    setPersistentStore(store)
+    CONTENT_CACHE.clear()
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+    setPersistentStore(undefined)
+  })
+
+  function createCache(load: (key: string) => Promise<string>) {
+    return new CatalogCache<string>({
+      name: "test",
+      load: async (key) => ({ value: await load(key) }),
+      ttl: TTL,
+      maxStale: MAX_STALE,
+    })
+  }
+
+  it("should load once and serve fresh entries from memory", async () => {
+    const load = vi.fn().mockResolvedValue("v1")
+    const cache = createCache(load)
+
+    expect(await cache.get("security")).toBe("v1")
+    expect(await cache.get("security")).toBe("v1")
+    expect(load).toHaveBeenCalledTimes(1)
+  })
+
+  it("should de-duplicate concurrent loads of the same key", async () => {
+    const load = vi.fn().mockResolvedValue("v1")
+    const cache = createCache(load)
+
+    const results = await Promise.all([cache.get("a"), cache.get("a"), cache.get("a")])
+
+    expect(results).toEqual(["v1", "v1", "v1"])
+    expect(load).toHaveBeenCalledTimes(1)
+  })
+
+  it("should serve stale entries immediately and refresh in the background", async () => {
+    const load = vi.fn().mockResolvedValueOnce("v1").mockResolvedValueOnce("v2")
+    const cache = createCache(load)
+
+    await cache.get("a")
+    vi.advanceTimersByTime(TTL + 1)
+
+    expect(await cache.get("a")).toBe("v1")
+    expect(load).toHaveBeenCalledTimes(2)
+
+    await vi.waitFor(async () => expect(await cache.get("a")).toBe("v2"))
+  })
+
+  it("should block on upstream once an entry is older than the stale window", async () => {
+    const load = vi.fn().mockResolvedValueOnce("v1").mockResolvedValueOnce("v2")
+    const cache = createCache(load)
+
+    await cache.get("a")
+    vi.advanceTimersByTime(TTL + MAX_STALE + 1)
+
+    expect(await cache.get("a")).toBe("v2")
+  })
+
+  it("should keep serving the stale value when a background refresh fails", async () => {
+    const load = vi.fn().mockRejectedValue(new Error("503")).mockResolvedValueOnce("v1")
+    const cache = createCache(load)
+
+    await cache.get("a")
+    vi.advanceTimersByTime(TTL + 1)
+
+    expect(await cache.get("a")).toBe("v1")
+    await vi.waitFor(() => expect(load).toHaveBeenCalledTimes(2))
+    expect(await cache.get("a")).toBe("v1")
+  })
+
+  it("should start warm from the persistent tier", async () => {
+    const first = createCache(vi.fn().mockResolvedValue("v1"))
+    await first.get("a")
+    await vi.waitFor(() => expect(store.size).toBe(1))
+
+    // Dropping the in-memory tier simulates a cold isolate
+    first.clear()
+    const load = vi.fn().mockResolvedValue("v2")
+    const second = createCache(load)
+
+    expect(await second.get("a")).toBe("v1")
+    expect(load).not.toHaveBeenCalled()
+  })
+
+  it("should revalidate with the ETag of the cached value", async () => {
+    const load = vi.fn(async (_key: string, cached?: CatalogRevision<string>) =>
+      cached ? cached : { value: "v1", etag: '"abc"' },
+    )
+    const cache = new CatalogCache<string>({ name: "test", load, ttl: TTL, maxStale: MAX_STALE })
+
+    await cache.get("a")
+    vi.advanceTimersByTime(TTL + 1)
+
+    expect(await cache.get("a")).toBe("v1")
+    await vi.waitFor(() => expect(load).toHaveBeenCalledTimes(2))
+    expect(load).toHaveBeenLastCalledWith("a", { value: "v1", etag: '"abc"' })
+
+    // The revalidated value counts as fresh again
+    await vi.waitFor(async () => {
+      await cache.get("a")
+      expect(load).toHaveBeenCalledTimes(2)
+    })
+  })
+
+  it("should serve values past the stale window while upstream is failing", async () => {
+    const load = vi
+      .fn()
+      .mockResolvedValueOnce({ value: "v1" })
+      .mockRejectedValueOnce(new CircuitOpenError("open"))
+      .mockRejectedValueOnce(new Error("parse error"))
+    const cache = new CatalogCache<string>({
+      name: "test",
+      load,
+      ttl: TTL,
+      maxStale: MAX_STALE,
+      staleIfError: 60_000,
+    })
+
+    await cache.get("a")
+    vi.advanceTimersByTime(TTL + MAX_STALE + 1)
+
+    expect(await cache.get("a")).toBe("v1")
+    await expect(cache.get("a")).rejects.toThrow("parse error")
+
+    // Nothing is served once the value is older than staleIfError allows
+    vi.advanceTimersByTime(60_000)
+    load.mockRejectedValueOnce(new CircuitOpenError("open"))
+    await expect(cache.get("a")).rejects.toThrow(CircuitOpenError)
+  })
+})
@@ -0,0 +1,127 @@
+import { Hono } from "hono"
+import { describe, expect, it, vi } from "vitest"
+import {
+  acceptVariant,
+  contentHashETag,
+  edgeCache,
+  edgeCacheKey,
+  isNotModified,
+} from "../src/lib/cache"
+
+describe("Edge cache helpers", () => {
+  it("should normalize cache keys on query order and Accept variant", () => {
+    const key = (url: string, accept?: string) =>
+      edgeCacheKey(new Request(url, { headers: accept ? { Accept: accept } : {} })).url
+
+    expect(key("https://example.com/training/search?q=mdm&catalog=apt-deployment")).toBe(
+      key("https://example.com/training/search?catalog=apt-deployment&q=mdm"),
+    )
+    expect(key("https://example.com/guide/security/welcome", "application/json")).not.toBe(
+      key("https://example.com/guide/security/welcome", "text/markdown"),
+    )
+    expect(key("https://example.com/guide/security/welcome", "text/plain")).toBe(
+      key("https://example.com/guide/security/welcome", "text/markdown, */*"),
+    )
+  })
+
+  it("should prefer JSON when the Accept header lists several types", () => {
+    expect(acceptVariant("text/markdown, application/json")).toBe("json")
+    expect(acceptVariant("text/plain")).toBe("markdown")
+    expect(acceptVariant("*/*")).toBe("default")
+    expect(acceptVariant(undefined)).toBe("default")
+  })
+
+  it("should derive ETags from the whole body", async () => {
+    const prefix = "# Secure Enclave\n\n**📎 Source:** https://support.apple.com/guide/security/"
+
+    const first = await contentHashETag(`${prefix}sec59b0b31ff/web`)
+    const second = await contentHashETag(`${prefix}sec067eb0c9e/web`)
+
+    expect(first).toMatch(/^"[0-9a-f]{32}"$/)
+    expect(first).not.toBe(second)
+    expect(await contentHashETag(`${prefix}sec59b0b31ff/web`)).toBe(first)
+  })
+
+  it("should evaluate If-None-Match before If-Modified-Since", () => {
+    const response = new Response("body", {
+      headers: { ETag: '"abc"', "Last-Modified": "Tue, 18 Feb 2025 00:00:00 GMT" },
+    })
+    const request = (headers: Record<string, string>) =>
+      new Request("https://example.com/", { headers })
+
+    expect(isNotModified(request({ "If-None-Match": '"abc"' }), response)).toBe(true)
+    expect(isNotModified(request({ "If-None-Match": 'W/"abc", "def"' }), response)).toBe(true)
+    expect(isNotModified(request({ "If-None-Match": '"def"' }), response)).toBe(false)
+    expect(
+      isNotModified(
+        request({ "If-None-Match": '"def"', "If-Modified-Since": "Wed, 19 Feb 2025 00:00:00 GMT" }),
+        response,
+      ),
+    ).toBe(false)
+    expect(
+      isNotModified(request({ "If-Modified-Since": "Wed, 19 Feb 2025 00:00:00 GMT" }), response),
+    ).toBe(true)
+    expect(
+      isNotModified(request({ "If-Modified-Since": "Mon, 17 Feb 2025 00:00:00 GMT" }), response),
+    ).toBe(false)
+  })
+})
+
+describe("edgeCache middleware", () => {
+  function createApp() {
+    const handler = vi.fn(() => "# Page\n\nBody")
+    const app = new Hono()
+    app.use(
+      "*",
+      edgeCache({ cacheName: `edge-test-${crypto.randomUUID()}`, cacheControl: "max-age=60" }),
+    )
+    app.get("/page", (c) =>
+      c.text(handler(), 200, { "Last-Modified": "Tue, 18 Feb 2025 00:00:00 GMT" }),
+    )
+    app.get("/private", (c) => c.text(handler(), 200, { "Cache-Control": "no-store" }))
+    return { app, handler }
+  }
+
+  it("should serve repeat requests from the cache without reaching the route", async () => {
+    const { app, handler } = createApp()
+
+    const first = await app.request("/page")
+    expect(first.headers.get("X-Cache")).toBe("MISS")
+    expect(first.headers.get("Cache-Control")).toBe("max-age=60")
+    expect(first.headers.get("ETag")).toMatch(/^"[0-9a-f]{32}"$/)
+
+    await vi.waitFor(async () => {
+      const repeat = await app.request("/page")
+      expect(repeat.headers.get("X-Cache")).toBe("HIT")
+      expect(await repeat.text()).toBe("# Page\n\nBody")
+    })
+    expect(handler).toHaveBeenCalledTimes(1)
+  })
+
+  it("should answer conditional requests with 304", async () => {
+    const { app } = createApp()
+
+    const first = await app.request("/page")
+    const etag = first.headers.get("ETag") as string
+
+    const byETag = await app.request("/page", { headers: { "If-None-Match": etag } })
+    expect(byETag.status).toBe(304)
+    expect(byETag.headers.get("ETag")).toBe(etag)
+    expect(await byETag.text()).toBe("")
+
+    const byDate = await app.request("/page", {
+      headers: { "If-Modified-Since": "Wed, 19 Feb 2025 00:00:00 GMT" },
+    })
+    expect(byDate.status).toBe(304)
+  })
+
+  it("should not cache responses marked no-store", async () => {
+    const { app, handler } = createApp()
+
+    await app.request("/private")
+    const second = await app.request("/private")
+
+    expect(second.headers.get("X-Cache")).toBeNull()
+    expect(handler).toHaveBeenCalledTimes(2)
+  })
+})
@@ -0,0 +1,169 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest"
+import { CONTENT_CACHE, CONTENT_TTL, estimateSize, LruCache } from "../src/lib/cache"
+import { fetchSupportGuide } from "../src/lib/support"
+import { fetchTrainingTutorialContent } from "../src/lib/training"
+import { UPSTREAM } from "../src/lib/upstream"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+describe("LruCache", () => {
+  beforeEach(() => {
+    vi.useFakeTimers()
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+  })
+
+  it("should evict the least recently used entry when over budget", () => {
+    const cache = new LruCache<string>({ maxBytes: 30, ttl: 60_000 })
+    cache.set("a", "aaaaa") // 10 bytes
+    cache.set("b", "bbbbb")
+    cache.set("c", "ccccc")
+
+    // Reading "a" makes "b" the least recently used entry
+    expect(cache.get("a")).toBe("aaaaa")
+    cache.set("d", "ddddd")
+
+    expect(cache.has("a")).toBe(true)
+    expect(cache.has("b")).toBe(false)
+    expect(cache.has("c")).toBe(true)
+    expect(cache.has("d")).toBe(true)
+    expect(cache.stats()).toMatchObject({ entries: 3, bytes: 30, evictions: 1 })
+  })
+
+  it("should evict as many entries as a large value needs", () => {
+    const cache = new LruCache<string>({ maxBytes: 30, ttl: 60_000 })
+    cache.set("a", "aaaaa")
+    cache.set("b", "bbbbb")
+    cache.set("big", "x".repeat(12)) // 24 bytes
+
+    expect(cache.size).toBe(1)
+    expect(cache.get("big")).toBe("x".repeat(12))
+  })
+
+  it("should not store values larger than the budget", () => {
+    const cache = new LruCache<string>({ maxBytes: 10, ttl: 60_000 })
+    cache.set("a", "aa")
+
+    expect(cache.set("huge", "x".repeat(100))).toBe(false)
+    expect(cache.get("a")).toBe("aa")
+    expect(cache.has("huge")).toBe(false)
+  })
+
+  it("should replace entries without leaking bytes", () => {
+    const cache = new LruCache<string>({ maxBytes: 100, ttl: 60_000 })
+    cache.set("a", "aaaaa")
+    cache.set("a", "aa")
+
+    expect(cache.stats()).toMatchObject({ entries: 1, bytes: 4 })
+  })
+
+  it("should expire entries after their TTL", () => {
+    const cache = new LruCache<string>({ maxBytes: 100, ttl: 1000 })
+    cache.set("short", "value")
+    cache.set("long", "value", { ttl: 5000 })
+
+    vi.advanceTimersByTime(1000)
+
+    expect(cache.get("short")).toBeUndefined()
+    expect(cache.get("long")).toBe("value")
+    expect(cache.stats()).toMatchObject({ hits: 1, misses: 1, expirations: 1 })
+  })
+
+  it("should keep expired entries for their stale window", () => {
+    const cache = new LruCache<string>({ maxBytes: 100, ttl: 1000, staleTtl: 4000 })
+    cache.set("page", "value")
+
+    vi.advanceTimersByTime(1000)
+    expect(cache.get("page")).toBeUndefined()
+    expect(cache.getStale("page")).toBe("value")
+
+    vi.advanceTimersByTime(4000)
+    expect(cache.getStale("page")).toBeUndefined()
+    cache.sweep()
+    expect(cache.stats()).toMatchObject({ entries: 0, bytes: 0, expirations: 1 })
+  })
+
+  it("should sweep expired entries during writes", () => {
+    const cache = new LruCache<string>({ maxBytes: 1000, ttl: 1000, sweepInterval: 5000 })
+    cache.set("a", "value")
+    cache.set("b", "value")
+
+    vi.advanceTimersByTime(5000)
+    cache.set("c", "value")
+
+    expect(cache.stats()).toMatchObject({ entries: 1, bytes: 10, expirations: 2 })
+  })
+
+  it("should delete entries by prefix", () => {
+    const cache = new LruCache<string>({ maxBytes: 1000, ttl: 1000 })
+    cache.set("page:security/a", "html")
+    cache.set("page:security/b", "html")
+    cache.set("markdown:security/a", "md")
+
+    expect(cache.deletePrefix("page:")).toBe(2)
+    expect(cache.stats()).toMatchObject({ entries: 1, bytes: 4 })
+  })
+
+  it("should report usage per kind of key", () => {
+    const cache = new LruCache<string>({ maxBytes: 1000, ttl: 1000 })
+    cache.set("page:security/a", "html")
+    cache.set("page:security/b", "html")
+    cache.set("markdown:security/a", "md")
+
+    expect(cache.usage()).toEqual({
+      page: { entries: 2, bytes: 16 },
+      markdown: { entries: 1, bytes: 4 },
+    })
+  })
+
+  it("should estimate string and object sizes", () => {
+    expect(estimateSize("abc")).toBe(6)
+    expect(estimateSize({ a: 1 })).toBe(14)
+    expect(estimateSize(undefined)).toBe(0)
+  })
+})
+
+describe("Shared content cache", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    vi.useRealTimers()
+    global.fetch = originalFetch
+    UPSTREAM.reset()
+  })
+
+  it("should serve expired pages and tutorials while Apple is failing", async () => {
+    global.fetch = vi.fn(async (input: RequestInfo | URL) =>
+      input.toString().endsWith(".json")
+        ? new Response(JSON.stringify({ metadata: { title: "Stale Tutorial" } }), { status: 200 })
+        : new Response(secureEnclaveHTML, { status: 200 }),
+    )
+    const page = await fetchSupportGuide("security", "lru-stale-page")
+    const tutorial = await fetchTrainingTutorialContent("lru002", "apt-support")
+
+    vi.useFakeTimers({ toFake: ["Date"] })
+    vi.setSystemTime(Date.now() + CONTENT_TTL + 1)
+    global.fetch = vi.fn(async () => new Response("Unavailable", { status: 503 }))
+
+    expect(await fetchSupportGuide("security", "lru-stale-page")).toEqual(page)
+    expect(await fetchTrainingTutorialContent("lru002", "apt-support")).toBe(tutorial)
+
+    // Pages never cached still fail
+    await expect(fetchSupportGuide("security", "lru-uncached-page")).rejects.toThrow("503")
+  })
+
+  it("should cache training tutorial content", async () => {
+    global.fetch = vi.fn(
+      async () =>
+        new Response(JSON.stringify({ metadata: { title: "Cached Tutorial" } }), { status: 200 }),
+    )
+
+    const first = await fetchTrainingTutorialContent("lru001", "apt-support")
+    const second = await fetchTrainingTutorialContent("lru001", "apt-support")
+
+    expect(first).toContain("# Cached Tutorial")
+    expect(second).toBe(first)
+    expect(global.fetch).toHaveBeenCalledTimes(1)
+  })
+})
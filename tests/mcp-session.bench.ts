@@ -0,0 +1,83 @@
+import { StreamableHTTPTransport } from "@hono/mcp"
+import { Hono } from "hono"
+import { bench, describe } from "vitest"
+import { createMcpServer } from "../src/lib/mcp"
+import { MemorySessionStore, SESSION_ID_HEADER } from "../src/lib/session"
+
+const HEADERS = {
+  "Content-Type": "application/json",
+  Accept: "application/json, text/event-stream",
+}
+
+const INITIALIZE = JSON.stringify({
+  jsonrpc: "2.0",
+  id: 0,
+  method: "initialize",
+  params: {
+    protocolVersion: "2025-06-18",
+    capabilities: {},
+    clientInfo: { name: "session-bench", version: "1.0.0" },
+  },
+})
+const INITIALIZED = JSON.stringify({ jsonrpc: "2.0", method: "notifications/initialized" })
+const LIST_TOOLS = JSON.stringify({ jsonrpc: "2.0", id: 1, method: "tools/list" })
+
+const post = (body: string, sessionId?: string) =>
+  new Request("https://example.com/mcp", {
+    method: "POST",
+    headers: sessionId ? { ...HEADERS, [SESSION_ID_HEADER]: sessionId } : HEADERS,
+    body,
+  })
+
+// Baseline: the previous route, reconnecting one shared server to a new transport per request
+const legacy = new Hono()
+const legacyServer = createMcpServer()
+legacy.all("/mcp", async (c) => {
+  const transport = new StreamableHTTPTransport()
+  await legacyServer.connect(transport)
+  return transport.handleRequest(c)
+})
+
+const sessions = new MemorySessionStore({ maxSessions: 1024 })
+
+async function openSession(sessionId: string) {
+  await (await sessions.handle(sessionId, post(INITIALIZE), true)).text()
+  await sessions.handle(sessionId, post(INITIALIZED, sessionId), false)
+}
+
+const warmSession = openSession("bench-warm")
+
+describe("tools/list per call", () => {
+  bench("reconnect per request (baseline)", async () => {
+    await (await legacy.fetch(post(LIST_TOOLS))).text()
+  })
+
+  bench("reused session", async () => {
+    await warmSession
+    await (await sessions.handle("bench-warm", post(LIST_TOOLS, "bench-warm"), false)).text()
+  })
+
+  bench("new session per call", async () => {
+    const sessionId = crypto.randomUUID()
+    await openSession(sessionId)
+    await (await sessions.handle(sessionId, post(LIST_TOOLS, sessionId), false)).text()
+  })
+})
+
+describe("tools/list from 16 concurrent clients", () => {
+  const clients = Array.from({ length: 16 }, (_, i) => `bench-client-${i}`)
+  const ready = Promise.all(clients.map(openSession))
+
+  bench("reconnect per request (baseline)", async () => {
+    await Promise.all(clients.map(async () => (await legacy.fetch(post(LIST_TOOLS))).text()))
+  })
+
+  bench("reused sessions", async () => {
+    await ready
+    await Promise.all(
+      clients.map(async (client) =>
+        (await sessions.handle(client, post(LIST_TOOLS, client), false)).text(),
+      ),
+    )
+  })
+})
@@ -0,0 +1,257 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest"
+import { app } from "../src"
+import {
+  DurableObjectSessionStore,
+  MemorySessionStore,
+  SESSION_ID_HEADER,
+} from "../src/lib/session"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+type JsonRpcMessage = {
+  id?: number
+  result?: {
+    tools?: Array<{ name: string }>
+    content?: Array<{ type: string; text: string }>
+  }
+  error?: { code: number; message: string }
+}
+
+const initialize = {
+  jsonrpc: "2.0",
+  id: 0,
+  method: "initialize",
+  params: {
+    protocolVersion: "2025-06-18",
+    capabilities: {},
+    clientInfo: { name: "session-test", version: "1.0.0" },
+  },
+}
+
+function mcpRequest(body: unknown, sessionId?: string, method = "POST"): Request {
+  const headers: Record<string, string> = {
+    "Content-Type": "application/json",
+    Accept: "application/json, text/event-stream",
+  }
+  if (sessionId) headers[SESSION_ID_HEADER] = sessionId
+
+  return new Request("https://example.com/mcp", {
+    method,
+    headers,
+    body: method === "POST" ? JSON.stringify(body) : undefined,
+  })
+}
+
+/**
+ * Read the JSON-RPC messages of a response, whether sent as JSON or over SSE
+ */
+async function readMessages(response: Response): Promise<JsonRpcMessage[]> {
+  const text = await response.text()
+  if (response.headers.get("Content-Type")?.includes("text/event-stream")) {
+    return text
+      .split("\n")
+      .filter((line) => line.startsWith("data: "))
+      .map((line) => JSON.parse(line.slice(6)))
+  }
+  return text ? [JSON.parse(text)] : []
+}
+
+/**
+ * Start a session on a store, the way an MCP client does
+ */
+async function openSession(store: MemorySessionStore, sessionId: string) {
+  const response = await store.handle(sessionId, mcpRequest(initialize), true)
+  expect(response.headers.get(SESSION_ID_HEADER)).toBe(sessionId)
+  await readMessages(response)
+
+  const initialized = { jsonrpc: "2.0", method: "notifications/initialized" }
+  await store.handle(sessionId, mcpRequest(initialized, sessionId), false)
+}
+
+const callTool = (id: number, name: string, args: Record<string, unknown>) => ({
+  jsonrpc: "2.0",
+  id,
+  method: "tools/call",
+  params: { name, arguments: args },
+})
+
+describe("MemorySessionStore", () => {
+  const originalFetch = global.fetch
+
+  beforeEach(() => {
+    global.fetch = vi.fn(async () => new Response(secureEnclaveHTML, { status: 200 }))
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+    global.fetch = originalFetch
+  })
+
+  it("should serve every request of a session from the same server", async () => {
+    const store = new MemorySessionStore()
+    await openSession(store, "session-a")
+
+    for (const id of [1, 2, 3]) {
+      const response = await store.handle(
+        "session-a",
+        mcpRequest({ jsonrpc: "2.0", id, method: "tools/list" }, "session-a"),
+        false,
+      )
+      const [message] = await readMessages(response)
+      expect(message.id).toBe(id)
+      expect(message.result?.tools?.map((tool) => tool.name)).toContain("fetchAppleSupportGuide")
+    }
+
+    expect(store.size).toBe(1)
+  })
+
+  it("should answer unknown sessions with 404", async () => {
+    const store = new MemorySessionStore()
+    const response = await store.handle(
+      "missing",
+      mcpRequest({ jsonrpc: "2.0", id: 1, method: "tools/list" }, "missing"),
+      false,
+    )
+
+    expect(response.status).toBe(404)
+    expect(await response.json()).toMatchObject({ error: { code: -32001 } })
+  })
+
+  it("should not keep sessions that were never initialized", async () => {
+    const store = new MemorySessionStore()
+    const response = await store.handle(
+      "uninitialized",
+      mcpRequest({ jsonrpc: "2.0", id: 1, method: "tools/list" }),
+      true,
+    )
+
+    expect(response.status).toBe(400)
+    expect(store.size).toBe(0)
+  })
+
+  it("should close sessions the client deletes", async () => {
+    const store = new MemorySessionStore()
+    await openSession(store, "session-deleted")
+
+    const deleted = await store.handle(
+      "session-deleted",
+      mcpRequest(undefined, "session-deleted", "DELETE"),
+      false,
+    )
+    expect(deleted.status).toBe(200)
+    expect(store.size).toBe(0)
+  })
+
+  it("should close idle and least recently active sessions", async () => {
+    vi.useFakeTimers({ toFake: ["Date"] })
+    const store = new MemorySessionStore({ maxSessions: 2, idleTimeout: 60_000 })
+
+    await openSession(store, "first")
+    await openSession(store, "second")
+    await openSession(store, "third")
+    expect(store.size).toBe(2)
+
+    vi.advanceTimersByTime(60_000)
+    expect(store.sweep()).toBeUndefined()
+    expect(store.size).toBe(0)
+  })
+
+  it("should keep concurrent clients' responses apart", async () => {
+    const store = new MemorySessionStore()
+    const clients = Array.from({ length: 8 }, (_, i) => `client-${i}`)
+    await Promise.all(clients.map((client) => openSession(store, client)))
+
+    // Every client calls the same tool for its own pages, all at once
+    const calls = clients.flatMap((client, c) =>
+      [1, 2, 3].map(async (n) => {
+        const path = `sec-${c}-${n}`
+        const body = callTool(n, "fetchAppleSupportGuide", { guide: "security", path })
+        const response = await store.handle(client, mcpRequest(body, client), false)
+        const [message] = await readMessages(response)
+        return { path, message }
+      }),
+    )
+
+    for (const { path, message } of await Promise.all(calls)) {
+      expect(message.id).toBe(Number(path.split("-").pop()))
+      expect(message.result?.content?.[0].text).toContain(
+        `https://support.apple.com/guide/security/${path}/web`,
+      )
+    }
+    expect(store.size).toBe(clients.length)
+  })
+})
+
+describe("DurableObjectSessionStore", () => {
+  it("should not forward internal session headers sent by the client", async () => {
+    const forwarded: Request[] = []
+    const namespace = {
+      idFromName: (name: string) => name,
+      get: () => ({
+        fetch: async (request: Request) => {
+          forwarded.push(request)
+          return new Response(null, { status: 202 })
+        },
+      }),
+    } as unknown as DurableObjectNamespace
+    const store = new DurableObjectSessionStore(namespace)
+
+    const request = new Request(mcpRequest(initialize, "session-a"), {
+      headers: {
+        "X-Supportify-Session": "session-b",
+        "X-Supportify-Session-Create": "1",
+      },
+    })
+    await store.handle("session-a", request, false)
+    await store.handle("session-c", mcpRequest(initialize), true)
+
+    expect(forwarded[0].headers.get("X-Supportify-Session")).toBe("session-a")
+    expect(forwarded[0].headers.has("X-Supportify-Session-Create")).toBe(false)
+    expect(forwarded[1].headers.get("X-Supportify-Session-Create")).toBe("1")
+  })
+
+  it("should collect stats from the Durable Objects of recent sessions", async () => {
+    const asked: string[] = []
+    const namespace = {
+      idFromName: (name: string) => name,
+      get: (id: string) => ({
+        fetch: async (input: RequestInfo, init?: RequestInit) => {
+          const request = new Request(input, init)
+          if (request.headers.get("X-Supportify-Stats") !== "1") {
+            return new Response(null, { status: 202 })
+          }
+          asked.push(id)
+          return id === "session-b"
+            ? new Response("Unavailable", { status: 503 })
+            : Response.json({ metrics: { isolate: id } })
+        },
+      }),
+    } as unknown as DurableObjectNamespace
+    const store = new DurableObjectSessionStore(namespace)
+
+    await store.handle("session-a", mcpRequest(initialize), true)
+    await store.handle("session-b", mcpRequest(initialize), true)
+    const stats = await store.stats()
+
+    expect(asked).toEqual(["session-a", "session-b"])
+    expect(stats).toEqual([{ metrics: { isolate: "session-a" } }])
+  })
+})
+
+describe("/mcp route", () => {
+  it("should issue a session ID on initialize and require it afterwards", async () => {
+    const env = { NODE_ENV: "test" }
+    const init = await app.request(mcpRequest(initialize), undefined, env)
+    const sessionId = init.headers.get(SESSION_ID_HEADER)
+
+    expect(init.status).toBe(200)
+    expect(sessionId).toMatch(/^[0-9a-f-]{36}$/)
+    expect(init.headers.get("Access-Control-Expose-Headers")).toContain(SESSION_ID_HEADER)
+
+    const list = { jsonrpc: "2.0", id: 1, method: "tools/list" }
+    const reused = await app.request(mcpRequest(list, sessionId as string), undefined, env)
+    expect((await readMessages(reused))[0].id).toBe(1)
+
+    const unknown = await app.request(mcpRequest(list, crypto.randomUUID()), undefined, env)
+    expect(unknown.status).toBe(404)
+  })
+})
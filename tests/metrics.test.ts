@@ -0,0 +1,168 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest"
+import { app } from "../src"
+import { CONTENT_CACHE } from "../src/lib/cache"
+import { runWithRequestContext } from "../src/lib/context"
+import {
+  countCacheEvent,
+  exportMetrics,
+  getMetrics,
+  type IsolateMetrics,
+  measure,
+  measureSync,
+  mergeMetrics,
+  recordStage,
+  resetMetrics,
+  serverTiming,
+} from "../src/lib/metrics"
+import { getIsolateStats, type IsolateStats, mergeIsolateStats } from "../src/lib/stats"
+import { fetchSupportGuide } from "../src/lib/support"
+import { UPSTREAM } from "../src/lib/upstream"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+describe("Stage timings", () => {
+  beforeEach(() => {
+    resetMetrics()
+  })
+
+  it("should aggregate stages per isolate and per request", async () => {
+    const timings = new Map<string, number>()
+
+    await runWithRequestContext({ timings }, async () => {
+      recordStage("parse", 4)
+      recordStage("parse", 6)
+      measureSync("render", () => "markdown")
+    })
+    recordStage("parse", 10)
+
+    // Stages outside a request only count towards the isolate totals
+    expect(timings.get("parse")).toBe(10)
+    expect(timings.has("render")).toBe(true)
+    expect(getMetrics().stages.parse).toMatchObject({ count: 3, totalMs: 20, maxMs: 10, p50Ms: 6 })
+  })
+
+  it("should record stages that fail", async () => {
+    await expect(
+      measure("upstream", async () => {
+        throw new Error("boom")
+      }),
+    ).rejects.toThrow("boom")
+
+    expect(getMetrics().stages.upstream.count).toBe(1)
+  })
+
+  it("should format Server-Timing headers", () => {
+    const timings = new Map([
+      ["upstream", 182.456],
+      ["tool:fetchAppleSupportGuide", 3],
+    ])
+
+    expect(serverTiming(timings)).toBe("upstream;dur=182.46, tool-fetchAppleSupportGuide;dur=3")
+  })
+})
+
+describe("Merging isolates", () => {
+  beforeEach(() => {
+    resetMetrics()
+  })
+
+  const sessionObject: IsolateMetrics = {
+    isolate: "session-object",
+    since: "2020-01-01T00:00:00.000Z",
+    stages: { parse: { count: 1, totalMs: 30, maxMs: 30, samples: [30] } },
+    caches: { content: { hit: 2 } },
+    upstream: { "support.apple.com": { "200": 1 } },
+  }
+
+  it("should identify this isolate consistently", () => {
+    const first = exportMetrics()
+
+    expect(first.isolate).toMatch(/^[0-9a-f-]{36}$/)
+    expect(exportMetrics().isolate).toBe(first.isolate)
+    expect(Date.parse(first.since)).toBeGreaterThan(0)
+  })
+
+  it("should add up the metrics of each isolate once", () => {
+    recordStage("parse", 10)
+    countCacheEvent("content", "hit")
+    const local = exportMetrics()
+
+    const merged = mergeMetrics([local, sessionObject, sessionObject])
+
+    expect(merged.isolates).toBe(2)
+    expect(merged.since).toBe(sessionObject.since)
+    expect(merged.stages.parse).toMatchObject({ count: 2, totalMs: 40, maxMs: 30 })
+    expect(merged.caches.content.hit).toBe(3)
+    expect(merged.upstream).toEqual({ "support.apple.com": { "200": 1 } })
+  })
+
+  it("should add up content caches and report the worst circuit state", () => {
+    const local = getIsolateStats()
+    const remote: IsolateStats = {
+      metrics: sessionObject,
+      content: {
+        ...local.content,
+        hits: local.content.hits + 5,
+        kinds: { markdown: { entries: 1, bytes: 8 } },
+      },
+      circuits: { "support.apple.com": "open" },
+    }
+
+    const merged = mergeIsolateStats([local, remote])
+
+    expect(merged.isolates).toBe(2)
+    expect(merged.content.maxBytes).toBe(local.content.maxBytes * 2)
+    expect(merged.content.hits).toBe(local.content.hits * 2 + 5)
+    const localMarkdown = local.content.kinds.markdown?.entries ?? 0
+    expect(merged.content.kinds.markdown.entries).toBe(localMarkdown + 1)
+    expect(merged.circuits["support.apple.com"]).toBe("open")
+  })
+})
+
+describe("Pipeline instrumentation", () => {
+  const originalFetch = global.fetch
+
+  beforeEach(() => {
+    resetMetrics()
+  })
+
+  afterEach(() => {
+    global.fetch = originalFetch
+    UPSTREAM.reset()
+  })
+
+  it("should time each stage of a guide page and count upstream statuses", async () => {
+    global.fetch = vi
+      .fn()
+      .mockResolvedValueOnce(new Response("Unavailable", { status: 503 }))
+      .mockResolvedValue(new Response(secureEnclaveHTML, { status: 200 }))
+    const timings = new Map<string, number>()
+
+    await runWithRequestContext({ timings }, () =>
+      fetchSupportGuide("security", "metrics-pipeline-page"),
+    )
+
+    expect([...timings.keys()]).toEqual(["upstream", "parse", "render"])
+    expect(getMetrics().upstream).toEqual({ "support.apple.com": { "200": 1, "503": 1 } })
+    expect(CONTENT_CACHE.usage().markdown.entries).toBeGreaterThan(0)
+  })
+})
+
+describe("Metrics routes", () => {
+  it("should add Server-Timing to responses and serve /cache-stats", async () => {
+    const env = { NODE_ENV: "test" }
+    const root = await app.request("/", undefined, env)
+    expect(root.headers.get("Server-Timing")).toMatch(/^total;dur=[\d.]+$/)
+
+    const response = await app.request("/cache-stats", undefined, env)
+    const stats = await response.json()
+
+    expect(response.headers.get("Cache-Control")).toBe("no-store")
+    expect(stats).toMatchObject({
+      stages: { "route:/": { count: expect.any(Number) } },
+      content: { maxBytes: CONTENT_CACHE.stats().maxBytes },
+    })
+    expect(stats).toHaveProperty("caches")
+    expect(stats).toHaveProperty("upstream")
+    expect(stats).toHaveProperty("circuits")
+  })
+})
@@ -0,0 +1,68 @@
+import { bench, describe } from "vitest"
+import { parseSupportGuideResponse } from "../src/lib/support/parser"
+import { parseAppleSupportHTML } from "./baseline/simple-parser"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+// Network-sized chunks, as a fetch response body would deliver them
+const CHUNK_SIZE = 16 * 1024
+
+const encoder = new TextEncoder()
+
+/**
+ * Grow the fixture page by repeating its sections, to see how both parsers scale
+ */
+function createPage(sections: number): string {
+  const start = secureEnclaveHTML.indexOf('<div class="Subhead">')
+  const end = secureEnclaveHTML.indexOf('<div class="Outro">')
+  const repeated = secureEnclaveHTML.slice(start, end).repeat(sections)
+  return secureEnclaveHTML.slice(0, start) + repeated + secureEnclaveHTML.slice(end)
+}
+
+function streamPage(bytes: Uint8Array): Response {
+  let offset = 0
+  const body = new ReadableStream<Uint8Array>({
+    pull(controller) {
+      if (offset >= bytes.length) {
+        controller.close()
+        return
+      }
+      controller.enqueue(bytes.subarray(offset, offset + CHUNK_SIZE))
+      offset += CHUNK_SIZE
+    },
+  })
+  return new Response(body, { headers: { "Content-Type": "text/html; charset=utf-8" } })
+}
+
+const pages = [
+  { name: "fixture page", html: secureEnclaveHTML },
+  { name: "10x sections", html: createPage(10) },
+  { name: "100x sections", html: createPage(100) },
+]
+
+// Peak memory can't be sampled inside workerd, so report the input each parser
+// must hold at once: the regex parser needs the whole document as one string
+// (UTF-16, two bytes per character), the streaming parser a single chunk
+console.table(
+  pages.map(({ name, html }) => ({
+    page: name,
+    "regex parser input (KiB)": Math.round((html.length * 2) / 1024),
+    "streaming parser input (KiB)": Math.round(
+      Math.min(encoder.encode(html).length, CHUNK_SIZE) / 1024,
+    ),
+  })),
+)
+
+for (const { name, html } of pages) {
+  describe(`parse ${name}`, () => {
+    const bytes = encoder.encode(html)
+
+    // Baseline: buffer the response, then run the regex parser over the string
+    bench("regex parser (baseline)", async () => {
+      parseAppleSupportHTML(await streamPage(bytes).text())
+    })
+
+    bench("streaming HTMLRewriter parser", async () => {
+      await parseSupportGuideResponse(streamPage(bytes))
+    })
+  })
+}
@@ -0,0 +1,75 @@
+import { bench, describe } from "vitest"
+import { CONTENT_CACHE } from "../src/lib/cache"
+import { splitSections } from "../src/lib/sections"
+import {
+  fetchSupportGuide,
+  loadTableOfContents,
+  parseSupportGuideResponse,
+  renderSupportGuideMarkdown,
+  searchToc,
+} from "../src/lib/support"
+import { getTrainingModel } from "../src/lib/training"
+import { UPSTREAM } from "../src/lib/upstream"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+import tocHTML from "./fixtures/support/toc.html?raw"
+import catalog from "./fixtures/training/apt-support.json"
+
+// Every stage of the guide pipeline over the checked-in fixtures, so a
+// regression in one stage shows up on its own rather than only end to end
+
+const SOURCE_URL = "https://support.apple.com/guide/security/sec59b0b31ff/web"
+
+// Upstream answers instantly with the fixtures; only the client's own overhead remains
+globalThis.fetch = (async (input: RequestInfo | URL) => {
+  const url = input.toString()
+  return new Response(url.endsWith("/toc") ? tocHTML : secureEnclaveHTML, { status: 200 })
+}) as typeof fetch
+
+// Lift the rate limit, which would otherwise dominate the cold runs
+UPSTREAM.configure({ rate: 1e9, burst: 1e9 })
+
+const parsed = await parseSupportGuideResponse(new Response(secureEnclaveHTML))
+const markdown = renderSupportGuideMarkdown(parsed, SOURCE_URL)
+const { value: toc } = await loadTableOfContents("security")
+
+describe("guide page stages", () => {
+  bench("parse (streamed HTMLRewriter)", async () => {
+    await parseSupportGuideResponse(new Response(secureEnclaveHTML))
+  })
+
+  bench("render Markdown", () => {
+    renderSupportGuideMarkdown(parsed, SOURCE_URL)
+  })
+
+  bench("split sections", () => {
+    splitSections(markdown)
+  })
+})
+
+describe("guide page end to end", () => {
+  let page = 0
+
+  bench("cold: upstream → parse → render → cache", async () => {
+    const path = `bench-page-${page++}`
+    await fetchSupportGuide("security", path)
+    CONTENT_CACHE.delete(`markdown:security/${path}`)
+  })
+
+  bench("warm: Markdown cache hit", async () => {
+    await fetchSupportGuide("security", "bench-warm-page")
+  })
+})
+
+describe("catalog stages", () => {
+  bench("load and parse ToC", async () => {
+    await loadTableOfContents("security")
+  })
+
+  bench("search ToC", () => {
+    searchToc(toc, "secure enclave")
+  })
+
+  bench("search training catalog", () => {
+    getTrainingModel(catalog).index.search("apple account")
+  })
+})
@@ -0,0 +1,85 @@
+import { bench, describe } from "vitest"
+import { SearchIndex } from "../src/lib/search"
+
+// Synthetic ToC-like corpora built from a realistic vocabulary, so per-query
+// latency can be compared as the number of documents grows
+const WORDS = [
+  "secure",
+  "enclave",
+  "filevault",
+  "encryption",
+  "device",
+  "management",
+  "enrollment",
+  "declarative",
+  "configuration",
+  "profile",
+  "passcode",
+  "biometric",
+  "touch",
+  "face",
+  "keychain",
+  "recovery",
+  "network",
+  "certificate",
+  "activation",
+  "lock",
+  "deployment",
+  "update",
+  "software",
+  "boot",
+  "kernel",
+  "sandbox",
+  "privacy",
+  "authentication",
+  "token",
+  "identity",
+]
+
+function createCorpus(size: number): Array<{ title: string; abstract: string }> {
+  let seed = 42
+  const random = () => {
+    seed = (seed * 1103515245 + 12345) % 2147483648
+    return seed / 2147483648
+  }
+  const phrase = (length: number) =>
+    Array.from({ length }, () => WORDS[Math.floor(random() * WORDS.length)]).join(" ")
+
+  return Array.from({ length: size }, (_, i) => ({
+    title: `${phrase(4)} ${i}`,
+    abstract: phrase(30),
+  }))
+}
+
+const FIELDS = [
+  { name: "title", boost: 3, get: (doc: { title: string }) => doc.title },
+  { name: "abstract", boost: 1, get: (doc: { abstract: string }) => doc.abstract },
+]
+
+for (const size of [250, 2_500, 25_000]) {
+  describe(`search over ${size} documents`, () => {
+    const corpus = createCorpus(size)
+    const index = new SearchIndex(corpus, FIELDS)
+
+    // Baseline: the previous linear "any word matches" scan
+    bench("linear scan (baseline)", () => {
+      const words = ["secure", "enclave"]
+      corpus.filter((doc) => {
+        const text = `${doc.title} ${doc.abstract}`.toLowerCase()
+        return words.some((word) => text.includes(word))
+      })
+    })
+
+    bench("exact terms", () => {
+      index.search("secure enclave")
+    })
+
+    bench("prefix", () => {
+      index.search("decl")
+    })
+
+    bench("typo", () => {
+      index.search("filevalt")
+    })
+  })
+}
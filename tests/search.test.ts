@@ -0,0 +1,175 @@
+import { afterEach, describe, expect, it, vi } from "vitest"
+import { editDistance, SearchIndex, stem, tokenize } from "../src/lib/search"
+import { searchToc, type TocItem } from "../src/lib/support"
+import { searchTrainingTutorials } from "../src/lib/training"
+
+function tocItem(title: string, slug: string): TocItem {
+  return { title, slug, id: slug, url: `https://support.apple.com/guide/security/${slug}/web` }
+}
+
+const TOC: TocItem[] = [
+  tocItem("Volume encryption with FileVault in macOS", "sec4c6dc1b6e"),
+  tocItem("Secure Enclave", "sec59b0b31ff"),
+  tocItem("Face ID and Touch ID security", "sec067eb0c9e"),
+  tocItem("Encryption and Data Protection overview", "sece3bee0835"),
+  tocItem("Managing FileVault in macOS", "sec8d9ab1e8d"),
+  tocItem("Passcodes and passwords", "sec20dd9b246"),
+]
+
+describe("Search", () => {
+  describe("tokenize", () => {
+    it("should lowercase, drop stop words and stem", () => {
+      expect(tokenize("Encrypting the Devices")).toEqual(["encrypt", "devic"])
+    })
+
+    it("should map inflections to the same stem", () => {
+      expect(stem("encryption")).toBe(stem("encrypted"))
+      expect(stem("enrollment")).toBe(stem("enrolling"))
+      expect(stem("configuration")).toBe(stem("configure"))
+      expect(stem("policies")).toBe(stem("policy"))
+    })
+  })
+
+  describe("editDistance", () => {
+    it("should count insertions, deletions, substitutions and transpositions", () => {
+      expect(editDistance("filevalt", "filevault")).toBe(1)
+      expect(editDistance("enclave", "enclvae")).toBe(1)
+      expect(editDistance("mdm", "mdm")).toBe(0)
+      expect(editDistance("secure", "server", 1)).toBe(2)
+    })
+  })
+
+  describe("SearchIndex", () => {
+    const index = new SearchIndex(TOC, [{ name: "title", boost: 1, get: (item) => item.title }])
+
+    it("should rank documents matching every query term first", () => {
+      const topTwo = index
+        .search("filevault macos")
+        .slice(0, 2)
+        .map((r) => r.item.slug)
+      expect(topTwo).toEqual(expect.arrayContaining(["sec4c6dc1b6e", "sec8d9ab1e8d"]))
+    })
+
+    it("should tolerate typos", () => {
+      const results = index.search("filevalt")
+      expect(results.length).toBeGreaterThan(0)
+      expect(results[0].item.title).toContain("FileVault")
+    })
+
+    it("should match prefixes", () => {
+      expect(index.search("encl")[0].item.slug).toBe("sec59b0b31ff")
+    })
+
+    it("should match inflected forms", () => {
+      const slugs = index.search("encrypted").map((r) => r.item.slug)
+      expect(slugs).toEqual(expect.arrayContaining(["sec4c6dc1b6e", "sece3bee0835"]))
+    })
+
+    it("should apply field boosts", () => {
+      const docs = [
+        { title: "Networking", body: "Configure FileVault recovery keys" },
+        { title: "FileVault", body: "Recovery keys" },
+      ]
+      const boosted = new SearchIndex(docs, [
+        { name: "title", boost: 3, get: (doc) => doc.title },
+        { name: "body", boost: 1, get: (doc) => doc.body },
+      ])
+
+      expect(boosted.search("filevault")[0].item.title).toBe("FileVault")
+    })
+
+    it("should return nothing for queries made only of stop words", () => {
+      expect(index.search("the and of")).toEqual([])
+    })
+
+    it("should restore a serialized index with identical rankings", () => {
+      const fields = [{ name: "title", boost: 1, get: (item: TocItem) => item.title }]
+      const serialized = JSON.parse(JSON.stringify(index.serialize()))
+      const restored = new SearchIndex(TOC, fields, serialized)
+
+      for (const query of ["filevault macos", "filevalt", "encl", "encryption overview"]) {
+        expect(restored.search(query)).toEqual(index.search(query))
+      }
+    })
+  })
+
+  describe("searchToc", () => {
+    it("should return ranked ToC items", () => {
+      expect(searchToc(TOC, "face id")[0].slug).toBe("sec067eb0c9e")
+    })
+
+    it("should respect the result limit", () => {
+      expect(searchToc(TOC, "encryption filevault secure passcodes", 2)).toHaveLength(2)
+    })
+  })
+
+  describe("searchTrainingTutorials", () => {
+    const originalFetch = global.fetch
+
+    afterEach(() => {
+      global.fetch = originalFetch
+    })
+
+    it("should rank tutorials and resolve their volume and chapter", async () => {
+      const catalog = {
+        metadata: { title: "Apple Device Support" },
+        sections: [
+          {
+            kind: "volume",
+            name: "Volume 1",
+            chapters: [
+              {
+                name: "Data",
+                tutorials: [
+                  "doc://com.apple.support/tutorials/support/sup005",
+                  "doc://com.apple.support/tutorials/support/sup010",
+                ],
+              },
+            ],
+          },
+        ],
+        references: {
+          "doc://com.apple.support/tutorials/support/sup005": {
+            identifier: "doc://com.apple.support/tutorials/support/sup005",
+            url: "/tutorials/support/sup005",
+            title: "Backup iPhone",
+            abstract: [{ type: "text", text: "Learn how to create an iCloud backup of iPhone." }],
+            kind: "project",
+            role: "project",
+            type: "topic",
+          },
+          "doc://com.apple.support/tutorials/support/sup010": {
+            identifier: "doc://com.apple.support/tutorials/support/sup010",
+            url: "/tutorials/support/sup010",
+            title: "Restore a Mac",
+            abstract: [{ type: "text", text: "Restore a Mac from a Time Machine backup." }],
+            kind: "project",
+            role: "project",
+            type: "topic",
+          },
+          "image.png": { type: "image", variants: [] },
+        },
+      }
+
+      global.fetch = vi.fn().mockResolvedValue(
+        new Response(JSON.stringify(catalog), {
+          status: 200,
+          headers: { "Content-Type": "application/json" },
+        }),
+      )
+
+      const results = await searchTrainingTutorials("backup", { catalog: "apt-support" })
+
+      expect(results.map((r) => r.tutorialId)).toEqual(["sup005", "sup010"])
+      expect(results[0].volume).toBe("Volume 1")
+      expect(results[0].chapter).toBe("Data")
+
+      const macOnly = await searchTrainingTutorials("backup", {
+        catalog: "apt-support",
+        platform: "mac",
+      })
+      expect(macOnly.map((r) => r.tutorialId)).toEqual(["sup010"])
+      expect(global.fetch).toHaveBeenCalledTimes(1)
+    })
+  })
+})
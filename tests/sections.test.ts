@@ -0,0 +1,154 @@
+import { afterEach, describe, expect, it, vi } from "vitest"
+import { CONTENT_CACHE } from "../src/lib/cache"
+import {
+  estimateTokens,
+  renderSections,
+  selectSections,
+  slugifyHeading,
+  splitSections,
+} from "../src/lib/sections"
+import { fetchSupportGuide } from "../src/lib/support"
+import { fetchTrainingTutorialDocument } from "../src/lib/training"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+const MARKDOWN = [
+  "# Device management",
+  "",
+  "**📎 Source:** https://support.apple.com/guide/deployment/dep1/web",
+  "",
+  "---",
+  "",
+  "Intro paragraph about managing devices.",
+  "",
+  "## Enrollment",
+  "",
+  "Devices enroll in MDM.",
+  "",
+  "### Automated enrollment",
+  "",
+  "Automated Device Enrollment assigns devices to an MDM server.",
+  "",
+  "```",
+  "## not a heading",
+  "```",
+  "",
+  "## Declarations",
+  "",
+  "Declarative device management sends declarations.",
+  "",
+  "## Declarations",
+  "",
+  "A second section with the same heading.",
+  "",
+  "---",
+  "*Source: https://support.apple.com/guide/deployment/dep1/web*",
+].join("\n")
+
+describe("splitSections", () => {
+  it("should split at ## and ### headings outside code blocks", () => {
+    const sections = splitSections(MARKDOWN)
+
+    expect(sections.map((s) => [s.anchor, s.level])).toEqual([
+      ["introduction", 1],
+      ["enrollment", 2],
+      ["automated-enrollment", 3],
+      ["declarations", 2],
+      ["declarations-1", 2],
+    ])
+
+    // The title, source line and footer belong to no section
+    const intro = MARKDOWN.slice(sections[0].start, sections[0].end).trim()
+    expect(intro).toBe("Intro paragraph about managing devices.")
+    expect(MARKDOWN.slice(sections[4].start, sections[4].end)).not.toContain("*Source:")
+    expect(sections[2].tokens).toBe(
+      estimateTokens(MARKDOWN.slice(sections[2].start, sections[2].end).trim()),
+    )
+  })
+
+  it("should slugify headings like GitHub", () => {
+    expect(slugifyHeading("Secure Enclave Processor")).toBe("secure-enclave-processor")
+    expect(slugifyHeading("iCloud & [FileVault](https://example.com)")).toBe("icloud-filevault")
+  })
+})
+
+describe("selectSections", () => {
+  const sections = splitSections(MARKDOWN)
+  const anchors = (options: Parameters<typeof selectSections>[2]) =>
+    selectSections(MARKDOWN, sections, options).map(({ section }) => section.anchor)
+
+  it("should return a section with its subsections by anchor or heading", () => {
+    expect(anchors({ section: "enrollment" })).toEqual(["enrollment", "automated-enrollment"])
+    expect(anchors({ section: "Automated Enrollment" })).toEqual(["automated-enrollment"])
+    expect(anchors({ section: "missing" })).toEqual([])
+  })
+
+  it("should rank sections by query and return them in page order", () => {
+    expect(anchors({ query: "declarative declarations" })).toEqual([
+      "declarations",
+      "declarations-1",
+    ])
+  })
+
+  it("should stay within the token budget", () => {
+    const budget = sections[0].tokens + sections[1].tokens
+    expect(anchors({ maxTokens: budget })).toEqual(["introduction", "enrollment"])
+
+    // A section too large for the budget is truncated rather than dropped
+    const [only] = selectSections(MARKDOWN, sections, { section: "enrollment", maxTokens: 5 })
+    expect(only.truncated).toBe(true)
+    expect(estimateTokens(only.text)).toBeLessThanOrEqual(6)
+  })
+
+  it("should list the sections that were not returned", () => {
+    const selected = selectSections(MARKDOWN, sections, { section: "declarations" })
+    const text = renderSections({ title: "Device management", url: "https://x", sections }, selected)
+
+    expect(text).toContain("<!-- section: declarations -->")
+    expect(text).toContain("**Sections:** 1 of 5")
+    expect(text).toContain("- `enrollment` Enrollment")
+    expect(text).toContain("  - `automated-enrollment` Automated enrollment")
+  })
+})
+
+describe("Cached sections", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+  })
+
+  it("should split guide pages once, alongside their Markdown", async () => {
+    global.fetch = vi.fn(async () => new Response(secureEnclaveHTML, { status: 200 }))
+
+    const page = await fetchSupportGuide("security", "sections-cached-page")
+
+    expect(page.sections.map((s) => s.anchor)).toEqual([
+      "introduction",
+      "secure-enclave-processor",
+      "memory-protection-engine",
+      "related-links",
+    ])
+    expect(CONTENT_CACHE.get("markdown:security/sections-cached-page")).toBe(page)
+  })
+
+  it("should split training tutorials", async () => {
+    global.fetch = vi.fn(
+      async () =>
+        new Response(
+          JSON.stringify({
+            metadata: { title: "Sections Tutorial" },
+            sections: [
+              { kind: "hero", content: [{ type: "paragraph", inlineContent: [{ text: "Hi" }] }] },
+            ],
+          }),
+          { status: 200 },
+        ),
+    )
+
+    const tutorial = await fetchTrainingTutorialDocument("sec001", "apt-support")
+
+    expect(tutorial.title).toBe("Sections Tutorial")
+    expect(tutorial.url).toBe("https://it-training.apple.com/tutorials/support/sec001")
+    expect(tutorial.sections.map((s) => s.anchor)).toEqual(["overview"])
+  })
+})
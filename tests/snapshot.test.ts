@@ -0,0 +1,200 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest"
+import { CONTENT_CACHE } from "../src/lib/cache"
+import type { SerializedSearchIndex } from "../src/lib/search"
+import {
+  CRAWL_STATE_KEY,
+  type CrawlOptions,
+  CURRENT_SNAPSHOT_KEY,
+  compressJSON,
+  crawlSnapshot,
+  decompressJSON,
+  MemorySnapshotStore,
+  resumeSnapshotCrawl,
+  SNAPSHOT_MAX_AGE,
+  type SnapshotManifest,
+  setSnapshotStore,
+  snapshotKey,
+} from "../src/lib/snapshot"
+import { fetchSupportGuide, fetchTableOfContents, searchToc } from "../src/lib/support"
+import { fetchTrainingTutorialContent, searchTrainingTutorials } from "../src/lib/training"
+import { DEFAULT_UPSTREAM_OPTIONS } from "../src/lib/upstream"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+import tocHTML from "./fixtures/support/toc.html?raw"
+import catalog from "./fixtures/training/apt-support.json"
+
+/**
+ * Mock of Apple's servers: one guide ToC, one training catalog, and a page
+ * that always fails
+ */
+function mockApple() {
+  const fetchMock = vi.fn(async (input: RequestInfo | URL) => {
+    const url = input.toString()
+    if (url.endsWith("/guide/security/toc")) return new Response(tocHTML, { status: 200 })
+    if (url.includes("secb3000f149")) return new Response("Server Error", { status: 500 })
+    if (url.includes("support.apple.com/guide/")) {
+      return new Response(secureEnclaveHTML, { status: 200 })
+    }
+    if (url.endsWith("/data/tutorials/apt-support.json")) {
+      return new Response(JSON.stringify(catalog), { status: 200 })
+    }
+    const tutorial = url.match(/\/data\/tutorials\/support\/(\w+)\.json$/)
+    if (tutorial) {
+      return new Response(JSON.stringify({ metadata: { title: `Tutorial ${tutorial[1]}` } }), {
+        status: 200,
+      })
+    }
+    return new Response("Not Found", { status: 404 })
+  })
+  global.fetch = fetchMock as typeof fetch
+  return fetchMock
+}
+
+const CRAWL_OPTIONS: CrawlOptions = {
+  guides: ["security"],
+  catalogs: ["apt-support"],
+  shardSize: 2,
+}
+
+/**
+ * Run crawl invocations until the snapshot is published
+ */
+async function crawl(store: MemorySnapshotStore, options: CrawlOptions = {}) {
+  let progress = await crawlSnapshot(store, { ...CRAWL_OPTIONS, ...options })
+  while (progress.status !== "published") {
+    progress = (await resumeSnapshotCrawl(store, options)) ?? progress
+  }
+  return progress.manifest
+}
+
+describe("Snapshot compression", () => {
+  it("should round-trip JSON through gzip", async () => {
+    const value = { markdown: "# Secure Enclave\n\n".repeat(100), shards: [1, 2, 3] }
+    const compressed = await compressJSON(value)
+
+    expect(compressed.byteLength).toBeLessThan(JSON.stringify(value).length)
+    expect(await decompressJSON(compressed)).toEqual(value)
+  })
+})
+
+describe("crawlSnapshot", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+  })
+
+  it("should publish documents in shards and record failures", async () => {
+    mockApple()
+    const store = new MemorySnapshotStore()
+
+    const manifest = await crawl(store)
+
+    expect(manifest.tocs).toEqual(["security"])
+    expect(manifest.catalogs).toEqual(["apt-support"])
+    expect(Object.keys(manifest.documents).sort()).toEqual([
+      "markdown:security/sec59b0b31ff",
+      "tutorial:apt-support/sup005",
+      "tutorial:apt-support/sup010",
+    ])
+    expect(manifest.shards).toBe(2)
+    expect(manifest.failures).toEqual([
+      { key: "markdown:security/secb3000f149", error: expect.stringContaining("500") },
+    ])
+
+    // The pointer is written last and names the published version
+    const pointer = await store.get(CURRENT_SNAPSHOT_KEY)
+    expect(new TextDecoder().decode(pointer as ArrayBuffer)).toBe(manifest.version)
+
+    const stored = await store.get(snapshotKey(manifest.version, "manifest"))
+    expect(await decompressJSON<SnapshotManifest>(stored as ArrayBuffer)).toEqual(manifest)
+
+    // Search indexes are prebuilt for every ToC and catalog
+    for (const item of ["index:toc:security", "index:catalog:apt-support"]) {
+      const index = await store.get(snapshotKey(manifest.version, item))
+      expect(await decompressJSON<SerializedSearchIndex>(index as ArrayBuffer)).toMatchObject({
+        size: expect.any(Number),
+        postings: expect.any(Object),
+      })
+    }
+  })
+
+  it("should crawl in batches across invocations before publishing", async () => {
+    CONTENT_CACHE.clear()
+    const fetchMock = mockApple()
+    const store = new MemorySnapshotStore()
+
+    // The ToC and the catalog, then the first two documents, the second retried
+    const first = await crawlSnapshot(store, { ...CRAWL_OPTIONS, batchSize: 2 })
+    expect(first).toMatchObject({ status: "crawling", crawled: 2, total: 4 })
+    expect(fetchMock).toHaveBeenCalledTimes(2 + 1 + DEFAULT_UPSTREAM_OPTIONS.retries + 1)
+    expect(await store.get(CURRENT_SNAPSHOT_KEY)).toBeNull()
+    expect(await store.get(CRAWL_STATE_KEY)).not.toBeNull()
+
+    const second = await resumeSnapshotCrawl(store, { batchSize: 2 })
+    expect(second?.status).toBe("published")
+    expect(second?.status === "published" && second.manifest.shards).toBe(2)
+    expect(await store.get(CRAWL_STATE_KEY)).toBeNull()
+
+    // Nothing left to resume
+    expect(await resumeSnapshotCrawl(store)).toBeUndefined()
+  })
+})
+
+describe("Snapshot reads", () => {
+  const originalFetch = global.fetch
+  let store: MemorySnapshotStore
+
+  beforeEach(async () => {
+    mockApple()
+    store = new MemorySnapshotStore()
+    await crawl(store)
+
+    // Simulate a cold isolate
+    CONTENT_CACHE.clear()
+    setSnapshotStore(store)
+  })
+
+  afterEach(() => {
+    vi.useRealTimers()
+    setSnapshotStore(undefined)
+    CONTENT_CACHE.clear()
+    global.fetch = originalFetch
+  })
+
+  it("should serve pages, tutorials and catalogs without fetching from Apple", async () => {
+    const fetchMock = mockApple()
+
+    const page = await fetchSupportGuide("security", "secure-enclave-sec59b0b31ff")
+    const tutorial = await fetchTrainingTutorialContent("sup010", "apt-support")
+    const toc = await fetchTableOfContents("security")
+    const results = await searchTrainingTutorials("apple account")
+
+    expect(page.title).toBe("Secure Enclave")
+    expect(page.markdown).toContain("# Secure Enclave")
+    expect(tutorial).toContain("# Tutorial sup010")
+    expect(toc.map((item) => item.slug)).toEqual(["sec59b0b31ff", "secb3000f149"])
+    expect(results[0]).toMatchObject({ tutorialId: "sup010" })
+    expect(searchToc(toc, "secure enclave")[0].slug).toBe("sec59b0b31ff")
+    expect(fetchMock).not.toHaveBeenCalled()
+  })
+
+  it("should fetch live when a document is missing from the snapshot", async () => {
+    const fetchMock = mockApple()
+
+    await expect(fetchSupportGuide("security", "secb3000f149")).rejects.toThrow("500")
+    await fetchSupportGuide("security", "sec-not-in-snapshot")
+
+    // The failing page is retried before giving up
+    expect(fetchMock).toHaveBeenCalledTimes(DEFAULT_UPSTREAM_OPTIONS.retries + 2)
+  })
+
+  it("should ignore stale snapshots", async () => {
+    vi.useFakeTimers({ toFake: ["Date"] })
+    vi.setSystemTime(Date.now() + SNAPSHOT_MAX_AGE + 1)
+    const fetchMock = mockApple()
+
+    await fetchTrainingTutorialContent("sup005", "apt-support")
+
+    expect(fetchMock).toHaveBeenCalledTimes(1)
+  })
+})
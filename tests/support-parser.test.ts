@@ -0,0 +1,118 @@
+import { afterEach, describe, expect, it, vi } from "vitest"
+import { fetchAndRenderSupportGuide, parseSupportGuideHTML } from "../src/lib/support"
+import secureEnclaveHTML from "./fixtures/support/secure-enclave.html?raw"
+
+describe("Support Guide Parser", () => {
+  it("should extract title, published date and related links", async () => {
+    const parsed = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(parsed.title).toBe("Secure Enclave")
+    expect(parsed.publishedDate).toBe("February 18, 2025")
+    expect(parsed.relatedLinks).toEqual([
+      "Face ID and Touch ID security (https://support.apple.com/guide/security/face-id-and-touch-id-security-sec067eb0c9e/web)",
+      "Passcodes and passwords (https://support.apple.com/guide/security/sec20dd9b246/web)",
+    ])
+  })
+
+  it("should skip navigation, table of contents and footer chrome", async () => {
+    const { body } = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(body).not.toContain("Store")
+    expect(body).not.toContain("Table of Contents")
+    expect(body).not.toContain("Welcome")
+    expect(body).not.toContain("Helpful?")
+    expect(body).not.toContain("Copyright")
+    expect(body).not.toContain("appState")
+    expect(body).not.toContain("See also")
+  })
+
+  it("should render paragraphs with collapsed whitespace and decoded entities", async () => {
+    const { body } = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(body.startsWith("The Secure Enclave is a dedicated secure subsystem")).toBe(true)
+    expect(body).toContain("integrated into Apple systems on chip (SoCs).")
+    expect(body).toContain("as the SoC does—a boot ROM")
+    expect(body).toContain("the device’s DRAM memory.")
+  })
+
+  it("should not duplicate text from nested elements", async () => {
+    const { body } = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(body.match(/## Secure Enclave Processor/g)).toHaveLength(1)
+    expect(body.match(/dedicated solely for/g)).toHaveLength(1)
+  })
+
+  it("should render headings, inline formatting and links", async () => {
+    const { body } = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(body).toContain("## Secure Enclave Processor")
+    expect(body).toContain("## Memory Protection Engine")
+    expect(body).toContain("for the **Secure Enclave**. To provide")
+    expect(body).toContain("solely for *Secure Enclave* use.")
+    expect(body).toContain(
+      "See [Boot process for iPhone and iPad devices](https://support.apple.com/guide/security/boot-process-for-iphone-and-ipad-devices-secb3000f149/web) for details.",
+    )
+  })
+
+  it("should render nested and ordered lists", async () => {
+    const { body } = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(body).toContain(
+      [
+        "- Uses a `sepOS` kernel based on an Apple-customized L4 microkernel",
+        "- Runs at a lower clock speed & protects against clock and power attacks",
+        "  - Available in A7 and later",
+        "  - Available in S3 and later",
+      ].join("\n"),
+    )
+    expect(body).toContain(
+      "1. The memory is encrypted with an ephemeral key.\n2. The key is generated at boot.",
+    )
+  })
+
+  it("should render tables and code blocks", async () => {
+    const { body } = await parseSupportGuideHTML(secureEnclaveHTML)
+
+    expect(body).toContain(
+      [
+        "| SoC | Memory Protection Engine |",
+        "| --- | --- |",
+        "| A8 | Encryption and authentication |",
+        "| A11 \\| S4 | Encryption, authentication and replay prevention |",
+      ].join("\n"),
+    )
+    expect(body).toContain("```\nsep_boot_monitor --lock <region>\nsep_verify\n```")
+  })
+
+  it("should fall back to the document title without an h1", async () => {
+    const parsed = await parseSupportGuideHTML(
+      "<html><head><title>Apple Platform Deployment - Apple Support</title></head>" +
+        "<body><p>Intro &amp; overview</p></body></html>",
+    )
+
+    expect(parsed.title).toBe("Deployment")
+    expect(parsed.body).toBe("Intro & overview")
+    expect(parsed.relatedLinks).toBeUndefined()
+  })
+})
+
+describe("fetchAndRenderSupportGuide", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+  })
+
+  it("should stream the fetched page into Markdown", async () => {
+    global.fetch = vi.fn().mockResolvedValue(new Response(secureEnclaveHTML, { status: 200 }))
+
+    const markdown = await fetchAndRenderSupportGuide("security", "/sec59b0b31ff-parser-test/")
+
+    expect(global.fetch).toHaveBeenCalledWith(
+      "https://support.apple.com/guide/security/sec59b0b31ff-parser-test/web",
+      expect.any(Object),
+    )
+    expect(markdown).toContain("# Secure Enclave")
+    expect(markdown).toContain("| SoC | Memory Protection Engine |")
+  })
+})
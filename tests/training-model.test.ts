@@ -0,0 +1,67 @@
+import { afterEach, beforeEach, describe, expect, it, vi } from "vitest"
+import { CONTENT_CACHE } from "../src/lib/cache"
+import {
+  fetchTrainingTutorial,
+  getTrainingModel,
+  getTrainingStructure,
+  type TrainingCatalog,
+} from "../src/lib/training"
+import catalog from "./fixtures/training/apt-support.json"
+
+const trainingCatalog = catalog as TrainingCatalog
+
+describe("TrainingCatalogModel", () => {
+  it("should index tutorials by ID and identifier with their volume and chapter", () => {
+    const model = getTrainingModel(trainingCatalog)
+
+    const entry = model.find("sup010")
+    expect(entry).toMatchObject({
+      id: "sup010",
+      abstract: "Manage an Apple Account on iPhone and Mac.",
+      searchText: "apple account basics manage an apple account on iphone and mac.",
+      volume: "Apple Device Support",
+      chapter: "Introduction to Apple device support",
+    })
+    expect(model.find("doc://com.apple.support/tutorials/support/sup010")).toBe(entry)
+    expect(model.structure.volumes[0].chapters[0].tutorials.map((t) => t.id)).toEqual([
+      "sup005",
+      "sup010",
+    ])
+  })
+
+  it("should be built once per catalog version", () => {
+    expect(getTrainingModel(trainingCatalog)).toBe(getTrainingModel(trainingCatalog))
+    expect(getTrainingModel(structuredClone(trainingCatalog))).not.toBe(
+      getTrainingModel(trainingCatalog),
+    )
+  })
+})
+
+describe("fetchTrainingTutorial", () => {
+  const originalFetch = global.fetch
+
+  beforeEach(() => {
+    CONTENT_CACHE.clear()
+    global.fetch = vi.fn(async () => new Response(JSON.stringify(catalog), { status: 200 }))
+  })
+
+  afterEach(() => {
+    CONTENT_CACHE.clear()
+    global.fetch = originalFetch
+  })
+
+  it("should answer lookups from the cached catalog model", async () => {
+    expect(await fetchTrainingTutorial("sup005")).toMatchObject({
+      title: "Intro to Apple device support",
+    })
+    expect(await fetchTrainingTutorial("sup010")).toMatchObject({ title: "Apple Account basics" })
+    expect((await getTrainingStructure()).volumes).toHaveLength(1)
+
+    expect(global.fetch).toHaveBeenCalledTimes(1)
+  })
+
+  it("should not match partial IDs", async () => {
+    expect(await fetchTrainingTutorial("sup0")).toBeNull()
+    expect(await fetchTrainingTutorial("support")).toBeNull()
+  })
+})
@@ -0,0 +1,179 @@
+import { afterEach, describe, expect, it, vi } from "vitest"
+import { loadTableOfContents } from "../src/lib/support"
+import {
+  CircuitOpenError,
+  parseRetryAfter,
+  UPSTREAM,
+  UpstreamClient,
+  UpstreamError,
+} from "../src/lib/upstream"
+import tocHTML from "./fixtures/support/toc.html?raw"
+
+type Route = (request: {
+  url: string
+  headers: Headers
+  signal?: AbortSignal
+}) => Response | Promise<Response>
+
+/**
+ * Mock upstream answering each request with the next response of its URL's script
+ * The last response of a script is repeated
+ */
+function mockUpstream(routes: Record<string, Route[]>) {
+  const calls = new Map<string, number>()
+  const fetchMock = vi.fn(async (input: RequestInfo | URL, init?: RequestInit) => {
+    const url = input.toString()
+    const script = routes[url]
+    if (!script) return new Response("Not Found", { status: 404 })
+
+    const call = calls.get(url) ?? 0
+    calls.set(url, call + 1)
+    const route = script[Math.min(call, script.length - 1)]
+    return route({ url, headers: new Headers(init?.headers), signal: init?.signal ?? undefined })
+  })
+  global.fetch = fetchMock as typeof fetch
+  return fetchMock
+}
+
+const status =
+  (code: number, headers?: Record<string, string>): Route =>
+  () =>
+    new Response(`status ${code}`, { status: code, headers })
+
+const hang: Route = ({ signal }) =>
+  new Promise((_, reject) => {
+    signal?.addEventListener("abort", () => reject(signal.reason))
+  })
+
+const URL_A = "https://upstream.test/a"
+
+// Short delays so retries and cooldowns run in real time
+const createClient = (options = {}) =>
+  new UpstreamClient({ backoff: 1, maxBackoff: 50, timeout: 100, ...options })
+
+describe("UpstreamClient", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+    UPSTREAM.reset()
+  })
+
+  it("should retry 429 and 5xx responses until one succeeds", async () => {
+    const fetchMock = mockUpstream({ [URL_A]: [status(503), status(429), status(200)] })
+
+    const response = await createClient().fetch(URL_A)
+
+    expect(response.status).toBe(200)
+    expect(fetchMock).toHaveBeenCalledTimes(3)
+  })
+
+  it("should return the last response once retries are exhausted, and not retry 404", async () => {
+    const fetchMock = mockUpstream({
+      [URL_A]: [status(500)],
+      "https://upstream.test/missing": [status(404)],
+    })
+    const client = createClient({ retries: 2 })
+
+    expect((await client.fetch(URL_A)).status).toBe(500)
+    expect(fetchMock).toHaveBeenCalledTimes(3)
+
+    expect((await client.fetch("https://upstream.test/missing")).status).toBe(404)
+    expect(fetchMock).toHaveBeenCalledTimes(4)
+  })
+
+  it("should wait as long as Retry-After asks, unless that is too long", async () => {
+    const fetchMock = mockUpstream({
+      [URL_A]: [status(429, { "Retry-After": "0.03" }), status(200)],
+      "https://upstream.test/slow": [status(503, { "Retry-After": "120" })],
+    })
+    const client = createClient()
+
+    const start = Date.now()
+    expect((await client.fetch(URL_A)).status).toBe(200)
+    expect(Date.now() - start).toBeGreaterThanOrEqual(25)
+
+    expect((await client.fetch("https://upstream.test/slow")).status).toBe(503)
+    expect(fetchMock).toHaveBeenCalledTimes(3)
+  })
+
+  it("should time out and retry requests that hang", async () => {
+    mockUpstream({ [URL_A]: [hang, status(200)] })
+    expect((await createClient({ timeout: 20 }).fetch(URL_A)).status).toBe(200)
+
+    const fetchMock = mockUpstream({ [URL_A]: [hang] })
+    await expect(createClient({ timeout: 20, retries: 1 }).fetch(URL_A)).rejects.toThrow(
+      UpstreamError,
+    )
+    expect(fetchMock).toHaveBeenCalledTimes(2)
+  })
+
+  it("should open the circuit after consecutive failures and close it after a probe", async () => {
+    const fetchMock = mockUpstream({ [URL_A]: [status(503), status(503), status(200)] })
+    const client = createClient({ retries: 0, failureThreshold: 2, cooldown: 30 })
+
+    await client.fetch(URL_A)
+    await client.fetch(URL_A)
+    expect(client.circuit("upstream.test")).toBe("open")
+
+    // Requests to an open circuit fail without reaching upstream
+    await expect(client.fetch(URL_A)).rejects.toThrow(CircuitOpenError)
+    expect(fetchMock).toHaveBeenCalledTimes(2)
+
+    await new Promise((resolve) => setTimeout(resolve, 40))
+    expect(client.circuit("upstream.test")).toBe("half-open")
+    expect((await client.fetch(URL_A)).status).toBe(200)
+    expect(client.circuit("upstream.test")).toBe("closed")
+  })
+
+  it("should rate limit each host separately", async () => {
+    mockUpstream({ [URL_A]: [status(200)], "https://other.test/b": [status(200)] })
+    const client = createClient({ rate: 100, burst: 2 })
+
+    // Two requests fit the burst, the next three wait 10ms each
+    const start = Date.now()
+    await Promise.all(Array.from({ length: 5 }, () => client.fetch(URL_A)))
+    expect(Date.now() - start).toBeGreaterThanOrEqual(25)
+
+    const other = Date.now()
+    await Promise.all([client.fetch("https://other.test/b"), client.fetch("https://other.test/b")])
+    expect(Date.now() - other).toBeLessThan(10)
+  })
+
+  it("should parse Retry-After as seconds or as a date", () => {
+    const now = Date.parse("2025-01-01T00:00:00Z")
+    expect(parseRetryAfter("3", now)).toBe(3000)
+    expect(parseRetryAfter("Wed, 01 Jan 2025 00:00:10 GMT", now)).toBe(10_000)
+    expect(parseRetryAfter("soon", now)).toBeUndefined()
+    expect(parseRetryAfter(null, now)).toBeUndefined()
+  })
+})
+
+describe("Conditional requests", () => {
+  const originalFetch = global.fetch
+
+  afterEach(() => {
+    global.fetch = originalFetch
+    UPSTREAM.reset()
+  })
+
+  it("should revalidate a cached ToC with If-None-Match", async () => {
+    const tocUrl = "https://support.apple.com/guide/security/toc"
+    const fetchMock = mockUpstream({
+      [tocUrl]: [
+        ({ headers }) =>
+          headers.get("If-None-Match") === '"toc-v1"'
+            ? new Response(null, { status: 304 })
+            : new Response(tocHTML, { status: 200, headers: { ETag: '"toc-v1"' } }),
+      ],
+    })
+
+    const first = await loadTableOfContents("security")
+    expect(first.etag).toBe('"toc-v1"')
+    expect(first.value.length).toBeGreaterThan(0)
+
+    const second = await loadTableOfContents("security", first)
+    expect(second).toBe(first)
+    expect(fetchMock).toHaveBeenCalledTimes(2)
+  })
+})